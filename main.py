@@ -8,18 +8,23 @@
 """
 
 from astrbot.api.star import Context, Star, register
-from astrbot.api.event import filter, AstrMessageEvent
+from astrbot.api.event import filter, AstrMessageEvent, MessageChain
 from astrbot.api import logger
 from astrbot.api.message_components import At, Plain
 from astrbot.core.star.star_tools import StarTools
 from pathlib import Path
 from typing import List, Dict, Any, Set
-import json
+import asyncio
 import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 
 # 导入功能模块
 from .modules import CheckInModule, SetuModule, RobberyModule
 from .modules.base import BaseModule
+from .utils import DataManager, GroupSettingsStore, MetricsRegistry, HandlerProfiler, ReplyBatcher, SendQueue
+from .utils import ShardExecutor, ShardBusyError, MaintenanceScheduler, MemoryTracer, measure, format_size
 
 
 @register("astrbot_plugin_groupmessages", "ZhiheZier", "群聊消息管理插件 - 提供签到、涩图、互动等多种功能", "1.0.0")
@@ -37,14 +42,61 @@ class GroupMessagesPlugin(Star):
         self.setu_module: SetuModule | None = None
         self.robbery_module: RobberyModule | None = None
         
-        # 群组启用状态（存储禁用的群组ID）
-        self.disabled_groups: Set[str] = set()
-        self.data_file: Path | None = None
-        
-        # 群组涩图设置（存储每个群的涩图权限）
-        # 格式: {"群号": {"normal_setu": bool, "r18_setu": bool}}
-        self.group_setu_settings: Dict[str, Dict[str, bool]] = {}
-        self.setu_settings_file: Path | None = None
+        # 群组设置（插件开关与涩图权限）
+        self.group_settings: GroupSettingsStore | None = None
+        
+        # 性能指标（命令与处理阶段的计数和延迟分布）
+        self.metrics = MetricsRegistry(enabled=self.config.get("metrics_enabled", True))
+        self._metrics_export_task: asyncio.Task | None = None
+        
+        # 按需性能分析（超级管理员通过命令开启，到时自动关闭）
+        self.profiler: HandlerProfiler | None = None
+        self.memory_tracer: MemoryTracer | None = None
+        
+        # 积分数据导出（后台任务，同一时间只允许一个）
+        self._data_export_task: asyncio.Task | None = None
+        self._data_export_progress = (0, 0)
+        
+        # 修改积分的命令按用户分片串行执行，分片数为 0 时直接执行
+        self.executor: ShardExecutor | None = None
+        shard_count = self.config.get("shard_count", 8)
+        if shard_count > 0:
+            self.executor = ShardExecutor(
+                shards=shard_count,
+                queue_size=self.config.get("shard_queue_size", 32),
+                metrics=self.metrics
+            )
+        
+        # 群聊出站发送队列（按群和全局限速，文字优先于图片）
+        self.send_queue: SendQueue | None = None
+        if self.config.get("send_queue_enabled", False):
+            self.send_queue = SendQueue(
+                self._send_now,
+                group_interval=self.config.get("send_group_interval", 1.0),
+                global_rate=self.config.get("send_global_rate", 5.0),
+                metrics=self.metrics
+            )
+        
+        # 后台维护（压缩存储、清理冷却记录、归档积分记录等），间隔为 0 时不运行
+        self.maintenance: MaintenanceScheduler | None = None
+        maintenance_interval = self.config.get("maintenance_interval", 3600)
+        if maintenance_interval > 0:
+            self.maintenance = MaintenanceScheduler(
+                interval=maintenance_interval,
+                budget=self.config.get("maintenance_budget_ms", 200) / 1000,
+                metrics=self.metrics
+            )
+        
+        # 签到回复合并（同一群短时间内的签到回复合并为一条消息）
+        self.checkin_batcher: ReplyBatcher | None = None
+        if self.config.get("checkin_reply_aggregation", False):
+            self.checkin_batcher = ReplyBatcher(
+                self._send_chain,
+                max_delay=self.config.get("checkin_reply_max_delay", 2.0),
+                max_batch=self.config.get("checkin_reply_max_batch", 20),
+                metrics=self.metrics,
+                name="checkin"
+            )
         
         # 获取超级管理员列表
         bot_config = context.get_config()
@@ -56,65 +108,11 @@ class GroupMessagesPlugin(Star):
         else:
             logger.warning('未找到超级管理员ID')
         
-    def _load_disabled_groups(self):
-        """加载禁用群组列表"""
-        if not self.data_file:
-            return
-        try:
-            if self.data_file.exists():
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.disabled_groups = set(data.get('disabled_groups', []))
-                logger.info(f'已加载禁用群组列表，共 {len(self.disabled_groups)} 个群组')
-            else:
-                logger.info('禁用群组列表文件不存在，创建新文件')
-                self._save_disabled_groups()
-        except Exception as e:
-            logger.error(f'加载禁用群组列表失败: {e}')
-            self.disabled_groups = set()
-    
-    def _save_disabled_groups(self):
-        """保存禁用群组列表"""
-        if not self.data_file:
-            return
-        try:
-            data = {'disabled_groups': list(self.disabled_groups)}
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logger.info('禁用群组列表已保存')
-        except Exception as e:
-            logger.error(f'保存禁用群组列表失败: {e}')
-    
     def _is_group_enabled(self, group_id: str) -> bool:
         """检查群组是否启用插件"""
-        return group_id not in self.disabled_groups
-    
-    def _load_group_setu_settings(self):
-        """加载群组涩图设置"""
-        if not self.setu_settings_file:
-            return
-        try:
-            if self.setu_settings_file.exists():
-                with open(self.setu_settings_file, 'r', encoding='utf-8') as f:
-                    self.group_setu_settings = json.load(f)
-                logger.info(f'已加载群组涩图设置，共 {len(self.group_setu_settings)} 个群组')
-            else:
-                logger.info('群组涩图设置文件不存在，创建新文件')
-                self._save_group_setu_settings()
-        except Exception as e:
-            logger.error(f'加载群组涩图设置失败: {e}')
-            self.group_setu_settings = {}
-    
-    def _save_group_setu_settings(self):
-        """保存群组涩图设置"""
-        if not self.setu_settings_file:
-            return
-        try:
-            with open(self.setu_settings_file, 'w', encoding='utf-8') as f:
-                json.dump(self.group_setu_settings, f, ensure_ascii=False, indent=2)
-            logger.info('群组涩图设置已保存')
-        except Exception as e:
-            logger.error(f'保存群组涩图设置失败: {e}')
+        if not self.group_settings:
+            return True
+        return self.group_settings.is_enabled(group_id)
     
     def _get_group_setu_permission(self, group_id: str, setu_type: str) -> bool:
         """
@@ -127,15 +125,17 @@ class GroupMessagesPlugin(Star):
         Returns:
             是否允许
         """
+        settings = self.group_settings.get(group_id) if self.group_settings else None
+        
         # 如果群组没有设置，使用全局配置
-        if group_id not in self.group_setu_settings:
+        if settings is None or setu_type not in settings:
             if setu_type == "normal_setu":
                 return self.config.get("normal_setu_enabled", True)
             elif setu_type == "r18_setu":
                 return self.config.get("r18_setu_enabled", False)
         
         # 使用群组设置
-        return self.group_setu_settings[group_id].get(setu_type, True)
+        return settings.get(setu_type, True)
     
     def _register_modules(self):
         """
@@ -147,7 +147,7 @@ class GroupMessagesPlugin(Star):
         # 签到模块
         checkin_enabled = self.config.get("checkin_enabled", True)
         if checkin_enabled:
-            self.checkin_module = CheckInModule(self.context, self.data_dir)
+            self.checkin_module = CheckInModule(self.context, self.data_dir, self.config)
             logger.info("✓ 签到模块已加载")
         else:
             logger.info("✗ 签到模块已禁用")
@@ -185,59 +185,211 @@ class GroupMessagesPlugin(Star):
     async def initialize(self):
         """插件初始化"""
         logger.info(f"群聊消息插件初始化中...")
+        start = time.perf_counter()
         
         # 获取数据目录
         self.data_dir = StarTools.get_data_dir()
         logger.info(f"数据目录: {self.data_dir}")
         
-        # 设置数据文件路径
-        self.data_file = self.data_dir / "disabled_groups.json"
-        self.setu_settings_file = self.data_dir / "group_setu_settings.json"
-        
-        # 加载禁用群组列表
-        self._load_disabled_groups()
-        
-        # 加载群组涩图设置
-        self._load_group_setu_settings()
+        # 加载群组设置（自动迁移旧版本的禁用群组列表和涩图设置）
+        self.group_settings = GroupSettingsStore(DataManager(self.data_dir))
+        self.group_settings.load()
         
         # 注册功能模块
         self._register_modules()
+        for module in self._get_modules():
+            module.metrics = self.metrics
+        
+        # 初始化功能模块（依赖已初始化的模块并发初始化）
+        await self._initialize_modules()
+        
+        # 性能分析结果保存在 data_dir/profiles
+        self.profiler = HandlerProfiler(
+            self.data_dir / "profiles",
+            max_duration=self.config.get("profiling_max_duration", 300)
+        )
+        
+        # tracemalloc 对比结果保存在 data_dir/memory
+        self.memory_tracer = MemoryTracer(self.data_dir / "memory")
+        
+        # 定期导出 Prometheus 指标文件
+        export_interval = self.config.get("metrics_export_interval", 0)
+        if self.metrics.enabled and export_interval > 0:
+            self._metrics_export_task = asyncio.create_task(self._export_metrics_loop(export_interval))
+        
+        # 注册各模块的维护任务
+        if self.maintenance:
+            for module in self._get_modules():
+                for name, job, interval in module.maintenance_jobs():
+                    self.maintenance.register(name, job, interval)
+            self.maintenance.start()
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        logger.info(f"群聊消息插件初始化完成，耗时 {elapsed:.1f} ms")
+
+    def _get_modules(self) -> List[BaseModule]:
+        """获取所有已加载的功能模块"""
+        modules = [self.checkin_module, self.setu_module, self.robbery_module]
+        return [module for module in modules if module is not None]
+    
+    async def _initialize_modules(self):
+        """
+        并发初始化功能模块
         
-        # 初始化签到模块
-        if self.checkin_module:
+        每个模块在其依赖模块初始化完成后立即开始初始化，互不依赖的模块并发执行
+        """
+        modules = self._get_modules()
+        tasks: Dict[int, asyncio.Task] = {}
+        
+        async def init_module(module: BaseModule):
+            for dependency in module.dependencies:
+                if id(dependency) in tasks:
+                    await tasks[id(dependency)]
+            start = time.perf_counter()
             try:
-                await self.checkin_module.initialize()
-                logger.info(f"✓ CheckInModule 初始化成功")
+                await module.initialize()
+                elapsed = (time.perf_counter() - start) * 1000
+                logger.info(f"✓ {module.module_name} 初始化成功，耗时 {elapsed:.1f} ms")
             except Exception as e:
-                logger.error(f"✗ CheckInModule 初始化失败: {e}")
+                logger.error(f"✗ {module.module_name} 初始化失败: {e}")
+                # 初始化失败也标记为就绪，避免命令一直排队
+                module.mark_ready()
         
-        # 初始化涩图模块
-        if self.setu_module:
-            try:
-                await self.setu_module.initialize()
-                logger.info(f"✓ SetuModule 初始化成功")
-            except Exception as e:
-                logger.error(f"✗ SetuModule 初始化失败: {e}")
+        for module in modules:
+            tasks[id(module)] = asyncio.create_task(init_module(module))
+        await asyncio.gather(*tasks.values())
+    
+    async def _export_metrics_loop(self, interval: int):
+        """定期将指标写入 data_dir/metrics.prom"""
+        data_manager = DataManager(self.data_dir)
+        while True:
+            await asyncio.sleep(interval)
+            text = self.metrics.render_prometheus()
+            await asyncio.to_thread(data_manager.save_text, "metrics.prom", text)
+    
+    async def _run_command(self, command: str, results, event: AstrMessageEvent | None = None):
+        """
+        执行命令处理器并记录指标
         
-        # 初始化抢劫模块
-        if self.robbery_module:
-            try:
-                await self.robbery_module.initialize()
-                logger.info(f"✓ RobberyModule 初始化成功")
-            except Exception as e:
-                logger.error(f"✗ RobberyModule 初始化失败: {e}")
+        Args:
+            command: 命令名称（指标标签）
+            results: 模块返回的异步生成器
+            event: 消息事件，传入时群聊回复经由发送队列发送
+        """
+        self.metrics.incr("commands_total", command=command)
+        queued = event is not None and self.send_queue is not None and bool(event.message_obj.group_id)
+        # command_latency_seconds 只统计处理器本身；交付回复的时间（yield 挂起期间框架发送回复、
+        # 合并器收集回复，或放入发送队列）单独记录为 command_delivery_seconds，
+        # 回复在发送队列和合并器中等待的时间见 send_queue_wait_seconds、reply_batch_wait_seconds
+        handling = delivery = 0.0
+        delivering = False
+        mark = time.perf_counter()
+        try:
+            async for result in results:
+                now = time.perf_counter()
+                handling += now - mark
+                mark, delivering = now, True
+                if queued:
+                    self.send_queue.put(event.unified_msg_origin, result.chain)
+                else:
+                    yield result
+                now = time.perf_counter()
+                delivery += now - mark
+                mark, delivering = now, False
+            if queued:
+                event.stop_event()
+        except Exception:
+            self.metrics.incr("command_errors_total", command=command)
+            raise
+        finally:
+            elapsed = time.perf_counter() - mark
+            if delivering:
+                delivery += elapsed
+            else:
+                handling += elapsed
+            self.metrics.observe("command_latency_seconds", handling, command=command)
+            self.metrics.observe("command_delivery_seconds", delivery, command=command)
+            if self.profiler:
+                self.profiler.record_event()
+    
+    async def _serialized(self, event: AstrMessageEvent, results):
+        """
+        在发送者所在的分片中串行执行修改状态的命令
         
-        logger.info("群聊消息插件初始化完成")
-
+        分片队列已满时回复繁忙提示，不执行命令
+        """
+        if not self.executor:
+            async for result in results:
+                yield result
+            return
+        try:
+            future = self.executor.submit(str(event.get_sender_id()), results)
+        except ShardBusyError:
+            await results.aclose()
+            yield event.plain_result('当前请求过多，请稍后再试')
+            return
+        for result in await future:
+            yield result
+    
+    @asynccontextmanager
+    async def _economy(self, event: AstrMessageEvent):
+        """
+        等待签到模块就绪，在命令执行期间持有事件所在群的经济
+        
+        开启独立经济的群第一次使用时加载其分区；持有期间分区不会被后台维护卸载
+        """
+        await self.checkin_module.wait_ready()
+        async with self.checkin_module.use_economy(str(event.message_obj.group_id or "")) as economy:
+            yield economy
+    
+    async def _send_now(self, unified_msg_origin: str, chain: List[Any]):
+        """立即发送消息组件列表"""
+        await self.context.send_message(unified_msg_origin, MessageChain(chain))
+    
+    async def _send_chain(self, unified_msg_origin: str, chain: List[Any]):
+        """主动发送消息组件列表，开启发送队列时排队发送"""
+        if self.send_queue:
+            self.send_queue.put(unified_msg_origin, chain)
+        else:
+            await self._send_now(unified_msg_origin, chain)
+    
     async def terminate(self):
         """插件终止"""
         logger.info("群聊消息插件正在终止...")
         
-        # 保存禁用群组列表
-        self._save_disabled_groups()
+        # 停止指标导出
+        if self._metrics_export_task:
+            self._metrics_export_task.cancel()
+        
+        # 停止后台维护
+        if self.maintenance:
+            await self.maintenance.close()
+        
+        # 等待正在进行的数据导出完成
+        if self._data_export_task and not self._data_export_task.done():
+            await asyncio.wait([self._data_export_task])
+        
+        # 执行完排队中的命令
+        if self.executor:
+            await self.executor.close()
+        
+        # 发送尚未合并发送的签到回复
+        if self.checkin_batcher:
+            await self.checkin_batcher.flush_all()
+        
+        # 等待发送队列清空
+        if self.send_queue:
+            await self.send_queue.drain()
+        
+        # 停止正在进行的性能分析
+        if self.profiler:
+            self.profiler.stop(notify=False)
+        if self.memory_tracer:
+            self.memory_tracer.stop()
         
-        # 保存群组涩图设置
-        self._save_group_setu_settings()
+        # 保存群组设置
+        if self.group_settings:
+            self.group_settings.flush()
         
         # 终止签到模块
         if self.checkin_module:
@@ -303,20 +455,21 @@ class GroupMessagesPlugin(Star):
             return
         
         # 初始化群组设置（如果不存在）
-        if gid not in self.group_setu_settings:
-            self.group_setu_settings[gid] = {
-                'normal_setu': self.config.get("normal_setu_enabled", True),
-                'r18_setu': self.config.get("r18_setu_enabled", False)
-            }
+        changes = {}
+        settings = self.group_settings.get(gid) or {}
+        if 'normal_setu' not in settings:
+            changes['normal_setu'] = self.config.get("normal_setu_enabled", True)
+        if 'r18_setu' not in settings:
+            changes['r18_setu'] = self.config.get("r18_setu_enabled", False)
         
         # 更新设置
         if action == '开启':
-            self.group_setu_settings[gid][setu_type] = True
-            self._save_group_setu_settings()
+            changes[setu_type] = True
+            self.group_settings.update(gid, **changes)
             yield event.plain_result(f'已开启本群的{setu_type_name}功能')
         else:
-            self.group_setu_settings[gid][setu_type] = False
-            self._save_group_setu_settings()
+            changes[setu_type] = False
+            self.group_settings.update(gid, **changes)
             yield event.plain_result(f'已关闭本群的{setu_type_name}功能')
     
     @filter.regex(r'^(开启|关闭)群聊消息插件$')
@@ -338,20 +491,167 @@ class GroupMessagesPlugin(Star):
         message_str = event.message_str.strip()
         
         if message_str == '开启群聊消息插件':
-            if gid in self.disabled_groups:
-                self.disabled_groups.remove(gid)
-                self._save_disabled_groups()
+            if not self.group_settings.is_enabled(gid):
+                self.group_settings.update(gid, enabled=True)
                 yield event.plain_result(f'已开启本群的群聊消息插件')
             else:
                 yield event.plain_result('本群群聊消息插件已经是开启状态')
         elif message_str == '关闭群聊消息插件':
-            if gid not in self.disabled_groups:
-                self.disabled_groups.add(gid)
-                self._save_disabled_groups()
+            if self.group_settings.is_enabled(gid):
+                self.group_settings.update(gid, enabled=False)
                 yield event.plain_result(f'已关闭本群的群聊消息插件')
             else:
                 yield event.plain_result('本群群聊消息插件已经是关闭状态')
     
+    @filter.regex(r'^插件状态$')
+    async def plugin_status_command(self, event: AstrMessageEvent):
+        """查看插件运行状态和性能指标（超级管理员专用）"""
+        sender_id = str(event.get_sender_id())
+        if sender_id not in self.superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
+        uptime = int(time.time() - self.metrics.started_at)
+        lines = [f"群聊消息插件状态（运行 {uptime // 3600} 小时 {uptime % 3600 // 60} 分）"]
+        
+        for module in self._get_modules():
+            state = "就绪" if module.is_ready else "加载中"
+            lines.append(f"{module.module_name}: {state}")
+        if self.checkin_module:
+            lines.append(f"用户数：{self.checkin_module.user_count()}")
+            if self.checkin_module.isolated_groups:
+                lines.append(f"独立经济：{len(self.checkin_module.isolated_groups)} 个群，"
+                             f"{len(self.checkin_module.partitions)} 个已加载")
+        if self.group_settings:
+            lines.append(f"禁用群组数：{len(self.group_settings.disabled_groups())}")
+        if self.executor:
+            lines.append(f"命令分片：{self.executor.shards} 个，{self.executor.depth()} 条排队")
+        if self.send_queue:
+            stats = self.send_queue.stats()
+            lines.append(f"发送队列：{stats['depth']} 条排队，{stats['sessions']} 个会话发送中")
+        if self._data_export_task and not self._data_export_task.done():
+            done, total = self._data_export_progress
+            lines.append(f"数据导出：进行中 {done}/{total}")
+        if self.setu_module and self.setu_module.image_cache:
+            stats = self.setu_module.image_cache.stats()
+            lines.append(f"图片缓存：{stats['entries']} 张，{stats['bytes'] / 2**20:.1f} MB，"
+                         f"命中率 {stats['hit_rate']:.0%}")
+        if self.maintenance:
+            jobs = self.maintenance.status()
+            last_run = max((job["last_run"] for job in jobs.values()), default=0)
+            last = datetime.fromtimestamp(last_run).strftime("%H:%M:%S") if last_run else "尚未运行"
+            lines.append(f"后台维护：{len(jobs)} 个任务，上次运行 {last}")
+        
+        if self.metrics.enabled:
+            lines.append("")
+            lines.extend(self.metrics.render_summary() or ["暂无指标数据"])
+        else:
+            lines.append("性能指标未启用")
+        
+        yield event.plain_result("\n".join(lines))
+    
+    @filter.regex(r'^(开启|关闭)性能分析')
+    async def toggle_profiling_command(self, event: AstrMessageEvent):
+        """
+        开启/关闭性能分析（超级管理员专用）
+        
+        格式：开启性能分析 [采样] [N秒|N次]，默认 cProfile 模式、30 秒
+        """
+        sender_id = str(event.get_sender_id())
+        if sender_id not in self.superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
+        if not self.profiler:
+            return
+        
+        message_str = event.message_str.strip()
+        if message_str.startswith('关闭'):
+            result = self.profiler.stop(notify=False)
+            yield event.plain_result(result or '当前没有进行中的性能分析')
+            return
+        
+        if self.profiler.active:
+            yield event.plain_result('性能分析已在进行中')
+            return
+        
+        mode = "sampling" if '采样' in message_str else "cprofile"
+        duration, max_events = 30, None
+        match = re.search(r'(\d+)\s*(秒|次)', message_str)
+        if match:
+            if match.group(2) == '秒':
+                duration = int(match.group(1))
+            else:
+                duration, max_events = None, int(match.group(1))
+        
+        # 分析结束后通知发起者
+        umo = event.unified_msg_origin
+        
+        def notify(result: str):
+            asyncio.create_task(self.context.send_message(umo, MessageChain().message(result)))
+        
+        duration = self.profiler.start(mode, duration=duration, max_events=max_events, on_stop=notify)
+        limit = f"{max_events} 条命令或 {duration:.0f} 秒" if max_events else f"{duration:.0f} 秒"
+        yield event.plain_result(f'性能分析已开启（{mode}），将在 {limit} 后自动关闭')
+    
+    @filter.regex(r'^内存报告(\s+\S+)?$')
+    async def memory_report_command(self, event: AstrMessageEvent):
+        """
+        查看各模块数据结构的内存占用（超级管理员专用）
+        
+        格式：内存报告 [开始|对比]
+        - 内存报告：各模块数据结构的元素数、对象数和深度大小
+        - 内存报告 开始：开启 tracemalloc 并记录基准快照
+        - 内存报告 对比：与基准快照对比，按代码行统计的内存增长写入 memory/ 目录，然后关闭 tracemalloc
+        """
+        sender_id = str(event.get_sender_id())
+        if sender_id not in self.superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
+        if not self.memory_tracer:
+            return
+        
+        action = event.message_str.strip()[len('内存报告'):].strip()
+        if action == '开始':
+            if self.memory_tracer.active:
+                yield event.plain_result('内存追踪已在进行中，发送“内存报告 对比”查看结果')
+                return
+            await self.memory_tracer.start()
+            yield event.plain_result(f'内存追踪已开启，发送“内存报告 对比”查看这段时间的内存增长'
+                                     f'（{self.memory_tracer.max_duration / 60:.0f} 分钟后自动关闭）')
+            return
+        if action == '对比':
+            if not self.memory_tracer.active:
+                yield event.plain_result('内存追踪未开启，请先发送“内存报告 开始”')
+                return
+            path, top = await self.memory_tracer.diff()
+            lines = ["内存增长最多的代码行：", *(top or ["无变化"]), f"完整结果：memory/{path.name}"]
+            yield event.plain_result("\n".join(lines))
+            return
+        if action:
+            yield event.plain_result('格式：内存报告 [开始|对比]')
+            return
+        
+        # 模块、配置和指标注册表被多个数据结构引用，不计入
+        modules = self._get_modules()
+        if self.checkin_module:
+            modules.extend(self.checkin_module.partitions.values())
+        seen = {id(obj) for obj in (*modules, self.context, self.config, self.metrics)}
+        lines = ["内存报告（深度大小，共享对象只计入最先统计的数据结构）"]
+        for module in self._get_modules():
+            usages = [await measure(name, obj, seen) for name, obj in module.memory_usage().items()]
+            total = sum(usage.size for usage in usages)
+            lines.append(f"{module.module_name}：{format_size(total)}")
+            for usage in usages:
+                entries = f"{usage.entries} 条，" if usage.entries is not None else ""
+                lines.append(f"  {usage.name}：{entries}{usage.objects} 个对象，{format_size(usage.size)}")
+                self.metrics.set_gauge("memory_structure_bytes", usage.size,
+                                       module=module.module_name, structure=usage.name)
+        if self.memory_tracer.active:
+            lines.append(f"内存追踪进行中（{self.memory_tracer.started_at:%H:%M:%S} 开始）")
+        yield event.plain_result("\n".join(lines))
+    
     # ==================== 签到命令 ====================
     
     @filter.regex(r'^签到$')
@@ -364,8 +664,18 @@ class GroupMessagesPlugin(Star):
         
         if not self.checkin_module:
             return
-        async for result in self.checkin_module.process_checkin(event):
-            yield result
+        async with self._economy(event) as economy:
+            results = self._serialized(event, economy.process_checkin(event))
+            
+            # 群聊中开启回复合并时，回复交给合并器在窗口结束后统一发送
+            if group_id and self.checkin_batcher:
+                async for result in self._run_command("checkin", results):
+                    self.checkin_batcher.add(event.unified_msg_origin, result.chain)
+                event.stop_event()
+                return
+            
+            async for result in self._run_command("checkin", results, event):
+                yield result
     
     @filter.regex(r'^(积分|我的积分)$')
     async def points_query_command(self, event: AstrMessageEvent):
@@ -377,10 +687,11 @@ class GroupMessagesPlugin(Star):
         
         if not self.checkin_module:
             return
-        async for result in self.checkin_module.show_points_info(event):
-            yield result
+        async with self._economy(event) as economy:
+            async for result in self._run_command("points_query", economy.show_points_info(event), event):
+                yield result
     
-    @filter.regex(r'^积分记录$')
+    @filter.regex(r'^积分记录(\s+\S+)?$')
     async def points_history_command(self, event: AstrMessageEvent):
         """查询积分记录"""
         # 检查群组是否启用
@@ -390,8 +701,98 @@ class GroupMessagesPlugin(Star):
         
         if not self.checkin_module:
             return
-        async for result in self.checkin_module.points_history(event):
-            yield result
+        async with self._economy(event) as economy:
+            async for result in self._run_command("points_history", economy.points_history(event), event):
+                yield result
+    
+    @filter.regex(r'^签到日历$')
+    async def checkin_calendar_command(self, event: AstrMessageEvent):
+        """查看本月签到日历"""
+        # 检查群组是否启用
+        group_id = event.message_obj.group_id
+        if group_id and not self._is_group_enabled(str(group_id)):
+            return
+        
+        if not self.checkin_module:
+            return
+        async with self._economy(event) as economy:
+            async for result in self._run_command("checkin_calendar", economy.checkin_calendar(event),
+                                                  event):
+                yield result
+    
+    @filter.regex(r'^签到奖励表$')
+    async def reward_table_command(self, event: AstrMessageEvent):
+        """查看签到奖励的实际概率和期望积分（超级管理员专用）"""
+        sender_id = str(event.get_sender_id())
+        if sender_id not in self.superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
+        if not self.checkin_module:
+            return
+        lines = ["签到奖励表"] + self.checkin_module.reward_table.report()
+        yield event.plain_result("\n".join(lines))
+    
+    @filter.regex(r'^导出积分数据')
+    async def export_data_command(self, event: AstrMessageEvent):
+        """
+        导出积分数据（超级管理员专用）
+        
+        格式：导出积分数据 [jsonl|csv] [gzip]
+        """
+        sender_id = str(event.get_sender_id())
+        if sender_id not in self.superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
+        if not self.checkin_module:
+            return
+        
+        match = re.match(r'^导出积分数据(?:\s+(jsonl|csv))?(?:\s+(gzip|gz))?\s*$', event.message_str.strip(), re.I)
+        if not match:
+            yield event.plain_result('格式：导出积分数据 [jsonl|csv] [gzip]')
+            return
+        fmt = (match.group(1) or "jsonl").lower()
+        compress = match.group(2) is not None
+        
+        if self._data_export_task and not self._data_export_task.done():
+            done, total = self._data_export_progress
+            yield event.plain_result(f'已有导出正在进行（{done}/{total}）')
+            return
+        
+        # 在开启独立经济的群中导出该群的经济
+        async with self._economy(event) as economy:
+            total = economy.user_count()
+        output_dir = self.data_dir / "exports" / datetime.now().strftime("%Y%m%d-%H%M%S")
+        umo = event.unified_msg_origin
+        self._data_export_progress = (0, total)
+        self._data_export_task = asyncio.create_task(self._export_data(event, umo, output_dir, fmt, compress))
+        yield event.plain_result(f'开始导出 {self._data_export_progress[1]} 个用户的积分数据（{fmt}'
+                                 f'{"，gzip" if compress else ""}），完成后会通知')
+    
+    async def _export_data(self, event: AstrMessageEvent, umo: str, output_dir: Path, fmt: str, compress: bool):
+        """后台导出事件所在群的积分数据（导出期间持有该群的经济），每完成四分之一发送一次进度"""
+        reported = 0
+        
+        def progress(done: int, total: int):
+            nonlocal reported
+            self._data_export_progress = (done, total)
+            quarter = done * 4 // total
+            if quarter > reported and done < total:
+                reported = quarter
+                asyncio.create_task(self._send_chain(umo, [Plain(text=f'导出进度：{done}/{total}')]))
+        
+        start = time.perf_counter()
+        try:
+            async with self._economy(event) as economy:
+                exporter = await economy.export_data(output_dir, fmt, compress, progress=progress)
+            elapsed = time.perf_counter() - start
+            message = (f'导出完成：{exporter.users} 个用户、{exporter.history} 条积分记录，'
+                       f'{exporter.size() / 2**20:.2f} MB，耗时 {elapsed:.1f} 秒\n目录：{output_dir}')
+        except Exception as e:
+            logger.error(f"导出积分数据失败: {e}")
+            message = f'导出失败：{e}'
+        await self._send_chain(umo, [Plain(text=message)])
     
     # ==================== 抢劫和奖励命令 ====================
     
@@ -405,16 +806,46 @@ class GroupMessagesPlugin(Star):
         
         if not self.robbery_module:
             return
-        async for result in self.robbery_module.process_robbery(event):
-            yield result
+        await self.robbery_module.wait_ready()
+        async with self._economy(event) as economy:
+            results = self._serialized(event, self.robbery_module.process_robbery(event, economy))
+            async for result in self._run_command("robbery", results, event):
+                yield result
     
     @filter.regex(r'^奖励')
     async def reward_points_command(self, event: AstrMessageEvent):
         """奖励积分（超级管理员专用）"""
+        # 先检查权限，非超级管理员的请求不加载经济分区
+        sender_id = str(event.get_sender_id())
+        if sender_id not in self.superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
         if not self.robbery_module:
             return
-        async for result in self.robbery_module.reward_points(event, self.superusers):
-            yield result
+        await self.robbery_module.wait_ready()
+        async with self._economy(event) as economy:
+            results = self._serialized(event, self.robbery_module.reward_points(event, economy, self.superusers))
+            async for result in self._run_command("reward", results, event):
+                yield result
+    
+    @filter.regex(r'^批量奖励')
+    async def bulk_reward_points_command(self, event: AstrMessageEvent):
+        """批量奖励积分（超级管理员专用）"""
+        # 先检查权限，非超级管理员的请求不加载经济分区
+        sender_id = str(event.get_sender_id())
+        if sender_id not in self.superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
+        if not self.robbery_module:
+            return
+        await self.robbery_module.wait_ready()
+        async with self._economy(event) as economy:
+            results = self._serialized(event, self.robbery_module.bulk_reward_points(event, economy,
+                                                                                     self.superusers))
+            async for result in self._run_command("bulk_reward", results, event):
+                yield result
     
     # ==================== 涩图命令 ====================
     
@@ -428,6 +859,7 @@ class GroupMessagesPlugin(Star):
         
         if not self.setu_module:
             return
+        await self.setu_module.wait_ready()
         
         # 检查全局配置
         if not self.config.get("normal_setu_enabled", True):
@@ -439,8 +871,10 @@ class GroupMessagesPlugin(Star):
             yield event.plain_result("本群已禁用涩图功能")
             return
         
-        async for result in self.setu_module.get_normal_setu(event):
-            yield result
+        async with self._economy(event) as economy:
+            results = self.setu_module.get_normal_setu(event, economy)
+            async for result in self._run_command("normal_setu", results, event):
+                yield result
     
     @filter.regex(r'^来张更涩的$')
     async def r18_setu_command(self, event: AstrMessageEvent):
@@ -452,6 +886,7 @@ class GroupMessagesPlugin(Star):
         
         if not self.setu_module:
             return
+        await self.setu_module.wait_ready()
         
         # 检查全局配置
         if not self.config.get("r18_setu_enabled", False):
@@ -463,5 +898,7 @@ class GroupMessagesPlugin(Star):
             yield event.plain_result("本群已禁用R18涩图功能")
             return
         
-        async for result in self.setu_module.get_r18_setu(event):
-            yield result
+        async with self._economy(event) as economy:
+            results = self.setu_module.get_r18_setu(event, economy)
+            async for result in self._run_command("r18_setu", results, event):
+                yield result
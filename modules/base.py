@@ -2,11 +2,15 @@
 基础模块类 - 所有功能模块的父类
 """
 
+import asyncio
 from abc import ABC, abstractmethod
 from astrbot.api.star import Context
 from astrbot.api import logger
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+
+from ..utils.metrics import MetricsRegistry, NULL_METRICS
+from ..utils.maintenance import MaintenanceJob
 
 
 class BaseModule(ABC):
@@ -27,6 +31,15 @@ class BaseModule(ABC):
         self.data_dir = data_dir
         self.module_name = self.__class__.__name__
         
+        # 依赖的模块：初始化时先等待依赖模块初始化完成，处理命令前等待依赖模块就绪
+        self.dependencies: List["BaseModule"] = []
+        
+        # 就绪状态：数据加载完成后才处理命令
+        self._ready = asyncio.Event()
+        
+        # 性能指标（由插件主类注入共享的注册表，未注入时不记录）
+        self.metrics: MetricsRegistry = NULL_METRICS
+        
     @abstractmethod
     async def initialize(self):
         """
@@ -43,6 +56,53 @@ class BaseModule(ABC):
         """
         pass
     
+    def maintenance_jobs(self) -> List[Tuple[str, MaintenanceJob, float | None]]:
+        """
+        后台维护任务，由插件主类注册到维护调度器
+        
+        Returns:
+            [(任务名称, 任务协程函数, 运行间隔秒数，None 表示使用默认间隔)]
+        """
+        return []
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """
+        需要统计内存占用的数据结构，由插件主类的内存报告命令统计深度大小
+        
+        Returns:
+            {名称: 数据结构}
+        """
+        return {}
+    
+    @property
+    def is_ready(self) -> bool:
+        """模块是否已就绪"""
+        return self._ready.is_set()
+    
+    def mark_ready(self):
+        """标记模块已就绪"""
+        self._ready.set()
+    
+    async def wait_ready(self):
+        """等待模块及其依赖模块就绪（未就绪期间到达的命令会在此排队）"""
+        for dependency in self.dependencies:
+            await dependency.wait_ready()
+        await self._ready.wait()
+    
+    def stage_timer(self, stage: str):
+        """
+        记录处理阶段耗时
+        
+        Args:
+            stage: 阶段名称，如 gating（条件检查）、mutation（数据修改）、
+                   persistence（持久化）、upstream（上游请求）
+        """
+        return self.metrics.timer("stage_latency_seconds", module=self.module_name, stage=stage)
+    
+    def count(self, name: str, value: float = 1, **labels: str):
+        """计数器累加（自动附带模块名标签）"""
+        self.metrics.incr(name, value, module=self.module_name, **labels)
+    
     def log_info(self, message: str):
         """记录信息日志"""
         logger.info(f"[{self.module_name}] {message}")
@@ -5,15 +5,42 @@
 - 每次签到随机 1-49，获得对应积分
 - 如果随机到特殊数字，触发特殊奖励
 - 保留上次签到时间和最近10条积分变动记录
+- 连续签到达到指定天数时额外奖励积分
 """
 
-import random
+import asyncio
+import bisect
+import calendar
+import json
+import re
+import time
+from contextlib import asynccontextmanager
 from datetime import date, timedelta
-from typing import Dict, Tuple
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Set, Tuple
 from astrbot.api.event import AstrMessageEvent
 from astrbot.api.message_components import Plain, At
 from .base import BaseModule
-from ..utils import DataManager
+from ..utils import DataManager, RewardTable, EconomyExporter, TieredUserStore, HistoryArchive, AuditLog
+from ..utils.balance_table import BalanceTable, BalanceRecord, CHECKIN_FIELDS
+from ..utils.maintenance import MaintenanceBudget
+
+
+def _migrate_v1_to_v2(user_info: dict):
+    """版本 1 -> 2：补全连续签到字段和签到位图"""
+    user_info.setdefault("points_history", [])
+    checked_in = bool(user_info.get("last_checkin_date"))
+    # 旧数据只知道上次签到的那一天
+    user_info["current_streak"] = max(user_info.get("current_streak", 0), 1 if checked_in else 0)
+    user_info["max_streak"] = max(user_info.get("max_streak", 0), user_info["current_streak"])
+    if user_info.get("checkin_bitmap", "0") == "0":
+        user_info["checkin_bitmap"] = "1" if checked_in else "0"
+
+
+# 用户记录迁移：版本 -> 升级到下一版本的迁移函数
+USER_RECORD_MIGRATIONS = {
+    1: _migrate_v1_to_v2,
+}
 
 
 class CheckInModule(BaseModule):
@@ -27,14 +54,84 @@ class CheckInModule(BaseModule):
     - total_points: 总积分
     - last_checkin_date: 上次签到日期
     - total_checkin_count: 累计签到次数
+    - current_streak: 截至上次签到的连续签到天数
+    - max_streak: 历史最长连续签到天数
+    - checkin_bitmap: 最近 366 天的签到位图（十六进制），第 k 位表示上次签到日期 k 天前是否签到
     - points_history: 积分变动记录（最近10条）
+    - schema_version: 记录的结构版本（缺失表示版本 1）
+    
+    记录结构升级时不在启动时全量迁移：记录第一次被访问时迁移，
+    其余记录由后台任务分批逐步迁移
+    
+    开启独立经济的群各自对应一个子模块（经济分区），数据保存在 partitions/<群号>/ 中，
+    该群第一次使用时加载，长时间不使用时卸载
     """
     
-    def __init__(self, context, data_dir, config: dict | None = None):
+    # 用户记录的结构版本
+    USER_SCHEMA_VERSION = 2
+    # 后台迁移每批处理的用户数
+    MIGRATION_BATCH_SIZE = 1000
+    # 后台维护每批处理的用户数（每批之后让出事件循环）
+    MAINTENANCE_BATCH_SIZE = 200
+    # 经济分区超过该时间（秒）未使用时卸载
+    PARTITION_IDLE_SECONDS = 3600
+    
+    # 签到位图覆盖的天数
+    BITMAP_DAYS = 366
+    BITMAP_MASK = (1 << BITMAP_DAYS) - 1
+    
+    def __init__(self, context, data_dir, config: dict | None = None, partition: str | None = None):
         super().__init__(context, data_dir)
+        self.config = config if config is not None else {}
+        
+        # 独立经济：列表中的群各自使用独立的积分数据，分区本身不再分区
+        self.partition = partition
+        self.isolated_groups: Set[str] = set() if partition else self._parse_groups(
+            self.config.get("isolated_economy_groups", ""))
+        self.partitions: Dict[str, "CheckInModule"] = {}
+        self._partition_used: Dict[str, float] = {}
+        # 正在使用各分区的命令数，使用中的分区不会被卸载
+        self._partition_refs: Dict[str, int] = {}
+        # 正在卸载（保存并关闭）的分区
+        self._partitions_closing: Dict[str, asyncio.Task] = {}
         self.data_manager = DataManager(data_dir)
         self.data_file = "checkin_data.json"
-        self.user_data: Dict[str, dict] = {}
+        self.user_data: Dict[str, dict] | TieredUserStore = {}
+        
+        # 分层存储：内存中只保留最近活跃的用户，其余用户保存在 SQLite 中（0 表示全部保存在内存中）
+        self.store_file = "checkin_data.sqlite3"
+        self.user_cache_size = int(self.config.get("user_cache_size", 0))
+        
+        # 积分表：数值字段保存在内存映射的定长数组中（balances.bin），user_data 中只保留变长字段
+        self.balance_table: BalanceTable | None = None
+        self.balance_table_enabled = bool(self.config.get("balance_table_enabled", False))
+        if self.balance_table_enabled and self.user_cache_size <= 0:
+            # 全部用户保存在 JSON 中时，启动仍要解析整个文件、每次保存仍要重写整个文件，积分表只会多一条写入路径
+            self.log_error("积分表需要同时启用分层存储（内存中保留的活跃用户数大于0），已关闭积分表")
+            self.balance_table_enabled = False
+        self._load_task: asyncio.Task | None = None
+        self._migration_task: asyncio.Task | None = None
+        
+        # 积分记录归档：超出最近10条的记录按月压缩保存在 history/ 中，积分记录命令可以向前翻页
+        self.history_archive: HistoryArchive | None = None
+        if self.config.get("history_archive_enabled", True):
+            self.history_archive = HistoryArchive(self.data_dir / "history")
+        self._archive_task: asyncio.Task | None = None
+        
+        # 审计日志：每次积分变动写入 audit/audit.jsonl（后台批量写出，按大小轮转），分区共用全局的审计日志
+        self.audit_log: AuditLog | None = None
+        self.audit_log_enabled = bool(self.config.get("audit_log_enabled", True))
+        
+        # 后台维护：早于该天数的积分记录移入归档；零积分且超过该天数不活跃的用户被清除（0 表示不执行）
+        self.history_stale_days = int(self.config.get("history_stale_days", 30))
+        self.purge_inactive_days = int(self.config.get("purge_inactive_days", 0))
+        # 预算用完时各维护任务处理到的最后一个用户ID
+        self._maintenance_cursors: Dict[str, str] = {}
+        
+        # 导出期间被修改的用户在修改前的副本（写时复制），未在导出时为 None
+        self._export_originals: Dict[str, dict] | None = None
+        # 导出快照中尚未写出的用户ID，只有这些用户需要保留副本
+        self._export_pending: Set[str] = set()
         
         # ============ 签到配置区域（可自定义） ============
         
@@ -68,38 +165,663 @@ class CheckInModule(BaseModule):
             }
         }
         
+        # 以上概率均为实际触发概率，普通签到占剩余概率
+        # 也可以通过配置项 checkin_rewards（JSON）覆盖
+        
+        # 连续签到奖励：连续签到达到天数后，每次签到额外获得的积分（取满足条件的最高档）
+        # 格式: 连续天数: 额外积分，可通过配置项 streak_bonus（JSON）覆盖
+        self.streak_bonus = {
+            3: 5,
+            7: 15,
+            30: 50
+        }
+        
         # ================================================
+        
+        self.reward_table = self._load_reward_table()
+        self._streak_thresholds, self._streak_bonuses = self._load_streak_bonus()
+    
+    @staticmethod
+    def _parse_groups(value) -> Set[str]:
+        """解析群号列表（逗号或空白分隔的字符串，或列表）"""
+        items = value if isinstance(value, (list, tuple)) else re.split(r"[,，\s]+", str(value or ""))
+        return {str(item).strip() for item in items if str(item).strip()}
+    
+    def _load_reward_table(self) -> RewardTable:
+        """编译签到奖励表，配置无效时使用默认奖励"""
+        rewards_config = self.config.get("checkin_rewards", "")
+        if rewards_config:
+            try:
+                data = json.loads(rewards_config) if isinstance(rewards_config, str) else rewards_config
+                table = RewardTable.from_config(data)
+                self.min_points = int(data.get("min_points", self.min_points))
+                self.max_points = int(data.get("max_points", self.max_points))
+                self.log_info("已加载自定义签到奖励表")
+                return table
+            except (ValueError, TypeError, AttributeError) as e:
+                self.log_error(f"签到奖励配置无效，使用默认奖励: {e}")
+        return RewardTable.compile(self.min_points, self.max_points,
+                                   self.special_rewards, self.range_rewards)
+    
+    def _load_streak_bonus(self) -> Tuple[List[int], List[int]]:
+        """整理连续签到奖励档位，按天数升序排列便于二分查找"""
+        bonus_config = self.config.get("streak_bonus", "")
+        tiers = self.streak_bonus
+        if bonus_config:
+            try:
+                data = json.loads(bonus_config) if isinstance(bonus_config, str) else bonus_config
+                tiers = {int(days): int(bonus) for days, bonus in data.items()}
+            except (ValueError, TypeError, AttributeError) as e:
+                self.log_error(f"连续签到奖励配置无效，使用默认奖励: {e}")
+        ordered = sorted((days, bonus) for days, bonus in tiers.items() if days > 0)
+        return [days for days, _ in ordered], [bonus for _, bonus in ordered]
+    
+    def get_streak_bonus(self, streak: int) -> int:
+        """获取连续签到天数对应的额外积分"""
+        index = bisect.bisect_right(self._streak_thresholds, streak)
+        return self._streak_bonuses[index - 1] if index else 0
     
     async def initialize(self):
-        """初始化签到模块"""
-        self.user_data = self.data_manager.load_json(self.data_file, default={})
-        self.log_info(f"已加载 {len(self.user_data)} 个用户的签到数据")
+        """初始化签到模块（签到数据在后台线程中加载，加载完成前命令会排队等待）"""
+        self._load_task = asyncio.create_task(self._load_data())
+        if self.partition is not None:
+            return
+        if self.audit_log_enabled:
+            self.audit_log = AuditLog(
+                self.data_dir / "audit",
+                max_bytes=int(float(self.config.get("audit_log_max_mb", 10)) * 2**20),
+                backups=int(self.config.get("audit_log_backups", 5)),
+                metrics=self.metrics
+            )
+        for line in self.reward_table.report():
+            self.log_info(f"签到奖励：{line}")
         self.log_info("签到模块初始化完成")
     
+    @property
+    def tiered(self) -> bool:
+        """是否使用分层存储"""
+        return isinstance(self.user_data, TieredUserStore)
+    
+    async def _load_data(self):
+        """在工作线程中加载签到数据"""
+        start = time.perf_counter()
+        try:
+            if self.balance_table_enabled:
+                self.balance_table = await asyncio.to_thread(self._open_balance_table)
+            if self.user_cache_size > 0:
+                self.user_data = await asyncio.to_thread(self._open_store)
+            else:
+                self.user_data = await asyncio.to_thread(self._load_json_data)
+            if not self.balance_table_enabled and BalanceTable.exists(self.data_dir):
+                await asyncio.to_thread(self._fold_balance_table)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.log_info(f"已加载 {len(self.user_data)} 个用户的签到数据，耗时 {elapsed:.1f} ms")
+            self._migration_task = asyncio.create_task(self._migrate_in_background())
+        except Exception as e:
+            self.log_error(f"加载签到数据失败: {e}")
+        finally:
+            self.mark_ready()
+    
+    def _open_store(self) -> TieredUserStore:
+        """打开分层存储，首次启用时从 JSON 文件导入"""
+        store = TieredUserStore(self.data_dir / self.store_file, self.user_cache_size, self.metrics)
+        store.open()
+        if len(store) == 0 and self.data_manager.file_exists(self.data_file):
+            records = self.data_manager.load_json(self.data_file, {})
+            store.import_records(records)
+            # 改名保留原文件，避免之后关闭分层存储时读到过期数据
+            self._retire_file(self.data_file)
+            self.log_info(f"已将 {len(records)} 个用户从 {self.data_file} 导入分层存储")
+        return store
+    
+    def _retire_file(self, filename: str):
+        """数据已迁移到另一种存储后，将原文件改名为 .migrated"""
+        path = self.data_dir / filename
+        path.replace(path.with_name(f"{filename}.migrated"))
+    
+    def _load_json_data(self) -> Dict[str, dict]:
+        """加载 JSON 签到数据，关闭分层存储后首次启动时从 SQLite 读回"""
+        store_path = self.data_dir / self.store_file
+        if not self.data_manager.file_exists(self.data_file) and store_path.exists():
+            records = TieredUserStore.read_all(store_path)
+            if self.data_manager.save_json(self.data_file, records, indent=None):
+                self._retire_file(self.store_file)
+            self.log_info(f"已从 {self.store_file} 读回 {len(records)} 个用户")
+            return records
+        return self.data_manager.load_json(self.data_file, {})
+    
+    def _open_balance_table(self) -> BalanceTable:
+        """映射积分表"""
+        table = BalanceTable(self.data_dir)
+        table.open()
+        self.log_info(f"已映射积分表，共 {len(table)} 个用户")
+        return table
+    
+    def _fold_balance_table(self):
+        """关闭积分表后首次启动：将积分表中的数值字段写回用户记录"""
+        table = BalanceTable(self.data_dir)
+        table.open()
+        try:
+            def fold(user_id: str, record: dict) -> bool:
+                slot = table.slot(user_id)
+                if slot is None or "total_points" in record:
+                    return False
+                record.update(BalanceRecord(table, slot, {}, CHECKIN_FIELDS))
+                return True
+            
+            if self.tiered:
+                batch = {}
+                for user_id in self.user_data:
+                    record = self.user_data.peek(user_id)
+                    if fold(user_id, record):
+                        batch[user_id] = record
+                    if len(batch) >= 10000:
+                        self.user_data.import_records(batch)
+                        batch = {}
+                self.user_data.import_records(batch)
+            else:
+                for user_id, record in self.user_data.items():
+                    fold(user_id, record)
+                self.data_manager.save_json(self.data_file, self.user_data)
+        finally:
+            table.close()
+        for path in (table.bin_path, table.ids_path):
+            self._retire_file(path.name)
+        self.log_info("已将积分表写回用户记录")
+    
+    async def _migrate_in_background(self):
+        """分批迁移尚未被访问的旧版本记录，每批之间让出事件循环"""
+        # 分层存储只迁移内存中的用户，磁盘上的用户在读回时迁移
+        user_ids = self.user_data.resident_ids() if self.tiered else list(self.user_data)
+        migrated = 0
+        for start in range(0, len(user_ids), self.MIGRATION_BATCH_SIZE):
+            for user_id in user_ids[start:start + self.MIGRATION_BATCH_SIZE]:
+                user_info = self.user_data.get(user_id)
+                if user_info is not None and self._migrate_record(user_info):
+                    self.mark_modified(user_id, user_info)
+                    migrated += 1
+            await asyncio.sleep(0)
+        if migrated:
+            self.count("records_migrated_total", migrated, trigger="background")
+            self.log_info(f"已在后台将 {migrated} 个用户记录迁移到版本 {self.USER_SCHEMA_VERSION}")
+    
     async def terminate(self):
         """终止签到模块，保存数据"""
+        for economy in list(self.partitions.values()):
+            await economy.terminate()
+        self.partitions.clear()
+        # 数据尚未加载完成时不能保存，否则会用空数据覆盖文件
+        if self._load_task:
+            await self._load_task
+        if self._migration_task:
+            self._migration_task.cancel()
         self.save_data()
+        if self._archive_task:
+            await self._archive_task
+        if self.history_archive is not None:
+            self.history_archive.flush()
+        if self.tiered:
+            self.user_data.close()
+        if self.balance_table is not None:
+            self.balance_table.close()
+        if self.audit_log is not None and self.partition is None:
+            await self.audit_log.close()
         self.log_info("签到模块已终止，数据已保存")
     
+    # ==================== 经济分区 ====================
+    
+    async def load_partition(self, group_id: str) -> "CheckInModule":
+        """
+        获取群的经济，开启独立经济的群第一次使用时加载其分区
+        
+        Args:
+            group_id: 群号（私聊为空字符串）
+        
+        Returns:
+            群的经济分区，未开启独立经济的群返回自身
+        """
+        if group_id not in self.isolated_groups:
+            return self
+        while True:
+            closing = self._partitions_closing.get(group_id)
+            if closing is not None:
+                # 分区正在卸载，等它保存完再重新加载，避免读到尚未写回的数据
+                await asyncio.wait([closing])
+                continue
+            economy = self.partitions.get(group_id)
+            if economy is None:
+                data_dir = self.data_dir / "partitions" / group_id
+                data_dir.mkdir(parents=True, exist_ok=True)
+                economy = CheckInModule(self.context, data_dir, self.config, partition=group_id)
+                economy.metrics = self.metrics
+                economy.audit_log = self.audit_log
+                # 先登记再加载，同时到达的命令等待同一次加载
+                self.partitions[group_id] = economy
+                await economy.initialize()
+                await economy.wait_ready()
+                self.count("economy_partitions_loaded_total")
+                self.log_info(f"已加载群 {group_id} 的经济分区（{economy.user_count()} 个用户）")
+            else:
+                await economy.wait_ready()
+            # 等待期间分区被卸载时重新加载
+            if self.partitions.get(group_id) is economy:
+                break
+        self._partition_used[group_id] = time.monotonic()
+        return economy
+    
+    @asynccontextmanager
+    async def use_economy(self, group_id: str) -> AsyncIterator["CheckInModule"]:
+        """
+        获取群的经济并在使用期间持有它：命令执行完之前（包括等待上游请求期间）分区不会被卸载
+        
+        Args:
+            group_id: 群号（私聊为空字符串）
+        """
+        economy = await self.load_partition(group_id)
+        if economy is self:
+            yield economy
+            return
+        self._partition_refs[group_id] = self._partition_refs.get(group_id, 0) + 1
+        try:
+            yield economy
+        finally:
+            remaining = self._partition_refs[group_id] - 1
+            if remaining:
+                self._partition_refs[group_id] = remaining
+            else:
+                del self._partition_refs[group_id]
+            self._partition_used[group_id] = time.monotonic()
+    
+    async def _unload_idle_partitions(self, budget: MaintenanceBudget) -> int:
+        """保存并卸载长时间未使用的经济分区"""
+        now = time.monotonic()
+        unloaded = 0
+        for group_id, economy in list(self.partitions.items()):
+            if (self.partitions.get(group_id) is not economy or not economy.is_ready
+                    or self._partition_refs.get(group_id)
+                    or now - self._partition_used.get(group_id, now) < self.PARTITION_IDLE_SECONDS):
+                continue
+            del self.partitions[group_id]
+            self._partition_used.pop(group_id, None)
+            closing = self._partitions_closing[group_id] = asyncio.create_task(economy.terminate())
+            try:
+                await closing
+            finally:
+                self._partitions_closing.pop(group_id, None)
+            unloaded += 1
+            if not await budget.checkpoint():
+                break
+        if unloaded:
+            self.log_info(f"已卸载 {unloaded} 个空闲的经济分区")
+        return unloaded
+    
     def save_data(self):
         """保存签到数据"""
-        self.data_manager.save_json(self.data_file, self.user_data)
+        with self.stage_timer("persistence"):
+            if self.tiered:
+                self.user_data.flush()
+            else:
+                self.data_manager.save_json(self.data_file, self.user_data)
+            if self.balance_table is not None:
+                self.balance_table.flush()
+        self._flush_history_archive()
+    
+    def _flush_history_archive(self):
+        """归档缓冲区攒满或等待过久时，在工作线程中写出一个压缩块"""
+        archive = self.history_archive
+        if archive is None or not archive.should_flush():
+            return
+        if self._archive_task and not self._archive_task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            archive.flush()
+            return
+        batch, pending = archive.take_pending()
+        self.count("history_archived_total", sum(len(entries) for entries in pending.values()))
+        self._archive_task = asyncio.create_task(self._write_archive_batch(batch, pending))
+    
+    async def _write_archive_batch(self, batch: int, pending: Dict[str, List[dict]]):
+        """在工作线程中写出一批归档记录，写完之前查询仍能从缓冲区快照中读到它们"""
+        try:
+            await asyncio.to_thread(self.history_archive.write, batch, pending)
+        finally:
+            self.history_archive.finish_write(batch)
+    
+    def user_count(self) -> int:
+        """用户总数（包括不在内存中的用户）"""
+        return len(self.user_data)
     
     def get_user_info(self, user_id: str) -> dict:
         """获取用户信息，不存在则创建"""
-        if user_id not in self.user_data:
-            self.user_data[user_id] = {
+        user_info = self.user_data.get(user_id)
+        created = user_info is None
+        if created:
+            user_info = {
                 "total_points": 0,          # 总积分
                 "last_checkin_date": None,  # 上次签到日期
                 "total_checkin_count": 0,   # 总签到次数
-                "points_history": []        # 积分变动记录（最近10条）
+                "current_streak": 0,        # 连续签到天数
+                "max_streak": 0,            # 最长连续签到天数
+                "checkin_bitmap": "0",      # 最近366天签到位图
+                "points_history": [],       # 积分变动记录（最近10条）
+                "schema_version": self.USER_SCHEMA_VERSION
             }
-        return self.user_data[user_id]
+            self.user_data[user_id] = user_info
+        if user_info.get("schema_version", 1) < self.USER_SCHEMA_VERSION and self._migrate_record(user_info):
+            self.mark_modified(user_id, user_info)
+            self.count("records_migrated_total", trigger="read")
+        if self.balance_table is not None:
+            user_info = self._bind_balance(user_id, user_info)
+        if (not created and user_id in self._export_pending
+                and self._export_originals is not None and user_id not in self._export_originals):
+            # 导出进行中且该用户尚未写出：保留导出开始时的版本
+            self._export_originals[user_id] = self._copy_record(user_info)
+        return user_info
+    
+    def _bind_balance(self, user_id: str, record: dict) -> BalanceRecord:
+        """将用户记录与积分表中的数值字段组合，记录中残留的数值字段移入积分表"""
+        view = BalanceRecord(self.balance_table, self.balance_table.slot(user_id, create=True),
+                             record, CHECKIN_FIELDS)
+        moved = [key for key in CHECKIN_FIELDS if key in record]
+        for key in moved:
+            view[key] = record[key]
+        if moved:
+            self.mark_modified(user_id, record)
+        return view
+    
+    def mark_modified(self, user_id: str, user_info: dict):
+        """
+        标记用户记录已修改（分层存储只写回被标记的记录）
+        
+        通过 add_points_record 记录积分变动时自动标记；不经过它修改记录时需要调用
+        """
+        if self.tiered:
+            record = user_info.extra if isinstance(user_info, BalanceRecord) else user_info
+            self.user_data.mark_dirty(user_id, record)
+    
+    def _migrate_record(self, user_info: dict) -> bool:
+        """
+        将用户记录逐版本迁移到当前版本
+        
+        Returns:
+            是否进行了迁移
+        """
+        version = user_info.get("schema_version", 1)
+        if version >= self.USER_SCHEMA_VERSION:
+            return False
+        while version < self.USER_SCHEMA_VERSION:
+            USER_RECORD_MIGRATIONS[version](user_info)
+            version += 1
+        user_info["schema_version"] = version
+        return True
+    
+    
+    @staticmethod
+    def _copy_record(user_info: dict) -> dict:
+        """复制用户记录（积分记录条目创建后不再修改，只需复制列表）"""
+        record = dict(user_info)
+        record["points_history"] = list(user_info.get("points_history", []))
+        return record
+    
+    def _peek_user(self, user_id: str) -> dict:
+        """读取用户记录（分层存储时不把冷数据读入内存）"""
+        record = self.user_data.peek(user_id) if self.tiered else self.user_data[user_id]
+        if self.balance_table is not None:
+            return BalanceRecord(self.balance_table, self.balance_table.slot(user_id), record, CHECKIN_FIELDS)
+        return record
+    
+    async def export_data(self, output_dir: Path, fmt: str = "jsonl", compress: bool = False,
+                          chunk_size: int = 2000,
+                          progress: Callable[[int, int], None] | None = None) -> EconomyExporter:
+        """
+        导出积分数据
+        
+        导出内容为开始导出时的一致快照：开始时只记录用户ID列表，之后被修改的用户
+        在第一次修改前保留副本（已写出的用户和导出开始后新建的用户不再保留）。
+        每批记录在事件循环中复制，在工作线程中写出。
+        
+        Args:
+            output_dir: 输出目录
+            fmt: "jsonl" 或 "csv"
+            compress: 是否 gzip 压缩
+            chunk_size: 每批用户数
+            progress: 进度回调 progress(已导出用户数, 总用户数)
+        
+        Returns:
+            已关闭的导出器（包含导出数量）
+        """
+        if self._export_originals is not None:
+            raise RuntimeError("已有导出正在进行")
+        exporter = EconomyExporter(output_dir, fmt, compress)
+        user_ids = list(self.user_data)
+        self._export_originals = {}
+        self._export_pending = set(user_ids)
+        try:
+            await asyncio.to_thread(exporter.open)
+            for start in range(0, len(user_ids), chunk_size):
+                chunk = []
+                for user_id in user_ids[start:start + chunk_size]:
+                    original = self._export_originals.pop(user_id, None)
+                    self._export_pending.discard(user_id)
+                    chunk.append((user_id, original or self._copy_record(self._peek_user(user_id))))
+                await asyncio.to_thread(exporter.write_chunk, chunk)
+                if progress:
+                    progress(min(start + chunk_size, len(user_ids)), len(user_ids))
+        finally:
+            self._export_originals = None
+            self._export_pending = set()
+            await asyncio.to_thread(exporter.close)
+        self.log_info(f"已导出 {exporter.users} 个用户、{exporter.history} 条积分记录到 {output_dir}")
+        return exporter
+    
+    # ==================== 后台维护 ====================
+    
+    def maintenance_jobs(self):
+        """压缩存储、归档过期积分记录、清除不活跃的零积分用户（包括已加载的经济分区），卸载空闲分区"""
+        jobs = [("checkin.compact", self._each_economy(CheckInModule._compact_storage), None)]
+        if self.history_archive is not None and self.history_stale_days > 0:
+            jobs.append(("checkin.archive_history", self._each_economy(CheckInModule._archive_stale_history), None))
+        if self.purge_inactive_days > 0:
+            jobs.append(("checkin.purge_inactive", self._each_economy(CheckInModule._purge_inactive_users),
+                         24 * 3600))
+        if self.isolated_groups:
+            jobs.append(("checkin.unload_partitions", self._unload_idle_partitions, None))
+        return jobs
+    
+    def memory_usage(self):
+        """积分表、用户数据、积分记录归档缓冲区、审计日志队列，以及已加载的经济分区"""
+        usage = {}
+        if self.balance_table is not None:
+            usage["balance_table"] = self.balance_table
+        usage["user_data"] = self.user_data
+        if self.history_archive is not None:
+            usage["history_archive"] = self.history_archive
+        if self._export_originals is not None:
+            usage["export_originals"] = self._export_originals
+        if self.audit_log is not None and self.partition is None:
+            usage["audit_log"] = self.audit_log
+        for group_id, economy in self.partitions.items():
+            usage.update({f"partitions/{group_id}/{name}": value for name, value in economy.memory_usage().items()})
+        return usage
+    
+    def _each_economy(self, job: Callable[["CheckInModule", MaintenanceBudget], Awaitable[int]]):
+        """将维护任务依次应用到全局经济和已加载的经济分区"""
+        async def run(budget: MaintenanceBudget) -> int:
+            total = 0
+            for economy in [self, *self.partitions.values()]:
+                if economy.is_ready:
+                    total += await job(economy, budget)
+                if budget.exhausted:
+                    break
+            return total
+        return run
+    
+    async def _compact_storage(self, budget: MaintenanceBudget) -> int:
+        """合并 SQLite 的 WAL，按用户整理过去月份的积分记录归档"""
+        compacted = 0
+        if self.tiered:
+            compacted += await asyncio.to_thread(self.user_data.checkpoint)
+        if self.history_archive is not None:
+            this_month = date.today().isoformat()[:7]
+            for month in await asyncio.to_thread(self.history_archive.compactable_months, this_month):
+                compacted += await asyncio.to_thread(self.history_archive.compact_month, month)
+                if not await budget.checkpoint():
+                    break
+        return compacted
+    
+    async def _walk_users(self, job: str, budget: MaintenanceBudget, visit: Callable[[str], bool]) -> int:
+        """
+        按用户ID顺序分批遍历全部用户，预算用完时记住最后处理的ID，下次从其后继续
+        
+        分层存储时每批用 WHERE id > ? LIMIT n 从数据库读取ID，不把全部ID读入内存
+        
+        Returns:
+            visit 返回 True 的用户数
+        """
+        size = self.MAINTENANCE_BATCH_SIZE
+        if self.tiered:
+            def next_batch(after: str) -> List[str]:
+                return self.user_data.ids_after(after, size)
+        else:
+            # 用户全部在内存中，每轮排序一次ID，按位置续接
+            ids = sorted(self.user_data)
+            
+            def next_batch(after: str) -> List[str]:
+                start = bisect.bisect_right(ids, after)
+                return ids[start:start + size]
+        last_id = self._maintenance_cursors.pop(job, "")
+        changed = 0
+        while True:
+            batch = next_batch(last_id)
+            if not batch:
+                break
+            changed += sum(1 for user_id in batch if visit(user_id))
+            last_id = batch[-1]
+            if len(batch) < size:
+                break
+            if not await budget.checkpoint():
+                self._maintenance_cursors[job] = last_id
+                break
+        if changed:
+            self.save_data()
+        return changed
+    
+    def _peek_raw(self, user_id: str) -> dict | None:
+        """读取用户记录本身（分层存储时不把冷数据读入内存），不存在时返回 None"""
+        return self.user_data.peek(user_id) if self.tiered else self.user_data.get(user_id)
+    
+    async def _archive_stale_history(self, budget: MaintenanceBudget) -> int:
+        """将早于 history_stale_days 天的积分记录移入归档"""
+        # 导出期间不修改记录，避免绕过写时复制
+        if self._export_originals is not None:
+            return 0
+        cutoff = (date.today() - timedelta(days=self.history_stale_days)).isoformat()
+        
+        def visit(user_id: str) -> bool:
+            record = self._peek_raw(user_id)
+            history = record.get("points_history") if record else None
+            if not history or history[0]["date"] >= cutoff:
+                return False
+            # 记录按时间顺序追加，过期的记录都在开头
+            stale = next((i for i, entry in enumerate(history) if entry["date"] >= cutoff), len(history))
+            self.history_archive.append(user_id, history[:stale])
+            record["points_history"] = history[stale:]
+            if self.tiered:
+                self.user_data.write_back(user_id, record)
+            return True
+        
+        return await self._walk_users("archive_history", budget, visit)
+    
+    async def _purge_inactive_users(self, budget: MaintenanceBudget) -> int:
+        """清除积分为 0 且超过 purge_inactive_days 天没有签到和积分变动的用户"""
+        if self._export_originals is not None:
+            return 0
+        cutoff = (date.today() - timedelta(days=self.purge_inactive_days)).isoformat()
+        
+        def visit(user_id: str) -> bool:
+            record = self._peek_raw(user_id)
+            if record is None:
+                return False
+            history = record.get("points_history") or []
+            if self.balance_table is not None:
+                record = BalanceRecord(self.balance_table, self.balance_table.slot(user_id), record, CHECKIN_FIELDS)
+            if record.get("total_points", 0) != 0:
+                return False
+            last_active = max([record.get("last_checkin_date") or ""] + [entry["date"][:10] for entry in history[-1:]])
+            if last_active >= cutoff:
+                return False
+            # 积分表中的槽位保留（数值均为 0），用户再次出现时重新初始化
+            del self.user_data[user_id]
+            return True
+        
+        purged = await self._walk_users("purge_inactive", budget, visit)
+        if purged:
+            self.log_info(f"已清除 {purged} 个不活跃的零积分用户")
+        return purged
+    
+    def update_streak(self, user_info: dict, today: date) -> int:
+        """
+        根据上次签到日期更新连续签到天数和签到位图，O(1)，不查询历史记录
+        
+        Args:
+            user_info: 用户信息字典（last_checkin_date 尚未更新为今天）
+            today: 今天的日期
+        
+        Returns:
+            更新后的连续签到天数
+        """
+        last_date = user_info.get("last_checkin_date")
+        bitmap = int(user_info.get("checkin_bitmap", "0"), 16)
+        streak = user_info.get("current_streak", 0)
+        
+        if last_date:
+            gap = (today - date.fromisoformat(last_date)).days
+            # 旧数据没有位图时，至少记录上次签到的那一天
+            if not bitmap:
+                bitmap = 1
+                streak = max(streak, 1)
+            if gap == 0:
+                # 今天已经记录过，不重复累加
+                streak = max(streak, 1)
+            elif gap < 0:
+                # 上次签到日期在未来（时钟回拨、迁移或手动修改的数据），无法对齐位图，从今天重新开始
+                bitmap, streak = 0, 1
+            else:
+                bitmap = (bitmap << gap) & self.BITMAP_MASK if gap < self.BITMAP_DAYS else 0
+                streak = streak + 1 if gap == 1 else 1
+        else:
+            streak = 1
+        
+        user_info["checkin_bitmap"] = format(bitmap | 1, "x")
+        user_info["current_streak"] = streak
+        user_info["max_streak"] = max(user_info.get("max_streak", 0), streak)
+        return streak
+    
+    def get_current_streak(self, user_info: dict, today: date) -> int:
+        """获取截至今天仍然有效的连续签到天数（昨天和今天都没签到则为 0）"""
+        last_date = user_info.get("last_checkin_date")
+        if not last_date or (today - date.fromisoformat(last_date)).days > 1:
+            return 0
+        return user_info.get("current_streak", 0) or 1
+    
+    def has_checked_in_on(self, user_info: dict, day: date) -> bool:
+        """查询某天是否签到（仅支持最近 366 天）"""
+        last_date = user_info.get("last_checkin_date")
+        if not last_date:
+            return False
+        offset = (date.fromisoformat(last_date) - day).days
+        if offset < 0 or offset >= self.BITMAP_DAYS:
+            return False
+        bitmap = int(user_info.get("checkin_bitmap", "0"), 16) or 1
+        return bool(bitmap >> offset & 1)
     
     def add_points_record(self, user_info: dict, points: int, action_type: str, 
-                         description: str, source_user_id: str | None = None):
+                         description: str, source_user_id: str | None = None, user_id: str | None = None,
+                         group_id: str | None = None):
         """
-        添加积分变动记录
+        添加积分变动记录（同时写入审计日志）
         
         Args:
             user_info: 用户信息字典
@@ -107,6 +829,8 @@ class CheckInModule(BaseModule):
             action_type: 动作类型，如 "checkin", "rob", "被抢劫" 等
             description: 描述信息
             source_user_id: 来源用户ID（如果有）
+            user_id: 用户ID（用于归档超出最近10条的记录）
+            group_id: 发生变动的群号（私聊为空，用于审计日志）
         """
         from datetime import datetime
         
@@ -120,47 +844,57 @@ class CheckInModule(BaseModule):
         }
         
         user_info["points_history"].append(record)
+        if user_id is not None:
+            self.mark_modified(user_id, user_info)
+        
+        if self.audit_log is not None:
+            self.audit_log.record(
+                user=user_id, action=action_type, points=points, balance=record["balance"],
+                source=source_user_id, group=str(group_id or self.partition or "") or None,
+                description=description
+            )
         
-        # 只保留最近10条记录
-        if len(user_info["points_history"]) > 10:
-            user_info["points_history"] = user_info["points_history"][-10:]
+        # 只保留最近10条记录，更早的记录移入归档
+        history = user_info["points_history"]
+        if len(history) > 10:
+            if self.history_archive is not None and user_id is not None:
+                self.history_archive.append(user_id, history[:-10])
+            user_info["points_history"] = history[-10:]
+    
+    def apply_points_batch(self, changes: Dict[str, int], action_type: str, description: str,
+                           source_user_id: str | None = None, group_id: str | None = None) -> Dict[str, dict]:
+        """
+        批量变动积分：每个用户只追加一条记录，最后只保存一次
+        
+        Args:
+            changes: {用户ID: 变动的积分}
+            action_type: 动作类型
+            description: 描述信息
+            source_user_id: 来源用户ID（如果有）
+            group_id: 发生变动的群号（用于审计日志）
+        
+        Returns:
+            {用户ID: 用户信息}
+        """
+        updated = {}
+        with self.stage_timer("mutation"):
+            for user_id, points in changes.items():
+                user_info = self.get_user_info(user_id)
+                user_info["total_points"] += points
+                self.add_points_record(user_info, points, action_type, description, source_user_id,
+                                       user_id=user_id, group_id=group_id)
+                updated[user_id] = user_info
+        self.save_data()
+        return updated
     
     def calculate_points(self) -> Tuple[int, str]:
         """
         计算签到点数
         返回: (积分, 特殊描述)
         
-        逻辑：
-        1. 优先判断范围型奖励，根据概率触发
-        2. 再判断固定积分奖励，根据概率触发
-        3. 如果都未触发，返回普通签到积分（10-49）
+        从预编译的奖励表中抽取，每次签到只消耗一个随机数
         """
-        # 1. 优先判断范围型奖励（按范围最大值从高到低排序）
-        sorted_range_rewards = sorted(self.range_rewards.items(), 
-                                     key=lambda x: x[0][1], reverse=True)
-        
-        for (min_val, max_val), config in sorted_range_rewards:
-            probability = config.get("probability", 0)
-            if random.random() < probability:
-                # 触发范围奖励，从范围内随机
-                points = random.randint(min_val, max_val)
-                description = config.get("description", "")
-                return points, description
-        
-        # 2. 判断固定积分奖励（按积分从高到低排序）
-        sorted_rewards = sorted(self.special_rewards.items(), 
-                               key=lambda x: x[0], reverse=True)
-        
-        for points, config in sorted_rewards:
-            probability = config.get("probability", 0)
-            if random.random() < probability:
-                # 触发特殊奖励
-                description = config.get("description", "")
-                return points, description
-        
-        # 3. 未触发任何特殊奖励，返回普通签到积分
-        normal_points = random.randint(self.min_points, self.max_points)
-        return normal_points, ""
+        return self.reward_table.draw()
     
     def get_reward_message(self, points: int, special_desc: str) -> str:
         """
@@ -199,13 +933,15 @@ class CheckInModule(BaseModule):
         """处理签到逻辑"""
         user_id = str(event.get_sender_id())  # 用于数据存储（跨群聊通用）
         user_name = event.get_sender_name()
-        today = date.today().isoformat()
+        today_date = date.today()
+        today = today_date.isoformat()
         
-        # 获取用户信息
-        user_info = self.get_user_info(user_id)
+        # 获取用户信息，检查今天是否已签到
+        with self.stage_timer("gating"):
+            user_info = self.get_user_info(user_id)
+            already_checked_in = user_info["last_checkin_date"] == today
         
-        # 检查今天是否已签到
-        if user_info["last_checkin_date"] == today:
+        if already_checked_in:
             message_parts = [
                 At(qq=user_id),
                 Plain(text=f" \n你今天已经签到过了\n\n当前积分: {user_info['total_points']} 积分")
@@ -213,26 +949,36 @@ class CheckInModule(BaseModule):
             yield event.chain_result(message_parts)
             return
         
-        # 计算点数
-        points, special_desc = self.calculate_points()
-        
-        # 更新用户数据
-        user_info["total_points"] += points
-        user_info["last_checkin_date"] = today
-        user_info["total_checkin_count"] += 1
-        
-        # 记录积分变动
-        desc = special_desc if special_desc else f"签到获得 {points} 积分"
-        self.add_points_record(user_info, points, "签到", desc)
+        with self.stage_timer("mutation"):
+            # 计算点数
+            points, special_desc = self.calculate_points()
+            
+            # 连续签到
+            streak = self.update_streak(user_info, today_date)
+            streak_bonus = self.get_streak_bonus(streak)
+            
+            # 更新用户数据
+            user_info["total_points"] += points + streak_bonus
+            user_info["last_checkin_date"] = today
+            user_info["total_checkin_count"] += 1
+            
+            # 记录积分变动
+            desc = special_desc if special_desc else f"签到获得 {points} 积分"
+            if streak_bonus:
+                desc += f"，连续签到 {streak} 天额外获得 {streak_bonus} 积分"
+            self.add_points_record(user_info, points + streak_bonus, "签到", desc, user_id=user_id,
+                                   group_id=event.message_obj.group_id)
         
         # 保存数据
         self.save_data()
         
         # 生成签到消息
         reward_msg = self.get_reward_message(points, special_desc)
+        if streak_bonus:
+            reward_msg += f"\n连续签到 {streak} 天，额外奖励 {streak_bonus} 积分"
         
         # 构建消息：第一行@，第二行描述，空一行，然后积分信息
-        message_text = f" \n{reward_msg}\n\n当前积分: {user_info['total_points']} 积分\n累计签到: {user_info['total_checkin_count']} 次"
+        message_text = f" \n{reward_msg}\n\n当前积分: {user_info['total_points']} 积分\n累计签到: {user_info['total_checkin_count']} 次\n连续签到: {streak} 天"
         message_parts = [
             At(qq=user_id),
             Plain(text=message_text)
@@ -244,10 +990,12 @@ class CheckInModule(BaseModule):
         """显示积分信息"""
         user_id = str(event.get_sender_id())  # 用于数据存储（跨群聊通用）
         user_info = self.get_user_info(user_id)
-        today = date.today().isoformat()
+        today_date = date.today()
+        today = today_date.isoformat()
         
         # 构建消息文本
         message_text = f" \n当前积分：{user_info['total_points']}分\n累计签到次数：{user_info['total_checkin_count']}次\n"
+        message_text += f"连续签到：{self.get_current_streak(user_info, today_date)}天（最长 {user_info.get('max_streak', 0)} 天）\n"
         
         # 上次签到时间
         if user_info["last_checkin_date"]:
@@ -266,32 +1014,78 @@ class CheckInModule(BaseModule):
         
         yield event.chain_result(message_parts)
     
+    # 积分记录每页条数 / 按月查询时最多显示的条数
+    HISTORY_PAGE_SIZE = 10
+    HISTORY_MONTH_LIMIT = 30
+    
+    @staticmethod
+    def _format_history_line(record: dict) -> str:
+        """格式化一条积分记录"""
+        points_str = f"+{record['points']}" if record['points'] > 0 else str(record['points'])
+        date_str = record['date']  # 完整时间 YYYY-MM-DD HH:MM:SS
+        action = record['action']
+        
+        # 一行显示一条记录
+        line = f"{date_str} {action} {points_str}"
+        
+        # 如果有来源用户ID，显示QQ号
+        if record.get('source'):
+            line += f" 来自:{record['source']}"
+        return line
+    
     async def points_history(self, event: AstrMessageEvent):
-        """查询积分变动记录"""
+        """
+        查询积分变动记录
+        
+        - 积分记录：最近10条
+        - 积分记录 N：第 N 页（内存中的记录之后接着归档中的记录，每页10条；
+          早于 history_stale_days 天的记录已移入归档，内存中不足一页时第 1 页也从归档中补齐）
+        - 积分记录 YYYY-MM：某个月的记录
+        """
         user_id = str(event.get_sender_id())  # 用于数据存储（跨群聊通用）
         user_info = self.get_user_info(user_id)
+        recent = list(user_info.get("points_history") or [])
+        arg = event.message_str.strip()[len("积分记录"):].strip()
+        archive = self.history_archive
         
-        # 构建消息文本
-        message_text = " 的积分记录\n"
+        if not arg or arg.isdigit():
+            page = int(arg or 1)
+            # 倒序显示，最新的在前
+            newest = list(reversed(recent))
+            start = (page - 1) * self.HISTORY_PAGE_SIZE
+            records = newest[start:start + self.HISTORY_PAGE_SIZE] if page >= 1 else []
+            missing = self.HISTORY_PAGE_SIZE - len(records)
+            if archive is not None and page >= 1 and missing:
+                records += await asyncio.to_thread(
+                    archive.read_recent, user_id, max(0, start - len(newest)), missing,
+                    archive.snapshot_pending()
+                )
+            if page == 1:
+                message_text = " 的积分记录\n"
+                empty_text = "暂无积分变动记录"
+            else:
+                message_text = f" 的积分记录（第 {page} 页）\n"
+                empty_text = "没有更早的积分记录" if archive is not None else "未启用积分记录归档，只保留最近10条"
+        elif len(arg) == 7 and arg[4] == "-" and arg[:4].isdigit() and arg[5:].isdigit():
+            records = [record for record in recent if record["date"].startswith(arg)]
+            if archive is not None:
+                records = await asyncio.to_thread(
+                    archive.read_month, user_id, arg, archive.snapshot_pending()
+                ) + records
+            records.reverse()
+            shown = f"，显示最近 {self.HISTORY_MONTH_LIMIT} 条" if len(records) > self.HISTORY_MONTH_LIMIT else ""
+            message_text = f" {arg} 的积分记录（共 {len(records)} 条{shown}）\n"
+            records = records[:self.HISTORY_MONTH_LIMIT]
+            empty_text = "该月没有积分变动记录"
+        else:
+            yield event.plain_result("用法：积分记录 [页码|年-月]，例如 积分记录 2、积分记录 2026-09")
+            return
         
         # 显示积分变动记录
-        if user_info.get("points_history"):
-            # 倒序显示，最新的在前
-            for record in reversed(user_info["points_history"]):
-                points_str = f"+{record['points']}" if record['points'] > 0 else str(record['points'])
-                date_str = record['date']  # 完整时间 YYYY-MM-DD HH:MM:SS
-                action = record['action']
-                
-                # 一行显示一条记录
-                line = f"{date_str} {action} {points_str}"
-                
-                # 如果有来源用户ID，显示QQ号
-                if record.get('source'):
-                    line += f" 来自:{record['source']}"
-                
-                message_text += line + "\n"
+        if records:
+            message_text += "\n".join(self._format_history_line(record) for record in records) + "\n"
         else:
-            message_text += "暂无积分变动记录"
+            message_text += empty_text
         
         message_parts = [
             At(qq=user_id),
@@ -300,4 +1094,35 @@ class CheckInModule(BaseModule):
         
         yield event.chain_result(message_parts)
     
-
+    async def checkin_calendar(self, event: AstrMessageEvent):
+        """显示本月签到日历（直接由签到位图生成，不查询历史记录）"""
+        user_id = str(event.get_sender_id())
+        user_info = self.get_user_info(user_id)
+        today = date.today()
+        
+        message_text = f" \n{today.year}年{today.month}月 签到日历\n一 二 三 四 五 六 日\n"
+        checked_days = 0
+        for week in calendar.Calendar().monthdatescalendar(today.year, today.month):
+            cells = []
+            for day in week:
+                if day.month != today.month or day > today:
+                    cells.append("  ")
+                elif self.has_checked_in_on(user_info, day):
+                    cells.append("●")
+                    checked_days += 1
+                else:
+                    cells.append("○")
+            line = " ".join(cells).rstrip()
+            if line:
+                message_text += line + "\n"
+        
+        message_text += (f"\n本月签到 {checked_days} 天\n"
+                         f"连续签到 {self.get_current_streak(user_info, today)} 天，"
+                         f"最长连续 {user_info.get('max_streak', 0)} 天")
+        
+        message_parts = [
+            At(qq=user_id),
+            Plain(text=message_text)
+        ]
+        
+        yield event.chain_result(message_parts)
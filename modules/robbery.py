@@ -2,6 +2,7 @@
 抢劫模块 - 抢劫其他用户积分和管理员奖励功能
 """
 
+import math
 import time
 import random
 from typing import Dict, List, Any
@@ -10,6 +11,9 @@ from astrbot.api.message_components import At, Plain
 from astrbot.api.event import AstrMessageEvent
 
 from ..modules.base import BaseModule
+from ..modules.checkin import CheckInModule
+from ..utils.balance_table import BalanceRecord, ROBBERY_FIELDS
+from ..utils.maintenance import MaintenanceBudget
 
 
 class RobberyModule(BaseModule):
@@ -27,6 +31,7 @@ class RobberyModule(BaseModule):
     def __init__(self, context, data_dir, checkin_module, config: dict | None = None):
         super().__init__(context, data_dir)
         self.checkin_module = checkin_module  # 引用签到模块，用于操作积分
+        self.dependencies = [checkin_module]
         self.config = config if config is not None else {}
         
         # 抢劫配置
@@ -35,6 +40,9 @@ class RobberyModule(BaseModule):
         self.max_rob_amount = 50  # 最多抢劫积分
         self.max_lose_amount = 50  # 失败最多被抢劫积分
         self.cooldown = 30 * 60  # 冷却时间 30 分钟（秒）
+        self.success_rate_step = 0.01  # 每次抢劫后成功率的变化幅度 1%
+        self.min_success_rate = 0.01  # 成功率下限 1%
+        self.max_success_rate = 0.99  # 成功率上限 99%
         
         # 用户抢劫数据 {user_id: {"success_rate": float, "last_rob_time": float}}
         self.robbery_data: Dict[str, Dict[str, Any]] = {}
@@ -44,32 +52,68 @@ class RobberyModule(BaseModule):
     
     async def initialize(self):
         """初始化抢劫模块"""
+        self.mark_ready()
         self.log_info("抢劫模块初始化完成")
     
     async def terminate(self):
         """终止抢劫模块"""
         self.log_info("抢劫模块已终止")
     
+    def maintenance_jobs(self):
+        """清理已过冷却期的记录"""
+        return [("robbery.prune", self._prune_idle, None)]
+    
+    def memory_usage(self):
+        """抢劫数据与冷却记录"""
+        return {"robbery_data": self.robbery_data, "last_robbery": self.last_robbery}
+    
+    async def _prune_idle(self, budget: MaintenanceBudget) -> int:
+        """
+        清理已过冷却期的冷却记录，以及冷却期外用户的抢劫数据
+        
+        抢劫数据只在成功率已保存在积分表中、或成功率仍为初始值时清理，清理后不影响抢劫结果
+        """
+        now = time.time()
+        expired = [user_id for user_id, last in self.last_robbery.items() if now - last >= self.cooldown]
+        for user_id in expired:
+            del self.last_robbery[user_id]
+        persisted = self.checkin_module.balance_table is not None
+        idle = [
+            user_id for user_id, data in self.robbery_data.items()
+            if user_id not in self.last_robbery
+            and (persisted or math.isclose(data["success_rate"], self.initial_success_rate))
+        ]
+        for user_id in idle:
+            del self.robbery_data[user_id]
+        return len(expired) + len(idle)
+    
     def get_user_robbery_data(self, user_id: str) -> Dict[str, Any]:
-        """获取用户抢劫数据"""
+        """获取用户抢劫数据（启用积分表时成功率保存在积分表中，重启后保留）"""
         if user_id not in self.robbery_data:
-            self.robbery_data[user_id] = {
+            data = {
                 "success_rate": self.initial_success_rate,
                 "total_rob_count": 0,
                 "success_count": 0,
                 "fail_count": 0
             }
+            table = self.checkin_module.balance_table
+            if table is not None:
+                rate = data.pop("success_rate")
+                data = BalanceRecord(table, table.slot(user_id, create=True), data, ROBBERY_FIELDS)
+                if math.isnan(data["success_rate"]):  # 尚未设置
+                    data["success_rate"] = rate
+            self.robbery_data[user_id] = data
         return self.robbery_data[user_id]
     
-    async def process_robbery(self, event: AstrMessageEvent):
+    def _check_robbery(self, event: AstrMessageEvent, economy: CheckInModule, robber_id: str, robber_info: dict,
+                       current_time: float):
         """
-        处理抢劫请求
-        """
-        robber_id = str(event.get_sender_id())
-        robber_info = self.checkin_module.get_user_info(robber_id)
+        检查抢劫条件（economy 为事件所在群的经济）
         
+        Returns:
+            (错误回复, 目标用户ID, 目标用户信息)，条件满足时错误回复为 None
+        """
         # 检查冷却时间
-        current_time = time.time()
         if robber_id in self.last_robbery:
             time_passed = current_time - self.last_robbery[robber_id]
             if time_passed < self.cooldown:
@@ -80,8 +124,7 @@ class RobberyModule(BaseModule):
                     At(qq=robber_id),
                     Plain(text=f" \n抢劫冷却中\n剩余时间：{remaining_minutes} 分 {remaining_seconds} 秒")
                 ]
-                yield event.chain_result(message_parts)
-                return
+                return event.chain_result(message_parts), None, None
         
         # 检查抢劫者积分是否足够
         if robber_info["total_points"] < self.min_points_to_rob:
@@ -89,8 +132,7 @@ class RobberyModule(BaseModule):
                 At(qq=robber_id),
                 Plain(text=f" \n积分不足！\n抢劫需要至少 {self.min_points_to_rob} 积分，当前积分：{robber_info['total_points']} 分")
             ]
-            yield event.chain_result(message_parts)
-            return
+            return event.chain_result(message_parts), None, None
         
         # 解析目标用户（从消息链中提取 At 组件）
         message_chain = event.message_obj.message
@@ -108,16 +150,14 @@ class RobberyModule(BaseModule):
                 break
         
         if not target_user_id:
-            yield event.plain_result('请使用 @ 指定要抢劫的用户')
-            return
+            return event.plain_result('请使用 @ 指定要抢劫的用户'), None, None
         
         # 不能抢劫自己
         if target_user_id == robber_id:
-            yield event.plain_result('不能抢劫自己！')
-            return
+            return event.plain_result('不能抢劫自己！'), None, None
         
         # 获取目标用户信息
-        target_info = self.checkin_module.get_user_info(target_user_id)
+        target_info = economy.get_user_info(target_user_id)
         
         # 检查目标用户积分
         if target_info["total_points"] < self.min_points_to_rob:
@@ -125,7 +165,29 @@ class RobberyModule(BaseModule):
                 At(qq=robber_id),
                 Plain(text=f" \n对方积分不足 {self.min_points_to_rob} 分，无法抢劫！")
             ]
-            yield event.chain_result(message_parts)
+            return event.chain_result(message_parts), None, None
+        
+        return None, target_user_id, target_info
+    
+    async def process_robbery(self, event: AstrMessageEvent, economy: CheckInModule):
+        """
+        处理抢劫请求
+        
+        Args:
+            event: 消息事件
+            economy: 事件所在群的经济
+        """
+        robber_id = str(event.get_sender_id())
+        current_time = time.time()
+        
+        with self.stage_timer("gating"):
+            robber_info = economy.get_user_info(robber_id)
+            error_result, target_user_id, target_info = self._check_robbery(
+                event, economy, robber_id, robber_info, current_time
+            )
+        
+        if error_result is not None:
+            yield error_result
             return
         
         # 获取抢劫者数据
@@ -134,6 +196,7 @@ class RobberyModule(BaseModule):
         
         # 判断抢劫是否成功
         is_success = random.random() < success_rate
+        self.count("robbery_outcomes_total", result="success" if is_success else "fail")
         
         if is_success:
             # 抢劫成功
@@ -141,36 +204,41 @@ class RobberyModule(BaseModule):
             rob_amount = random.randint(1, self.max_rob_amount)
             rob_amount = min(rob_amount, target_info["total_points"])  # 不能超过对方积分
             
-            # 转移积分
-            robber_info["total_points"] += rob_amount
-            target_info["total_points"] -= rob_amount
+            with self.stage_timer("mutation"):
+                # 转移积分
+                robber_info["total_points"] += rob_amount
+                target_info["total_points"] -= rob_amount
             
-            # 记录积分变动
-            self.checkin_module.add_points_record(
-                robber_info,
-                rob_amount,
-                "抢劫成功",
-                f"抢劫成功获得 {rob_amount} 积分",
-                source_user_id=target_user_id
-            )
-            self.checkin_module.add_points_record(
-                target_info,
-                -rob_amount,
-                "被抢劫",
-                f"被抢劫损失 {rob_amount} 积分",
-                source_user_id=robber_id
-            )
+                # 记录积分变动
+                economy.add_points_record(
+                    robber_info,
+                    rob_amount,
+                    "抢劫成功",
+                    f"抢劫成功获得 {rob_amount} 积分",
+                    source_user_id=target_user_id,
+                    user_id=robber_id,
+                    group_id=event.message_obj.group_id
+                )
+                economy.add_points_record(
+                    target_info,
+                    -rob_amount,
+                    "被抢劫",
+                    f"被抢劫损失 {rob_amount} 积分",
+                    source_user_id=robber_id,
+                    user_id=target_user_id,
+                    group_id=event.message_obj.group_id
+                )
             
-            # 更新成功率（成功后 -1%）
-            robbery_data["success_rate"] = max(0.01, success_rate - 0.01)
-            robbery_data["total_rob_count"] += 1
-            robbery_data["success_count"] += 1
+                # 更新成功率（成功后 -1%）
+                robbery_data["success_rate"] = max(self.min_success_rate, success_rate - self.success_rate_step)
+                robbery_data["total_rob_count"] += 1
+                robbery_data["success_count"] += 1
             
-            # 更新冷却时间
-            self.last_robbery[robber_id] = current_time
+                # 更新冷却时间
+                self.last_robbery[robber_id] = current_time
             
             # 保存数据
-            self.checkin_module.save_data()
+            economy.save_data()
             
             # 构建消息
             message_text = f" \n抢劫成功！\n获得积分：+{rob_amount} 分\n当前积分：{robber_info['total_points']} 分\n当前成功率：{int(robbery_data['success_rate']*100)}%"
@@ -186,36 +254,41 @@ class RobberyModule(BaseModule):
             lose_amount = random.randint(1, self.max_lose_amount)
             lose_amount = min(lose_amount, robber_info["total_points"])  # 不能超过自己积分
             
-            # 转移积分
-            robber_info["total_points"] -= lose_amount
-            target_info["total_points"] += lose_amount
+            with self.stage_timer("mutation"):
+                # 转移积分
+                robber_info["total_points"] -= lose_amount
+                target_info["total_points"] += lose_amount
             
-            # 记录积分变动
-            self.checkin_module.add_points_record(
-                robber_info,
-                -lose_amount,
-                "抢劫失败",
-                f"抢劫失败损失 {lose_amount} 积分",
-                source_user_id=target_user_id
-            )
-            self.checkin_module.add_points_record(
-                target_info,
-                lose_amount,
-                "反抢",
-                f"反抢获得 {lose_amount} 积分",
-                source_user_id=robber_id
-            )
+                # 记录积分变动
+                economy.add_points_record(
+                    robber_info,
+                    -lose_amount,
+                    "抢劫失败",
+                    f"抢劫失败损失 {lose_amount} 积分",
+                    source_user_id=target_user_id,
+                    user_id=robber_id,
+                    group_id=event.message_obj.group_id
+                )
+                economy.add_points_record(
+                    target_info,
+                    lose_amount,
+                    "反抢",
+                    f"反抢获得 {lose_amount} 积分",
+                    source_user_id=robber_id,
+                    user_id=target_user_id,
+                    group_id=event.message_obj.group_id
+                )
             
-            # 更新成功率（失败后 +1%）
-            robbery_data["success_rate"] = min(0.99, success_rate + 0.01)
-            robbery_data["total_rob_count"] += 1
-            robbery_data["fail_count"] += 1
+                # 更新成功率（失败后 +1%）
+                robbery_data["success_rate"] = min(self.max_success_rate, success_rate + self.success_rate_step)
+                robbery_data["total_rob_count"] += 1
+                robbery_data["fail_count"] += 1
             
-            # 更新冷却时间
-            self.last_robbery[robber_id] = current_time
+                # 更新冷却时间
+                self.last_robbery[robber_id] = current_time
             
             # 保存数据
-            self.checkin_module.save_data()
+            economy.save_data()
             
             # 构建消息
             message_text = f" \n抢劫失败！\n损失积分：-{lose_amount} 分\n当前积分：{robber_info['total_points']} 分\n当前成功率：{int(robbery_data['success_rate']*100)}%"
@@ -225,9 +298,14 @@ class RobberyModule(BaseModule):
             ]
             yield event.chain_result(message_parts)
     
-    async def reward_points(self, event: AstrMessageEvent, superusers: List[str]):
+    async def reward_points(self, event: AstrMessageEvent, economy: CheckInModule, superusers: List[str]):
         """
         奖励积分（超级管理员专用）
+        
+        Args:
+            event: 消息事件
+            economy: 事件所在群的经济
+            superusers: 超级管理员ID列表
         """
         sender_id = str(event.get_sender_id())
         
@@ -275,23 +353,25 @@ class RobberyModule(BaseModule):
             yield event.plain_result('请指定有效的积分数量（正整数）')
             return
         
-        # 获取目标用户信息
-        user_info = self.checkin_module.get_user_info(target_user_id)
+        # 获取目标用户信息（事件所在群的经济）
+        user_info = economy.get_user_info(target_user_id)
         
         # 增加积分
         user_info["total_points"] += points_amount
         
         # 记录积分变动
-        self.checkin_module.add_points_record(
+        economy.add_points_record(
             user_info,
             points_amount,
             "奖励",
             f"管理员奖励",
-            source_user_id=sender_id
+            source_user_id=sender_id,
+            user_id=target_user_id,
+            group_id=event.message_obj.group_id
         )
         
         # 保存数据
-        self.checkin_module.save_data()
+        economy.save_data()
         
         # 构建回复消息
         message_parts = [
@@ -300,4 +380,103 @@ class RobberyModule(BaseModule):
             Plain(text=f" {points_amount} 积分\n当前积分：{user_info['total_points']} 分")
         ]
         yield event.chain_result(message_parts)
-
+    
+    async def _get_group_member_ids(self, event: AstrMessageEvent, group_id: str) -> List[str] | None:
+        """
+        获取群成员列表（仅支持 aiocqhttp 平台）
+        
+        Returns:
+            群成员ID列表，平台不支持时返回 None
+        """
+        bot = getattr(event, "bot", None)
+        if bot is None or not hasattr(bot, "api"):
+            return None
+        members = await bot.api.call_action("get_group_member_list", group_id=int(group_id))
+        self_id = str(event.get_self_id()) if hasattr(event, "get_self_id") else ""
+        return [str(member["user_id"]) for member in members if str(member["user_id"]) != self_id]
+    
+    async def bulk_reward_points(self, event: AstrMessageEvent, economy: CheckInModule, superusers: List[str]):
+        """
+        批量奖励积分（超级管理员专用）
+        
+        格式：
+        - 批量奖励 @用户1 @用户2 ... 数字
+        - 批量奖励 全群 数字
+        - 批量奖励 QQ号1,QQ号2 ... 数字
+        
+        所有奖励作为一个批次处理：每个用户只追加一条积分记录，只保存一次，只回复一条汇总消息
+        
+        Args:
+            event: 消息事件
+            economy: 事件所在群的经济
+            superusers: 超级管理员ID列表
+        """
+        import re
+        
+        sender_id = str(event.get_sender_id())
+        
+        # 检查是否为超级管理员
+        if sender_id not in superusers:
+            yield event.plain_result('仅允许超级管理员执行此操作')
+            return
+        
+        message_text = event.message_str.strip()
+        
+        # 最后一个数字为积分数量，其余 5 位以上的数字视为 QQ 号
+        numbers = re.findall(r'\d+', message_text)
+        points_amount = int(numbers[-1]) if numbers else None
+        if points_amount is None or points_amount <= 0:
+            yield event.plain_result('请指定有效的积分数量（正整数）')
+            return
+        
+        target_ids: List[str] = [n for n in numbers[:-1] if len(n) >= 5]
+        
+        # 消息链中的所有 At 组件
+        for item in event.message_obj.message:
+            if hasattr(item, 'type'):
+                item_type = str(item.type).lower()
+                if 'at' in item_type and hasattr(item, 'qq'):
+                    target_ids.append(str(item.qq))
+            elif hasattr(item, 'qq'):
+                target_ids.append(str(item.qq))
+        
+        # 全群
+        if '全群' in message_text:
+            group_id = event.message_obj.group_id
+            if not group_id:
+                yield event.plain_result('「全群」仅在群聊中可用')
+                return
+            try:
+                member_ids = await self._get_group_member_ids(event, str(group_id))
+            except Exception as e:
+                self.log_error(f"获取群成员列表失败: {e}")
+                yield event.plain_result('获取群成员列表失败')
+                return
+            if member_ids is None:
+                yield event.plain_result('当前平台不支持获取群成员列表，请使用 @ 或 QQ 号指定用户')
+                return
+            target_ids.extend(member_ids)
+        
+        # 去重并保持顺序
+        target_ids = list(dict.fromkeys(target_ids))
+        if not target_ids:
+            yield event.plain_result('请使用 @、QQ号或「全群」指定要奖励的用户')
+            return
+        
+        updated = economy.apply_points_batch(
+            {user_id: points_amount for user_id in target_ids},
+            "奖励",
+            "管理员批量奖励",
+            source_user_id=sender_id,
+            group_id=event.message_obj.group_id
+        )
+        self.count("bulk_reward_users_total", value=len(updated))
+        
+        # 汇总回复
+        message_text = f"已批量奖励 {len(updated)} 名用户，每人 {points_amount} 积分，共 {points_amount * len(updated)} 积分"
+        preview = list(updated.items())[:10]
+        for user_id, user_info in preview:
+            message_text += f"\n{user_id}：当前积分 {user_info['total_points']} 分"
+        if len(updated) > len(preview):
+            message_text += f"\n……等 {len(updated)} 名用户"
+        yield event.plain_result(message_text)
@@ -3,14 +3,20 @@
 """
 
 import asyncio
+import hashlib
 import time
-from typing import List, Any
-import httpx
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+from urllib.parse import urlparse
 
 from astrbot.api.message_components import At, Plain, Image
 from astrbot.api.event import AstrMessageEvent
 
 from ..modules.base import BaseModule
+from ..modules.checkin import CheckInModule
+from ..utils.maintenance import MaintenanceBudget
+from ..utils.bloom_filter import RotatingBloomFilter
+from ..utils.image_cache import ImageCache, ImageUploader, CachedImage, ImageTooLargeError
 
 
 class SetuModule(BaseModule):
@@ -23,9 +29,17 @@ class SetuModule(BaseModule):
     使用 Lolicon API 获取图片
     """
     
+    # 图片超过下载大小上限时依次改用的尺寸
+    IMAGE_SIZES = ("original", "regular", "small")
+    # 下载图片的分块大小
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+    # 攒够这么多字节再交给线程写入一次，避免每个分块都切换一次线程
+    DOWNLOAD_WRITE_SIZE = 1024 * 1024
+    
     def __init__(self, context, data_dir, checkin_module, config: dict | None = None):
         super().__init__(context, data_dir)
         self.checkin_module = checkin_module  # 引用签到模块，用于操作积分
+        self.dependencies = [checkin_module]
         self.semaphore = asyncio.Semaphore(10)  # 限制并发请求数量
         self.config = config if config is not None else {}
         
@@ -39,50 +53,236 @@ class SetuModule(BaseModule):
         # 是否排除AI作品
         self.exclude_ai = self.config.get("exclude_ai", True)
         
+        # Lolicon API 地址（可指向镜像或本地测试服务）
+        self.api_url = self.config.get("setu_api_url", "https://api.lolicon.app/setu/v2")
+        
         # 用户冷却时间记录 {user_id: last_use_timestamp}
         self.last_usage: dict = {}
+        
+        # 去重：每个群（私聊按用户）用轮换布隆过滤器记住最近发送过的作品，0 表示不去重
+        self.dedup_window = int(self.config.get("setu_dedup_window", 500))
+        self.dedup_error_rate = float(self.config.get("setu_dedup_error_rate", 0.01))
+        self.recent_pids: Dict[str, RotatingBloomFilter] = {}
+        # 开启去重时每次请求的候选作品数
+        self.dedup_candidates = 5
+        
+        # 图片缓存：下载过的图片按内容哈希保存在 image_cache/ 中，重复发送时不再下载，0 表示不缓存
+        self.image_cache_max_mb = self.config.get("image_cache_max_mb", 200)
+        self.image_cache_ttl = self.config.get("image_cache_ttl", 86400)
+        self.image_cache: ImageCache | None = None
+        # 下载大小上限：超过时中止下载并改用 regular / small 尺寸，0 表示不限制
+        self.image_max_bytes = int(float(self.config.get("image_download_max_mb", 10)) * 2**20)
+        # 平台上传接口：适配器支持预先上传图片时设置，缓存上传得到的资源引用，重复发送时不再上传
+        self.uploader: ImageUploader | None = None
     
     async def initialize(self):
         """初始化涩图模块"""
+        if self.image_cache_max_mb > 0:
+            self.image_cache = ImageCache(
+                self.data_dir / "image_cache",
+                max_bytes=int(self.image_cache_max_mb * 2**20),
+                ttl=self.image_cache_ttl,
+                metrics=self.metrics
+            )
+            await asyncio.to_thread(self.image_cache.load)
+        self.mark_ready()
         self.log_info("涩图模块初始化完成")
     
     async def terminate(self):
         """终止涩图模块"""
+        if self.image_cache is not None:
+            try:
+                self.image_cache.save()
+            except OSError as e:
+                self.log_error(f"保存图片缓存索引失败: {e}")
         self.log_info("涩图模块已终止")
     
-    async def fetch_setu(self, r18: int = 0) -> dict:
+    def maintenance_jobs(self):
+        """清理已过冷却期的记录和过期的缓存图片"""
+        return [("setu.prune", self._prune_idle, None)]
+    
+    def memory_usage(self):
+        """冷却记录、去重过滤器与图片缓存索引"""
+        usage = {"last_usage": self.last_usage, "recent_pids": self.recent_pids}
+        if self.image_cache is not None:
+            usage["image_cache"] = self.image_cache
+        return usage
+    
+    async def _prune_idle(self, budget: MaintenanceBudget) -> int:
+        """清理已过冷却期的冷却记录和过期的缓存图片，保存图片缓存索引"""
+        now = time.time()
+        expired = [user_id for user_id, last in self.last_usage.items() if now - last >= self.cooldown]
+        for user_id in expired:
+            del self.last_usage[user_id]
+        pruned = len(expired)
+        if self.image_cache is not None:
+            pruned += self.image_cache.prune_expired()
+            self.image_cache.save()
+        return pruned
+    
+    async def fetch_setu(self, r18: int = 0, num: int = 1) -> dict:
         """
         从 Lolicon API 获取涩图
         
         Args:
             r18: 0=普通, 1=R18
+            num: 作品数量（1-20）
         
         Returns:
             API 响应数据
         """
+        import httpx  # 延迟导入，未使用涩图功能时不加载
+        
         async with httpx.AsyncClient(timeout=15.0) as client:
             # 构建API URL，添加excludeAI参数
             exclude_ai_param = 1 if self.exclude_ai else 0
-            url = f"https://api.lolicon.app/setu/v2?r18={r18}&excludeAI={exclude_ai_param}"
+            url = f"{self.api_url}?r18={r18}&excludeAI={exclude_ai_param}"
+            if num > 1:
+                url += f"&num={num}"
+            if self.image_cache is not None and self.image_max_bytes > 0:
+                # 同时获取较小尺寸的地址，原图超过下载大小上限时使用
+                url += "".join(f"&size={size}" for size in self.IMAGE_SIZES)
             resp = await client.get(url)
             resp.raise_for_status()
             return resp.json()
     
-    async def process_setu_request(self, event: AstrMessageEvent, is_r18: bool = False):
+    async def _download_image(self, url: str) -> CachedImage:
         """
-        处理涩图请求
+        分块下载图片到缓存目录
+        
+        内存中最多缓冲 DOWNLOAD_WRITE_SIZE 字节，攒够后一次性交给线程写入。
+        响应头的 Content-Length 或已下载的字节数超过上限时
+        立即中止下载、删除临时文件并抛出 ImageTooLargeError
+        """
+        import httpx  # 延迟导入，未使用涩图功能时不加载
+        
+        cache = self.image_cache
+        limit = self.image_max_bytes
+        tmp_path = cache.temp_path()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                async with client.stream("GET", url) as resp:
+                    resp.raise_for_status()
+                    length = resp.headers.get("content-length", "")
+                    if limit and length.isdigit() and int(length) > limit:
+                        raise ImageTooLargeError(f"Content-Length {length} 字节")
+                    with open(tmp_path, "wb") as f:
+                        buffered: List[bytes] = []
+                        buffered_size = 0
+                        async for chunk in resp.aiter_bytes(self.DOWNLOAD_CHUNK_SIZE):
+                            size += len(chunk)
+                            if limit and size > limit:
+                                raise ImageTooLargeError(f"已下载 {size} 字节")
+                            digest.update(chunk)
+                            buffered.append(chunk)
+                            buffered_size += len(chunk)
+                            if buffered_size >= self.DOWNLOAD_WRITE_SIZE:
+                                await asyncio.to_thread(f.writelines, buffered)
+                                buffered = []
+                                buffered_size = 0
+                        if buffered:
+                            await asyncio.to_thread(f.writelines, buffered)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        suffix = Path(urlparse(url).path).suffix or ".jpg"
+        return await asyncio.to_thread(cache.adopt_file, tmp_path, digest.hexdigest(), size, suffix)
+    
+    async def _download_variant(self, urls: Dict[str, str]) -> Tuple[CachedImage | None, str]:
+        """
+        下载不超过大小上限的最大尺寸
+        
+        Returns:
+            (缓存条目, 实际使用的图片地址)，下载失败或所有尺寸都超过上限时缓存条目为 None
+        """
+        variants = [(size, urls[size]) for size in self.IMAGE_SIZES if urls.get(size)]
+        for size, url in variants:
+            try:
+                with self.stage_timer("download"):
+                    return await self._download_image(url), url
+            except ImageTooLargeError as e:
+                self.count("image_download_oversize_total", size=size)
+                self.log_info(f"{size} 尺寸的图片超过下载大小上限（{e}），改用更小的尺寸")
+            except Exception as e:
+                self.count("image_download_errors_total")
+                self.log_warning(f"下载图片失败，改为直接发送图片地址: {e}")
+                return None, url
+        return None, variants[-1][1]
+    
+    async def _image_component(self, urls: Dict[str, str]) -> Image:
+        """
+        构造图片消息组件
+        
+        优先使用缓存的平台资源引用（不下载、不上传），其次使用缓存的本地文件（不下载），
+        未开启缓存或下载失败时直接发送图片地址
         
         Args:
-            event: 消息事件
-            is_r18: 是否为 R18 涩图
+            urls: Lolicon API 返回的各尺寸图片地址，缓存以原图地址为键
         """
-        user_id = str(event.get_sender_id())
-        user_info = self.checkin_module.get_user_info(user_id)
+        image_url = urls["original"]
+        cache = self.image_cache
+        if cache is None:
+            return Image.fromURL(image_url, size='original')
         
-        # 判断需要消耗的积分
-        cost = self.r18_setu_cost if is_r18 else self.normal_setu_cost
-        setu_type = "R18涩图" if is_r18 else "涩图"
+        entry = cache.lookup(image_url)
+        if entry is None:
+            entry, used_url = await self._download_variant(urls)
+            if entry is None:
+                return Image.fromURL(used_url, size='original')
+            entry = cache.add(image_url, entry)
+        
+        if entry.reference is None and self.uploader is not None:
+            try:
+                reference = await self.uploader(entry.path)
+            except Exception as e:
+                self.log_warning(f"上传图片失败: {e}")
+                reference = None
+            if reference:
+                cache.set_reference(entry.digest, reference)
+        
+        if entry.reference:
+            return Image(file=entry.reference)
+        return Image.fromFileSystem(str(entry.path))
+    
+    @staticmethod
+    def _dedup_key(event: AstrMessageEvent) -> str:
+        """去重范围：群聊按群，私聊按用户"""
+        group_id = event.message_obj.group_id
+        return f"group:{group_id}" if group_id else f"user:{event.get_sender_id()}"
+    
+    def _pick_unseen(self, key: str, candidates: List[dict]) -> dict:
+        """
+        从候选作品中选出本群最近没有发送过的一个
+        
+        全部发送过时仍返回第一个（积分已准备扣除，不让请求落空）
+        """
+        seen = self.recent_pids.get(key)
+        if seen is None:
+            return candidates[0]
+        for image_info in candidates:
+            if f"{image_info.get('pid')}_{image_info.get('p', 0)}" not in seen:
+                return image_info
+            self.count("setu_dedup_skipped_total")
+        self.count("setu_dedup_exhausted_total")
+        return candidates[0]
+    
+    def _remember(self, key: str, image_info: dict):
+        """记录已发送的作品"""
+        seen = self.recent_pids.get(key)
+        if seen is None:
+            seen = self.recent_pids[key] = RotatingBloomFilter(self.dedup_window, self.dedup_error_rate)
+        seen.add(f"{image_info.get('pid')}_{image_info.get('p', 0)}")
+    
+    def _check_setu_request(self, event: AstrMessageEvent, user_id: str, user_info: dict,
+                            cost: int, setu_type: str):
+        """
+        检查冷却时间和积分是否足够
         
+        Returns:
+            错误回复，条件满足时返回 None
+        """
         # 检查冷却时间
         if self.cooldown > 0:
             current_time = time.time()
@@ -94,18 +294,49 @@ class SetuModule(BaseModule):
                         At(qq=user_id),
                         Plain(text=f" \n冷却中，请等待 {remaining_time:.1f} 秒后重试")
                     ]
-                    yield event.chain_result(message_parts)
-                    return
+                    return event.chain_result(message_parts)
         
         # 检查积分是否足够
         if user_info["total_points"] < cost:
-            message_parts = [
-                At(qq=user_id),
-                Plain(text=f" \n积分不足！\n{setu_type}需要 {cost} 积分，当前积分：{user_info['total_points']} 分")
-            ]
-            yield event.chain_result(message_parts)
+            return self._insufficient_points_result(event, user_id, user_info, cost, setu_type)
+        
+        return None
+    
+    @staticmethod
+    def _insufficient_points_result(event: AstrMessageEvent, user_id: str, user_info: dict,
+                                    cost: int, setu_type: str):
+        """积分不足的回复"""
+        message_parts = [
+            At(qq=user_id),
+            Plain(text=f" \n积分不足！\n{setu_type}需要 {cost} 积分，当前积分：{user_info['total_points']} 分")
+        ]
+        return event.chain_result(message_parts)
+    
+    async def process_setu_request(self, event: AstrMessageEvent, economy: CheckInModule, is_r18: bool = False):
+        """
+        处理涩图请求
+        
+        Args:
+            event: 消息事件
+            economy: 事件所在群的经济（扣除积分）
+            is_r18: 是否为 R18 涩图
+        """
+        user_id = str(event.get_sender_id())
+        user_info = economy.get_user_info(user_id)
+        
+        # 判断需要消耗的积分
+        cost = self.r18_setu_cost if is_r18 else self.normal_setu_cost
+        setu_type = "R18涩图" if is_r18 else "涩图"
+        
+        # 检查冷却时间和积分
+        with self.stage_timer("gating"):
+            error_result = self._check_setu_request(event, user_id, user_info, cost, setu_type)
+        if error_result is not None:
+            yield error_result
             return
         
+        import httpx  # 延迟导入，未使用涩图功能时不加载
+        
         # 获取涩图
         async with self.semaphore:
             try:
@@ -113,28 +344,53 @@ class SetuModule(BaseModule):
                 yield event.plain_result(f"正在获取{setu_type}，请稍候...")
                 
                 # 调用 API
-                data = await self.fetch_setu(r18=1 if is_r18 else 0)
+                with self.stage_timer("upstream"):
+                    data = await self.fetch_setu(
+                        r18=1 if is_r18 else 0,
+                        num=self.dedup_candidates if self.dedup_window > 0 else 1
+                    )
                 
                 if data.get('data') and len(data['data']) > 0:
                     image_info = data['data'][0]
-                    image_url = image_info['urls']['original']
+                    if self.dedup_window > 0:
+                        dedup_key = self._dedup_key(event)
+                        image_info = self._pick_unseen(dedup_key, data['data'])
+                        self._remember(dedup_key, image_info)
+                    image_urls = image_info['urls']
                     title = image_info.get('title', '未知')
                     author = image_info.get('author', '未知')
                     
-                    # 扣除积分
-                    user_info["total_points"] -= cost
+                    # 先准备图片（下载、缓存、上传），失败时尚未扣除积分
+                    image = await self._image_component(image_urls)
                     
-                    # 记录积分变动
-                    desc = f"获取{setu_type}"
-                    self.checkin_module.add_points_record(
-                        user_info, 
-                        -cost, 
-                        "涩图", 
-                        desc
-                    )
+                    with self.stage_timer("mutation"):
+                        # 请求期间用户记录可能已被换出内存，重新获取
+                        user_info = economy.get_user_info(user_id)
+                        
+                        # 请求期间抢劫或另一次涩图请求可能已扣除积分，扣除前重新检查余额
+                        # （检查和扣除之间没有 await，不会被其他命令插入）
+                        deducted = user_info["total_points"] >= cost
+                        if deducted:
+                            # 扣除积分
+                            user_info["total_points"] -= cost
+                            
+                            # 记录积分变动
+                            desc = f"获取{setu_type}"
+                            economy.add_points_record(
+                                user_info, 
+                                -cost, 
+                                "涩图", 
+                                desc,
+                                user_id=user_id,
+                                group_id=event.message_obj.group_id
+                            )
+                    if not deducted:
+                        self.count("setu_insufficient_after_fetch_total")
+                        yield self._insufficient_points_result(event, user_id, user_info, cost, setu_type)
+                        return
                     
                     # 保存数据
-                    self.checkin_module.save_data()
+                    economy.save_data()
                     
                     # 更新冷却时间
                     if self.cooldown > 0:
@@ -145,32 +401,35 @@ class SetuModule(BaseModule):
                     chain = [
                         At(qq=user_id),
                         Plain(text=message_text),
-                        Image.fromURL(image_url, size='original')
+                        image
                     ]
                     yield event.chain_result(chain)
                 else:
                     yield event.plain_result("没有找到涩图，积分未扣除。")
                     
             except httpx.HTTPStatusError as e:
+                self.count("upstream_errors_total", reason=f"http_{e.response.status_code}")
                 self.log_error(f"获取涩图时发生HTTP错误: {e.response.status_code}")
                 yield event.plain_result(f"获取涩图失败（HTTP {e.response.status_code}），积分未扣除。")
             except httpx.TimeoutException:
+                self.count("upstream_errors_total", reason="timeout")
                 self.log_error("获取涩图超时")
                 yield event.plain_result("获取涩图超时，请稍后重试，积分未扣除。")
             except httpx.HTTPError as e:
+                self.count("upstream_errors_total", reason="network")
                 self.log_error(f"获取涩图时发生网络错误: {e}")
                 yield event.plain_result(f"网络错误，积分未扣除。")
             except Exception as e:
                 self.log_error(f"获取涩图时发生未知错误: {e}")
                 yield event.plain_result(f"发生错误，积分未扣除。")
     
-    async def get_normal_setu(self, event: AstrMessageEvent):
+    async def get_normal_setu(self, event: AstrMessageEvent, economy: CheckInModule):
         """获取普通涩图（消耗10积分）"""
-        async for result in self.process_setu_request(event, is_r18=False):
+        async for result in self.process_setu_request(event, economy, is_r18=False):
             yield result
     
-    async def get_r18_setu(self, event: AstrMessageEvent):
+    async def get_r18_setu(self, event: AstrMessageEvent, economy: CheckInModule):
         """获取R18涩图（消耗30积分）"""
-        async for result in self.process_setu_request(event, is_r18=True):
+        async for result in self.process_setu_request(event, economy, is_r18=True):
             yield result
 
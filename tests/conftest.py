@@ -0,0 +1,41 @@
+"""
+测试公共配置 - 使用 tools/_astrbot_stub.py 中的 AstrBot 替身加载插件
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+import _astrbot_stub as stub  # noqa: E402
+
+stub.install()
+stub.import_plugin("main")
+
+
+def plugin_module(name: str):
+    """导入插件子模块，如 plugin_module("utils.user_store")"""
+    return stub.import_plugin(name)
+
+
+@pytest.fixture
+def make_plugin(tmp_path):
+    """创建使用临时数据目录的插件实例（需在事件循环中调用 initialize）"""
+    def factory(config=None, admins=("1",)):
+        stub.StarTools.data_dir = tmp_path
+        main = stub.import_plugin("main")
+        return main.GroupMessagesPlugin(stub.FakeContext(admins=list(admins)), dict(config or {}))
+    return factory
+
+
+async def collect(results):
+    """收集命令处理器产生的全部回复"""
+    return [result async for result in results]
+
+
+def run(coro):
+    """在新的事件循环中运行协程"""
+    return asyncio.run(coro)
@@ -0,0 +1,95 @@
+"""积分审计日志的批量写出、轮转和丢弃"""
+
+import asyncio
+import json
+
+from conftest import plugin_module, run
+
+audit_log = plugin_module("utils.audit_log")
+AuditLog = audit_log.AuditLog
+MetricsRegistry = plugin_module("utils.metrics").MetricsRegistry
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_in_order_on_close(tmp_path):
+    async def scenario():
+        log = AuditLog(tmp_path, flush_interval=60)
+        for i in range(5):
+            log.record(event="points", user_id=str(i), delta=i)
+        # 未到 flush_interval 且未达到 batch_size，记录仍在内存中
+        await asyncio.sleep(0.01)
+        assert not log.path.exists()
+        await log.close()
+        return log
+
+    log = run(scenario())
+    lines = read_lines(log.path)
+    assert [line["user_id"] for line in lines] == ["0", "1", "2", "3", "4"]
+    assert all("ts" in line for line in lines)
+
+
+def test_full_batch_is_written_without_waiting(tmp_path):
+    async def scenario():
+        log = AuditLog(tmp_path, batch_size=3, flush_interval=60)
+        for i in range(3):
+            log.record(event="points", user_id=str(i))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if log.path.exists():
+                break
+        written = log.path.exists()
+        await log.close()
+        return written
+
+    assert run(scenario())
+
+
+def test_rotation_keeps_at_most_backups_files(tmp_path):
+    async def scenario():
+        log = AuditLog(tmp_path, max_bytes=300, backups=2, batch_size=1, flush_interval=60)
+        for i in range(40):
+            log.record(event="points", user_id=str(i), delta=i)
+            await asyncio.sleep(0)
+            while log._writer_task is not None and log._pending:
+                await asyncio.sleep(0.001)
+        await log.close()
+        return log
+
+    log = run(scenario())
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["audit.1.jsonl", "audit.2.jsonl", "audit.jsonl"]
+    assert all(p.stat().st_size <= 300 for p in tmp_path.iterdir())
+    # 保留的都是最新的记录，且轮转前后的文件顺序连续
+    ids = [int(line["user_id"]) for name in ("audit.2.jsonl", "audit.1.jsonl", "audit.jsonl")
+           for line in read_lines(tmp_path / name)]
+    assert ids == list(range(ids[0], 40))
+    assert ids[0] > 0
+
+
+def test_overflow_is_dropped_and_reported(tmp_path):
+    metrics = MetricsRegistry()
+
+    async def scenario():
+        log = AuditLog(tmp_path, max_pending=3, flush_interval=60, metrics=metrics)
+        for i in range(5):
+            log.record(event="points", user_id=str(i))
+        await log.close()
+        return log
+
+    log = run(scenario())
+    lines = read_lines(log.path)
+    assert [line.get("user_id") for line in lines[:3]] == ["0", "1", "2"]
+    assert lines[3]["event"] == "dropped" and lines[3]["count"] == 2
+    assert sum(metrics.counters["audit_records_dropped_total"].values()) == 2
+
+
+def test_records_without_event_loop_are_kept_until_close(tmp_path):
+    log = AuditLog(tmp_path)
+    log.record(event="points", user_id="1")
+    assert log._writer_task is None
+    run(log.close())
+    assert [line["user_id"] for line in read_lines(log.path)] == ["1"]
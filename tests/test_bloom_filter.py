@@ -0,0 +1,52 @@
+"""按代轮换的布隆过滤器"""
+
+from conftest import plugin_module
+
+bloom_filter = plugin_module("utils.bloom_filter")
+BloomFilter = bloom_filter.BloomFilter
+RotatingBloomFilter = bloom_filter.RotatingBloomFilter
+
+
+def false_positive_rate(bloom, probes=20000):
+    return sum(f"absent-{i}" in bloom for i in range(probes)) / probes
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_error():
+    bloom = BloomFilter(5000, 0.01)
+    keys = [f"key-{i}" for i in range(5000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert false_positive_rate(bloom) < 0.02
+
+
+def test_rotation_remembers_the_most_recent_capacity_keys():
+    bloom = RotatingBloomFilter(1000, error_rate=0.01, generations=3)
+    for i in range(10500):
+        bloom.add(f"key-{i}")
+        # 任何时刻最近 capacity 个元素都不会被遗忘
+        if i % 997 == 0:
+            assert all(f"key-{j}" in bloom for j in range(max(0, i - 999), i + 1))
+    assert len(bloom._filters) == 3
+
+
+def test_rotation_forgets_old_generations():
+    bloom = RotatingBloomFilter(1000, error_rate=0.01, generations=2)
+    for i in range(1000):
+        bloom.add(f"old-{i}")
+    # 再写满两代后，最老的一代已被丢弃，旧元素只可能因误判出现
+    for i in range(2000):
+        bloom.add(f"new-{i}")
+    remembered = sum(f"old-{i}" in bloom for i in range(1000)) / 1000
+    assert remembered < 0.03
+
+
+def test_memory_and_error_rate_stay_fixed_across_rotations():
+    bloom = RotatingBloomFilter(2000, error_rate=0.01, generations=2)
+    nbytes = bloom.nbytes
+    for i in range(20000):
+        bloom.add(f"key-{i}")
+    assert bloom.nbytes == nbytes
+    assert sum(f.nbytes for f in bloom._filters) <= nbytes
+    # 每代按 error_rate / generations 设计，查询全部代的总误判率不超过 error_rate
+    assert false_positive_rate(bloom) < 0.015
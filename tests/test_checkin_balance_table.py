@@ -0,0 +1,42 @@
+"""积分表与分层存储"""
+
+from conftest import plugin_module, run, stub
+
+CheckInModule = plugin_module("modules.checkin").CheckInModule
+
+
+async def load(tmp_path, config):
+    module = CheckInModule(stub.FakeContext(), tmp_path, {"audit_log_enabled": False, **config})
+    await module.initialize()
+    await module.wait_ready()
+    return module
+
+
+def test_balance_table_requires_tiered_store(tmp_path):
+    async def scenario():
+        module = await load(tmp_path, {"balance_table_enabled": True})
+        state = module.balance_table, module.tiered
+        await module.terminate()
+        return state
+
+    assert run(scenario()) == (None, False)
+    assert not (tmp_path / "balances.bin").exists()
+
+
+def test_balance_table_with_tiered_store_survives_restart(tmp_path):
+    config = {"balance_table_enabled": True, "user_cache_size": 10}
+
+    async def scenario():
+        module = await load(tmp_path, config)
+        assert module.balance_table is not None and module.tiered
+        module.get_user_info("7")["total_points"] = 123
+        module.save_data()
+        await module.terminate()
+        module = await load(tmp_path, config)
+        points = module.get_user_info("7")["total_points"]
+        await module.terminate()
+        return points
+
+    assert run(scenario()) == 123
+    assert (tmp_path / "balances.bin").exists()
+    assert not (tmp_path / "checkin_data.json").exists()
@@ -0,0 +1,43 @@
+"""导出积分数据时的写时复制快照"""
+
+import json
+
+from conftest import plugin_module, run, stub
+
+CheckInModule = plugin_module("modules.checkin").CheckInModule
+
+
+def make_module(tmp_path, users):
+    module = CheckInModule(stub.FakeContext(), tmp_path, {"audit_log_enabled": False})
+    run(module.initialize())
+    for i in range(users):
+        module.get_user_info(str(i))["total_points"] = 100
+    return module
+
+
+def exported_points(output_dir):
+    with open(output_dir / "users.jsonl", encoding="utf-8") as f:
+        return {row["user_id"]: row["total_points"] for row in map(json.loads, f)}
+
+
+def test_export_is_a_snapshot_and_copies_stay_bounded(tmp_path):
+    module = make_module(tmp_path / "data", users=50)
+    sizes = []
+
+    def progress(done, total):
+        # 每批写出后修改全部用户（已写出的、尚未写出的），再新建一个用户并访问两次
+        for i in range(total):
+            module.get_user_info(str(i))["total_points"] += 1
+        new_id = f"new{done}"
+        module.get_user_info(new_id)
+        module.get_user_info(new_id)
+        sizes.append(len(module._export_originals))
+
+    exporter = run(module.export_data(tmp_path / "out", chunk_size=10, progress=progress))
+    points = exported_points(tmp_path / "out")
+    assert exporter.users == 50
+    assert set(points.values()) == {100}
+    # 只为尚未写出的用户保留副本，已写出的和导出开始后新建的用户不再复制
+    assert sizes == [40, 30, 20, 10, 0]
+    assert module._export_originals is None
+    assert not module._export_pending
@@ -0,0 +1,37 @@
+"""积分记录分页（内存中的记录与归档）"""
+
+from conftest import collect, plugin_module, run, stub
+
+CheckInModule = plugin_module("modules.checkin").CheckInModule
+
+
+def entry(day, points):
+    return {"date": f"2026-09-{day:02d} 08:00:00", "action": "签到", "points": points}
+
+
+def make_module(tmp_path, recent_days, archived_days):
+    module = CheckInModule(stub.FakeContext(), tmp_path, {"audit_log_enabled": False})
+    run(module.initialize())
+    module.get_user_info("7")["points_history"] = [entry(day, day) for day in recent_days]
+    module.history_archive.append("7", [entry(day, day) for day in archived_days])
+    return module
+
+
+def shown_points(module, text):
+    results = run(collect(module.points_history(stub.FakeEvent("7", text))))
+    lines = results[0].text().strip().splitlines()[1:]
+    return [int(line.split()[-1].lstrip("+")) for line in lines if line[:4].isdigit()]
+
+
+def test_first_page_falls_back_to_archive(tmp_path):
+    # 过期的记录已被归档，内存中只剩 3 条
+    module = make_module(tmp_path, recent_days=range(16, 19), archived_days=range(1, 16))
+    assert shown_points(module, "积分记录") == list(range(18, 8, -1))
+    assert shown_points(module, "积分记录 2") == list(range(8, 0, -1))
+    assert shown_points(module, "积分记录 3") == []
+
+
+def test_full_recent_page_keeps_archive_on_later_pages(tmp_path):
+    module = make_module(tmp_path, recent_days=range(11, 21), archived_days=range(1, 11))
+    assert shown_points(module, "积分记录 1") == list(range(20, 10, -1))
+    assert shown_points(module, "积分记录 2") == list(range(10, 0, -1))
@@ -0,0 +1,73 @@
+"""独立经济分区的加载与卸载"""
+
+import asyncio
+
+from conftest import collect, plugin_module, run, stub
+
+MaintenanceBudget = plugin_module("utils.maintenance").MaintenanceBudget
+
+GROUP = "55"
+
+
+def reward_event(sender_id, target="8", amount=30):
+    return stub.FakeEvent(sender_id, f"奖励 {amount}", group_id=GROUP, components=[stub.At(qq=target)])
+
+
+def test_non_superuser_reward_does_not_load_partition(make_plugin):
+    async def scenario():
+        plugin = make_plugin({"isolated_economy_groups": GROUP})
+        await plugin.initialize()
+        await plugin.checkin_module.wait_ready()
+        results = await collect(plugin.reward_points_command(reward_event("7")))
+        loaded = dict(plugin.checkin_module.partitions)
+        await plugin.terminate()
+        return results, loaded
+
+    results, loaded = run(scenario())
+    assert [r.text() for r in results] == ["仅允许超级管理员执行此操作"]
+    assert loaded == {}
+
+
+def test_partition_in_use_is_not_unloaded(make_plugin):
+    async def scenario():
+        plugin = make_plugin({"isolated_economy_groups": GROUP})
+        await plugin.initialize()
+        checkin = plugin.checkin_module
+        await checkin.wait_ready()
+        await collect(plugin.reward_points_command(reward_event("1")))
+        checkin.PARTITION_IDLE_SECONDS = 0
+        async with checkin.use_economy(GROUP) as economy:
+            # 命令持有分区期间（如等待上游请求）后台维护不会卸载它
+            assert await checkin._unload_idle_partitions(MaintenanceBudget(10)) == 0
+            economy.get_user_info("8")["total_points"] += 1
+            economy.save_data()
+        assert await checkin._unload_idle_partitions(MaintenanceBudget(10)) == 1
+        assert GROUP not in checkin.partitions
+        # 卸载后的下一条命令重新加载分区
+        await collect(plugin.reward_points_command(reward_event("1")))
+        points = checkin.partitions[GROUP].get_user_info("8")["total_points"]
+        global_points = checkin.get_user_info("8")["total_points"]
+        await plugin.terminate()
+        return points, global_points
+
+    assert run(scenario()) == (61, 0)
+
+
+def test_reload_waits_for_partition_being_unloaded(make_plugin):
+    async def scenario():
+        plugin = make_plugin({"isolated_economy_groups": GROUP})
+        await plugin.initialize()
+        checkin = plugin.checkin_module
+        await checkin.wait_ready()
+        await collect(plugin.reward_points_command(reward_event("1")))
+        checkin.PARTITION_IDLE_SECONDS = 0
+        # 卸载（保存）进行中时到达的命令等卸载完成后再加载，读到已保存的数据
+        unloading = asyncio.create_task(checkin._unload_idle_partitions(MaintenanceBudget(10)))
+        await asyncio.sleep(0)
+        await collect(plugin.reward_points_command(reward_event("1")))
+        await unloading
+        points = checkin.partitions[GROUP].get_user_info("8")["total_points"]
+        await plugin.terminate()
+        return points
+
+    assert run(scenario()) == 60
@@ -0,0 +1,86 @@
+"""连续签到与签到位图"""
+
+from datetime import date, timedelta
+
+from conftest import collect, plugin_module, run, stub
+
+CheckInModule = plugin_module("modules.checkin").CheckInModule
+
+TODAY = date(2026, 3, 10)
+
+
+def make_module(tmp_path):
+    return CheckInModule(stub.FakeContext(), tmp_path, {"audit_log_enabled": False})
+
+
+def check_in(module, user_info, day):
+    streak = module.update_streak(user_info, day)
+    user_info["last_checkin_date"] = day.isoformat()
+    return streak
+
+
+def test_consecutive_days_extend_streak_and_bitmap(tmp_path):
+    module = make_module(tmp_path)
+    user = {"last_checkin_date": None}
+    streaks = [check_in(module, user, TODAY + timedelta(days=i)) for i in range(5)]
+    assert streaks == [1, 2, 3, 4, 5]
+    assert user["checkin_bitmap"] == "1f"
+    assert user["max_streak"] == 5
+
+
+def test_gap_resets_streak_but_keeps_history(tmp_path):
+    module = make_module(tmp_path)
+    user = {"last_checkin_date": None}
+    check_in(module, user, TODAY)
+    check_in(module, user, TODAY + timedelta(days=1))
+    assert check_in(module, user, TODAY + timedelta(days=4)) == 1
+    last = TODAY + timedelta(days=4)
+    assert module.has_checked_in_on(user, TODAY)
+    assert module.has_checked_in_on(user, TODAY + timedelta(days=1))
+    assert not module.has_checked_in_on(user, TODAY + timedelta(days=2))
+    assert module.has_checked_in_on(user, last)
+    assert user["max_streak"] == 2
+
+
+def test_bitmap_is_bounded_to_window(tmp_path):
+    module = make_module(tmp_path)
+    user = {"last_checkin_date": None}
+    for i in range(CheckInModule.BITMAP_DAYS + 10):
+        check_in(module, user, TODAY + timedelta(days=i))
+    assert int(user["checkin_bitmap"], 16) == CheckInModule.BITMAP_MASK
+    assert check_in(module, user, TODAY + timedelta(days=CheckInModule.BITMAP_DAYS + 500)) == 1
+    assert user["checkin_bitmap"] == "1"
+
+
+def test_same_day_is_a_no_op(tmp_path):
+    module = make_module(tmp_path)
+    user = {"last_checkin_date": None}
+    check_in(module, user, TODAY)
+    check_in(module, user, TODAY + timedelta(days=1))
+    assert check_in(module, user, TODAY + timedelta(days=1)) == 2
+    assert user["checkin_bitmap"] == "3"
+
+
+def test_future_last_checkin_date_resets_instead_of_crashing(tmp_path):
+    module = make_module(tmp_path)
+    user = {"last_checkin_date": (TODAY + timedelta(days=3)).isoformat(),
+            "checkin_bitmap": "7", "current_streak": 3}
+    assert module.update_streak(user, TODAY) == 1
+    assert user["checkin_bitmap"] == "1"
+
+
+def test_checkin_command_with_future_date(make_plugin):
+    async def scenario():
+        plugin = make_plugin({"audit_log_enabled": False})
+        await plugin.initialize()
+        await plugin.checkin_module.wait_ready()
+        user = plugin.checkin_module.get_user_info("7")
+        user["last_checkin_date"] = (date.today() + timedelta(days=2)).isoformat()
+        replies = await collect(plugin.checkin_command(stub.FakeEvent("7", "签到", group_id="55")))
+        await plugin.terminate()
+        return replies, user
+
+    replies, user = run(scenario())
+    assert replies
+    assert user["last_checkin_date"] == date.today().isoformat()
+    assert user["current_streak"] == 1
@@ -0,0 +1,31 @@
+"""命令延迟指标"""
+
+import asyncio
+
+from conftest import run
+
+
+def histogram(plugin, name, command):
+    series = plugin.metrics.histograms[name]
+    return next(h for key, h in series.items() if ("command", command) in key)
+
+
+def test_latency_excludes_reply_delivery(make_plugin):
+    async def handler():
+        await asyncio.sleep(0.01)
+        yield "first"
+        await asyncio.sleep(0.01)
+        yield "second"
+
+    async def scenario():
+        plugin = make_plugin({"metrics_enabled": True})
+        async for _ in plugin._run_command("demo", handler()):
+            # 模拟框架发送回复的耗时
+            await asyncio.sleep(0.05)
+        return plugin
+
+    plugin = run(scenario())
+    latency = histogram(plugin, "command_latency_seconds", "demo").total
+    delivery = histogram(plugin, "command_delivery_seconds", "demo").total
+    assert 0.02 <= latency < 0.05
+    assert delivery >= 0.1
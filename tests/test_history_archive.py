@@ -0,0 +1,54 @@
+"""积分记录归档：缓冲区、正在写出的批次与文件中的块"""
+
+from conftest import plugin_module
+
+HistoryArchive = plugin_module("utils.history_archive").HistoryArchive
+
+
+def entry(day, points):
+    return {"date": f"2026-09-{day:02d} 08:00:00", "action": "签到", "points": points}
+
+
+def read_points(archive, snapshot):
+    return [e["points"] for e in archive.read_recent("7", 0, 100, snapshot)]
+
+
+def test_pending_entries_are_visible_through_snapshot_only(tmp_path):
+    archive = HistoryArchive(tmp_path)
+    archive.append("7", [entry(1, 1), entry(2, 2)])
+    snapshot = archive.snapshot_pending()
+    assert archive.months(snapshot) == ["2026-09"]
+    assert archive.months() == []
+    assert read_points(archive, snapshot) == [2, 1]
+
+
+def test_batch_being_written_stays_visible_exactly_once(tmp_path):
+    archive = HistoryArchive(tmp_path)
+    archive.append("7", [entry(1, 1)])
+    archive.flush()
+    archive.append("7", [entry(2, 2), entry(3, 3)])
+    batch, pending = archive.take_pending()
+    archive.append("7", [entry(4, 4)])
+
+    # 已取出、尚未写出：仍能从快照中读到
+    before_write = archive.snapshot_pending()
+    assert read_points(archive, before_write) == [4, 3, 2, 1]
+
+    # 写出后、finish_write 之前：之前的快照和新快照都不会重复读到同一批记录
+    archive.write(batch, pending)
+    assert read_points(archive, before_write) == [4, 3, 2, 1]
+    assert read_points(archive, archive.snapshot_pending()) == [4, 3, 2, 1]
+
+    archive.finish_write(batch)
+    assert read_points(archive, archive.snapshot_pending()) == [4, 3, 2, 1]
+    archive.flush()
+    assert read_points(archive, archive.snapshot_pending()) == [4, 3, 2, 1]
+    assert read_points(archive, None) == [4, 3, 2, 1]
+
+
+def test_failed_write_is_dropped_from_snapshot(tmp_path):
+    archive = HistoryArchive(tmp_path)
+    archive.append("7", [entry(1, 1)])
+    batch, _ = archive.take_pending()
+    archive.finish_write(batch)
+    assert read_points(archive, archive.snapshot_pending()) == []
@@ -0,0 +1,127 @@
+"""图片缓存：内容哈希、别名、TTL 与大小淘汰，以及涩图模块的复用"""
+
+import hashlib
+
+from conftest import plugin_module, run, stub
+
+ImageCache = plugin_module("utils.image_cache").ImageCache
+
+
+def test_alias_lookup_resolves_to_cached_entry(tmp_path):
+    cache = ImageCache(tmp_path)
+    entry = cache.add("http://a/1.jpg", cache.write_file(b"same", ".jpg"))
+    assert entry.digest == hashlib.sha256(b"same").hexdigest()
+    # 不同地址、相同内容：共用一个文件和条目
+    again = cache.add("http://b/1.jpg", cache.write_file(b"same", ".jpg"))
+    assert again is entry
+    assert cache.lookup("http://b/1.jpg") is entry
+    assert len(list(tmp_path.glob("*.jpg"))) == 1
+    assert cache.lookup("http://c/unknown.jpg") is None
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_size_eviction_removes_file_and_aliases(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=25)
+    first = cache.add("http://a/1.jpg", cache.write_file(b"x" * 10, ".jpg"))
+    cache.add("http://b/1.jpg", first)
+    cache.add("http://a/2.jpg", cache.write_file(b"y" * 10, ".jpg"))
+    cache.add("http://a/3.jpg", cache.write_file(b"z" * 10, ".jpg"))
+    assert not first.path.exists()
+    assert cache.lookup("http://a/1.jpg") is None
+    assert cache.lookup("http://b/1.jpg") is None
+    assert "http://b/1.jpg" not in cache._aliases
+    assert cache.stats()["entries"] == 2 and cache.stats()["bytes"] == 20
+
+
+def test_ttl_expiry_removes_file(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("time.time", lambda: clock[0])
+    cache = ImageCache(tmp_path, ttl=60)
+    entry = cache.add("http://a/1.jpg", cache.write_file(b"old", ".jpg"))
+    cache.add("http://b/1.jpg", entry)
+    clock[0] += 61
+    assert cache.lookup("http://a/1.jpg") is None
+    assert not entry.path.exists()
+    assert cache._aliases == {}
+
+    fresh = cache.add("http://a/2.jpg", cache.write_file(b"new", ".jpg"))
+    clock[0] += 61
+    assert cache.prune_expired() == 1
+    assert not fresh.path.exists()
+
+
+def test_index_survives_restart(tmp_path):
+    cache = ImageCache(tmp_path)
+    entry = cache.add("http://a/1.jpg", cache.write_file(b"data", ".jpg"))
+    cache.set_reference(entry.digest, "resource://1")
+    cache.save()
+    reloaded = ImageCache(tmp_path)
+    reloaded.load()
+    assert reloaded.lookup("http://a/1.jpg").reference == "resource://1"
+
+
+def test_setu_repeat_delivery_skips_download_and_upload(make_plugin):
+    async def scenario():
+        plugin = make_plugin({"audit_log_enabled": False})
+        await plugin.initialize()
+        module = plugin.setu_module
+        downloads = []
+
+        async def download(url):
+            downloads.append(url)
+            return module.image_cache.write_file(b"same image", ".jpg")
+        module._download_image = download
+        module.uploader = stub.FakeImageUploader()
+
+        first = await module._image_component({"original": "http://a/1.jpg"})
+        second = await module._image_component({"original": "http://a/1.jpg"})
+        # 相同内容的其他地址：下载一次，复用已上传的资源引用
+        third = await module._image_component({"original": "http://b/1.jpg"})
+        stats = module.image_cache.stats()
+        await plugin.terminate()
+        return downloads, module.uploader.uploads, (first, second, third), stats
+
+    downloads, uploads, images, stats = run(scenario())
+    assert downloads == ["http://a/1.jpg", "http://b/1.jpg"]
+    assert len(uploads) == 1
+    assert images[0].file == images[1].file == images[2].file
+    assert images[0].file.startswith("fake-resource://")
+    assert stats["entries"] == 1
+    assert abs(stats["hit_rate"] - 1 / 3) < 1e-9
+
+
+def test_download_batches_chunk_writes(make_plugin, monkeypatch):
+    import asyncio
+
+    import httpx
+
+    body = bytes(range(256)) * 1024  # 256 KB，共 4 个 64 KB 分块
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs)
+    )
+    writes = []
+    real_to_thread = asyncio.to_thread
+
+    async def to_thread(func, *args):
+        if getattr(func, "__name__", "") == "writelines":
+            writes.append(len(args[0]))
+        return await real_to_thread(func, *args)
+    monkeypatch.setattr(asyncio, "to_thread", to_thread)
+
+    async def scenario():
+        plugin = make_plugin({"audit_log_enabled": False})
+        await plugin.initialize()
+        module = plugin.setu_module
+        module.DOWNLOAD_WRITE_SIZE = 128 * 1024
+        entry = await module._download_image("http://a/big.jpg")
+        data = entry.path.read_bytes()
+        await plugin.terminate()
+        return entry, data
+
+    entry, data = run(scenario())
+    assert data == body
+    assert entry.digest == hashlib.sha256(body).hexdigest()
+    # 每次线程写入攒够两个分块
+    assert writes == [2, 2]
@@ -0,0 +1,83 @@
+"""签到奖励表的别名表抽取"""
+
+from collections import Counter
+
+import pytest
+
+from conftest import plugin_module
+
+reward_table = plugin_module("utils.reward_table")
+RewardTable = reward_table.RewardTable
+
+CONFIG = {
+    "min_points": 10, "max_points": 49,
+    "rewards": [
+        {"points": 213, "probability": 0.02, "description": "才不是2B呢"},
+        {"min": 51, "max": 200, "probability": 0.1, "description": "运气不错哦"},
+        {"points": 0, "probability": 0.3, "description": "空手而归"},
+    ],
+}
+
+SAMPLES = 100000
+
+
+class GridRandom:
+    """依次返回 [0, 1) 上等距的点，抽取结果的频率即为各结果在 [0, 1) 上所占的长度"""
+
+    def __init__(self, samples: int):
+        self.samples = samples
+        self.index = 0
+
+    def random(self) -> float:
+        value = (self.index + 0.5) / self.samples
+        self.index += 1
+        return value
+
+
+def draw_all(table):
+    rng = GridRandom(SAMPLES)
+    return [table.draw(rng) for _ in range(SAMPLES)]
+
+
+def test_draw_frequencies_match_configured_probabilities():
+    table = RewardTable.from_config(CONFIG)
+    counts = Counter(description for _, description in draw_all(table))
+    expected = {"": 0.58, "才不是2B呢": 0.02, "运气不错哦": 0.1, "空手而归": 0.3}
+    assert set(counts) == set(expected)
+    for description, probability in expected.items():
+        assert counts[description] / SAMPLES == pytest.approx(probability, abs=1e-4)
+
+
+def test_points_are_uniform_within_each_range():
+    table = RewardTable.from_config(CONFIG)
+    draws = draw_all(table)
+    normal = Counter(points for points, description in draws if description == "")
+    ranged = Counter(points for points, description in draws if description == "运气不错哦")
+    assert set(normal) == set(range(10, 50))
+    assert set(ranged) == set(range(51, 201))
+    assert max(normal.values()) - min(normal.values()) <= 2
+    assert max(ranged.values()) - min(ranged.values()) <= 2
+    assert {points for points, description in draws if description == "才不是2B呢"} == {213}
+
+
+def test_probabilities_do_not_depend_on_config_order():
+    reordered = dict(CONFIG, rewards=list(reversed(CONFIG["rewards"])))
+    first = Counter(description for _, description in draw_all(RewardTable.from_config(CONFIG)))
+    second = Counter(description for _, description in draw_all(RewardTable.from_config(reordered)))
+    for description in first:
+        assert first[description] == pytest.approx(second[description], abs=SAMPLES * 1e-4)
+
+
+def test_expected_points():
+    table = RewardTable.from_config(CONFIG)
+    assert table.expected_points == pytest.approx(0.58 * 29.5 + 0.02 * 213 + 0.1 * 125.5)
+
+
+def test_invalid_probabilities_are_rejected():
+    with pytest.raises(ValueError):
+        RewardTable.from_config(dict(CONFIG, rewards=[{"points": 100, "probability": 1.5}]))
+    with pytest.raises(ValueError):
+        RewardTable.from_config(dict(CONFIG, rewards=[{"points": 100, "probability": 0.6},
+                                                      {"points": 200, "probability": 0.6}]))
+    with pytest.raises(ValueError):
+        RewardTable.from_config(dict(CONFIG, rewards=[{"probability": 0.1}]))
@@ -0,0 +1,119 @@
+"""出站发送队列的速率限制和优先级"""
+
+import asyncio
+import time
+
+from conftest import plugin_module, run, stub
+
+SendQueue = plugin_module("utils.send_queue").SendQueue
+MetricsRegistry = plugin_module("utils.metrics").MetricsRegistry
+
+# 计时误差容限（秒）
+TOLERANCE = 0.005
+
+
+def assert_spaced(started, times, interval):
+    """第 k 条消息不早于入队后 k 个间隔发送（事件循环繁忙只会让发送更晚，不会更早）"""
+    for k, sent_at in enumerate(sorted(times)):
+        assert sent_at - started >= k * interval - TOLERANCE
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, session, chain):
+        self.sent.append((time.monotonic(), session, chain[0].file if isinstance(chain[0], stub.Image)
+                          else chain[0].text))
+
+
+def text(value):
+    return [stub.Plain(value)]
+
+
+def image(value):
+    return [stub.Image.fromURL(value)]
+
+
+def test_session_interval_is_respected():
+    recorder = Recorder()
+
+    async def scenario():
+        queue = SendQueue(recorder.send, group_interval=0.05, global_rate=0)
+        started = time.monotonic()
+        for i in range(4):
+            queue.put("g1", text(str(i)))
+        await queue.drain()
+        return started
+
+    started = run(scenario())
+    assert [value for _, _, value in recorder.sent] == ["0", "1", "2", "3"]
+    assert_spaced(started, [t for t, _, _ in recorder.sent], 0.05)
+
+
+def test_global_rate_limits_all_sessions_together():
+    recorder = Recorder()
+
+    async def scenario():
+        queue = SendQueue(recorder.send, group_interval=0, global_rate=50)
+        started = time.monotonic()
+        for session in ("g1", "g2", "g3", "g4"):
+            for i in range(3):
+                queue.put(session, text(f"{session}-{i}"))
+        await queue.drain()
+        return started
+
+    started = run(scenario())
+    assert len(recorder.sent) == 12
+    assert_spaced(started, [t for t, _, _ in recorder.sent], 0.02)
+
+
+def test_text_is_sent_before_queued_images():
+    recorder = Recorder()
+
+    async def scenario():
+        queue = SendQueue(recorder.send, group_interval=0.01, global_rate=0)
+        queue.put("g1", image("a.jpg"))
+        queue.put("g1", image("b.jpg"))
+        queue.put("g1", text("hello"))
+        await queue.drain()
+
+    run(scenario())
+    assert [value for _, _, value in recorder.sent] == ["hello", "a.jpg", "b.jpg"]
+
+
+def test_full_queue_drops_oldest_image_first():
+    recorder = Recorder()
+    metrics = MetricsRegistry()
+
+    async def scenario():
+        queue = SendQueue(recorder.send, group_interval=0, global_rate=0, max_pending=2, metrics=metrics)
+        queue.put("g1", text("first"))
+        queue.put("g1", image("a.jpg"))
+        queue.put("g1", text("second"))
+        assert queue.depth == 2
+        await queue.drain()
+        return queue
+
+    queue = run(scenario())
+    assert [value for _, _, value in recorder.sent] == ["first", "second"]
+    assert queue.depth == 0
+    assert sum(metrics.counters["send_queue_dropped_total"].values()) == 1
+
+
+def test_drain_gives_up_after_timeout():
+    recorder = Recorder()
+
+    async def scenario():
+        queue = SendQueue(recorder.send, group_interval=10, global_rate=0)
+        queue.put("g1", text("first"))
+        queue.put("g1", text("second"))
+        started = time.monotonic()
+        await queue.drain(timeout=0.05)
+        await asyncio.sleep(0)
+        return time.monotonic() - started, queue
+
+    elapsed, queue = run(scenario())
+    assert elapsed < 1
+    assert [value for _, _, value in recorder.sent] == ["first"]
+    assert queue.stats()["sessions"] == 0
@@ -0,0 +1,67 @@
+"""涩图模块：扣费顺序"""
+
+import pytest
+
+from conftest import collect, run, stub
+
+pytest.importorskip("httpx")
+
+API_DATA = {"data": [{"pid": 1, "title": "t", "author": "a",
+                      "urls": {"original": "http://img.invalid/1.jpg"}}]}
+
+
+def setu_scenario(make_plugin, image_component):
+    async def scenario():
+        plugin = make_plugin({"setu_cooldown": 0, "setu_dedup_window": 0, "audit_log_enabled": False})
+        await plugin.initialize()
+        await plugin.checkin_module.wait_ready()
+        plugin.checkin_module.get_user_info("7")["total_points"] = 100
+        module = plugin.setu_module
+
+        async def fetch_setu(r18=0, num=1):
+            return API_DATA
+        module.fetch_setu = fetch_setu
+        module._image_component = image_component
+        replies = await collect(plugin.normal_setu_command(stub.FakeEvent("7", "来张涩图", group_id="55")))
+        points = plugin.checkin_module.get_user_info("7")["total_points"]
+        await plugin.terminate()
+        return replies, points
+
+    return run(scenario())
+
+
+def test_failed_image_preparation_does_not_deduct_points(make_plugin):
+    async def broken(urls):
+        raise OSError("disk full")
+
+    replies, points = setu_scenario(make_plugin, broken)
+    assert points == 100
+    assert "积分未扣除" in replies[-1].text()
+
+
+def test_successful_request_deducts_points_once(make_plugin):
+    async def image(urls):
+        return stub.Image.fromURL(urls["original"])
+
+    replies, points = setu_scenario(make_plugin, image)
+    assert points == 90
+    assert replies[-1].chain[-1].file == "http://img.invalid/1.jpg"
+
+
+def test_balance_spent_during_fetch_is_not_overdrawn(make_plugin):
+    plugin_holder = {}
+
+    async def image(urls):
+        # 下载期间用户的积分被抢走
+        plugin_holder["module"].checkin_module.get_user_info("7")["total_points"] = 5
+        return stub.Image.fromURL(urls["original"])
+
+    def make(config):
+        plugin = make_plugin(config)
+        plugin_holder["module"] = plugin
+        return plugin
+
+    replies, points = setu_scenario(make, image)
+    assert points == 5
+    assert "积分不足" in replies[-1].text()
+    assert not any(isinstance(c, stub.Image) for c in replies[-1].chain)
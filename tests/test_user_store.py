@@ -0,0 +1,179 @@
+"""分层用户存储：LRU 淘汰与写回"""
+
+import sqlite3
+
+from conftest import collect, plugin_module, run, stub
+
+TieredUserStore = plugin_module("utils.user_store").TieredUserStore
+MaintenanceBudget = plugin_module("utils.maintenance").MaintenanceBudget
+
+
+def open_store(tmp_path, capacity=1):
+    store = TieredUserStore(tmp_path / "users.sqlite3", capacity=capacity)
+    store.open()
+    return store
+
+
+def on_disk(tmp_path, user_id):
+    return TieredUserStore.read_all(tmp_path / "users.sqlite3").get(user_id)
+
+
+def test_evicted_records_are_written_back_on_flush(tmp_path):
+    store = open_store(tmp_path, capacity=2)
+    for user_id in "abc":
+        store[user_id] = {"total_points": 1}
+    store.flush()
+    assert len(store) == 3
+    assert store.resident_ids() == ["b", "c"]
+    assert on_disk(tmp_path, "a") == {"total_points": 1}
+    store.close()
+
+
+def test_mutation_after_eviction_is_not_lost(tmp_path):
+    store = open_store(tmp_path)
+    store["a"] = {"total_points": 1000}
+    store["b"] = {"total_points": 1000}
+    store.flush()
+
+    robber = store["a"]
+    victim = store["b"]          # 淘汰 a，调用方仍持有 robber
+    robber["total_points"] -= 2
+    victim["total_points"] += 2
+    store.mark_dirty("a", robber)
+    store.mark_dirty("b", victim)
+    store.flush()
+
+    assert on_disk(tmp_path, "a") == {"total_points": 998}
+    assert on_disk(tmp_path, "b") == {"total_points": 1002}
+    store.close()
+
+
+def test_reading_an_evicted_record_returns_the_same_object(tmp_path):
+    store = open_store(tmp_path)
+    store["a"] = {"total_points": 1}
+    record = store["a"]
+    store["b"] = {"total_points": 1}   # 淘汰 a，尚未写回
+    assert store["a"] is record
+    assert "a" in store and store.peek("a") is record
+    record["total_points"] = 5
+    store.flush()
+    assert on_disk(tmp_path, "a") == {"total_points": 5}
+    store.close()
+
+
+def test_delete_drops_pending_write_back(tmp_path):
+    store = open_store(tmp_path)
+    store["a"] = {"total_points": 1}
+    store.flush()
+    store.get("a")
+    store["b"] = {"total_points": 1}
+    del store["a"]
+    store.flush()
+    assert on_disk(tmp_path, "a") is None
+    assert len(store) == 1
+    store.close()
+
+
+def test_reads_do_not_cause_writes(tmp_path):
+    store = open_store(tmp_path, capacity=2)
+    for user_id in "abc":
+        store[user_id] = {"total_points": 1}
+    store.flush()
+    changes = store._conn.total_changes
+    for user_id in "abcabc":
+        assert store[user_id]["total_points"] == 1
+    store.flush()
+    assert store._conn.total_changes == changes
+    store.close()
+
+
+def test_marked_record_is_written_even_after_flush_and_eviction(tmp_path):
+    store = open_store(tmp_path)
+    store["a"] = {"total_points": 1}
+    store.flush()
+    record = store["a"]
+    store.flush()
+    store["b"] = {"total_points": 1}   # 淘汰 a（上次 flush 之后未被取出，不保留）
+    record["total_points"] = 7
+    store.mark_dirty("a", record)
+    store.flush()
+    assert on_disk(tmp_path, "a") == {"total_points": 7}
+    store.close()
+
+
+def test_deleting_unflushed_user_keeps_count(tmp_path):
+    store = open_store(tmp_path)
+    store["a"] = {"total_points": 1}
+    store["b"] = {"total_points": 1}   # 淘汰尚未写回的 a
+    store["c"] = {"total_points": 1}
+    assert len(store) == 3
+    del store["a"]
+    del store["c"]
+    assert len(store) == 1
+    store.flush()
+    assert len(store) == 1
+    assert TieredUserStore.read_all(tmp_path / "users.sqlite3").keys() == {"b"}
+    store.close()
+
+
+def test_ids_after_pages_through_unsaved_users_without_flushing(tmp_path):
+    store = open_store(tmp_path, capacity=2)
+    for user_id in "bd":
+        store[user_id] = {"total_points": 1}
+    store.flush()
+    changes = store._conn.total_changes
+    for user_id in "aec":
+        store[user_id] = {"total_points": 1}   # 尚未写回
+    assert store.ids_after("", 2) == ["a", "b"]
+    assert store.ids_after("b", 2) == ["c", "d"]
+    assert store.ids_after("d", 2) == ["e"]
+    del store["e"]
+    assert store.ids_after("d", 2) == []
+    assert store._conn.total_changes == changes
+    store.close()
+
+
+def test_maintenance_walk_resumes_after_last_visited_user(make_plugin):
+    async def scenario():
+        plugin = make_plugin({"user_cache_size": 2})
+        await plugin.initialize()
+        economy = plugin.checkin_module
+        await economy.wait_ready()
+        for user_id in ("3", "1", "5", "2", "4"):
+            economy.get_user_info(user_id)
+        economy.MAINTENANCE_BATCH_SIZE = 2
+        visited = []
+        # 预算为 0：每次运行处理一批后停下，下次从上次处理到的用户之后继续
+        for _ in range(3):
+            await economy._walk_users("test", MaintenanceBudget(0), lambda user_id: visited.append(user_id))
+        cursor = dict(economy._maintenance_cursors)
+        await plugin.terminate()
+        return visited, cursor
+
+    visited, cursor = run(scenario())
+    assert visited == ["1", "2", "3", "4", "5"]
+    assert cursor == {}
+
+
+def test_robbery_conserves_points_with_tiny_cache(make_plugin, tmp_path, monkeypatch):
+    async def scenario():
+        plugin = make_plugin({"user_cache_size": 1})
+        await plugin.initialize()
+        economy = plugin.checkin_module
+        await economy.wait_ready()
+        for user_id in ("7", "8"):
+            economy.get_user_info(user_id)["total_points"] = 1000
+        economy.save_data()
+        for success in (True, False):
+            monkeypatch.setattr(plugin.robbery_module, "last_robbery", {})
+            monkeypatch.setattr("random.random", lambda: 0.0 if success else 0.999)
+            await collect(plugin.robbery_command(
+                stub.FakeEvent("7", "抢劫", group_id="55", components=[stub.At(qq="8")])))
+        await plugin.terminate()
+
+    run(scenario())
+    conn = sqlite3.connect(tmp_path / "checkin_data.sqlite3")
+    rows = dict(conn.execute("SELECT id, json_extract(data, '$.total_points') FROM users"))
+    conn.close()
+    assert rows["7"] + rows["8"] == 2000
+    assert rows["7"] != 1000 or rows["8"] != 1000
@@ -0,0 +1,223 @@
+"""
+离线工具使用的 AstrBot 替身
+
+只实现本插件用到的最小接口，用于在没有 AstrBot 运行环境时加载插件代码
+（压测、模拟等），不用于生产环境
+"""
+
+import importlib
+import logging
+import sys
+import types
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+PLUGIN_ROOT = Path(__file__).resolve().parent.parent
+PLUGIN_PACKAGE = "astrbot_plugin_groupmessages"
+
+
+# ==================== 消息组件 ====================
+
+@dataclass
+class Plain:
+    text: str
+    type: str = "Plain"
+
+
+@dataclass
+class At:
+    qq: str
+    name: str = ""
+    type: str = "At"
+
+
+@dataclass
+class Image:
+    file: str
+    size: str = ""
+    type: str = "Image"
+
+    @classmethod
+    def fromURL(cls, url: str, **kwargs):
+        return cls(file=url, **kwargs)
+
+    @classmethod
+    def fromFileSystem(cls, path: str, **kwargs):
+        return cls(file=f"file:///{path}", **kwargs)
+
+
+class MessageChain:
+    """消息链"""
+
+    def __init__(self, chain: Optional[List[Any]] = None):
+        self.chain = chain if chain is not None else []
+
+    def message(self, text: str):
+        self.chain.append(Plain(text))
+        return self
+
+    def at(self, name: str, qq: str):
+        self.chain.append(At(qq=str(qq), name=name))
+        return self
+
+    def text(self) -> str:
+        return "".join(c.text if isinstance(c, Plain) else f"@{c.qq}" if isinstance(c, At) else "[图片]"
+                       for c in self.chain)
+
+
+class MessageEventResult(MessageChain):
+    """命令处理器产出的结果"""
+
+
+# ==================== 事件与上下文 ====================
+
+@dataclass
+class FakeMessageObj:
+    group_id: str = ""
+    message: List[Any] = field(default_factory=list)
+
+
+class FakeEvent:
+    """模拟 AstrMessageEvent"""
+
+    def __init__(self, sender_id: str, message_str: str, group_id: str = "",
+                 components: Optional[List[Any]] = None, sender_name: str = ""):
+        self.sender_id = sender_id
+        self.sender_name = sender_name or f"用户{sender_id}"
+        self.message_str = message_str
+        self.message_obj = FakeMessageObj(group_id=group_id,
+                                          message=[Plain(message_str)] + list(components or []))
+        scope = f"GroupMessage:{group_id}" if group_id else f"FriendMessage:{sender_id}"
+        self.unified_msg_origin = f"fake:{scope}"
+
+    def get_sender_id(self) -> str:
+        return self.sender_id
+
+    def get_sender_name(self) -> str:
+        return self.sender_name
+
+    def get_group_id(self) -> str:
+        return self.message_obj.group_id
+
+    def plain_result(self, text: str) -> MessageEventResult:
+        return MessageEventResult([Plain(text)])
+
+    def chain_result(self, chain: List[Any]) -> MessageEventResult:
+        return MessageEventResult(list(chain))
+
+    def stop_event(self):
+        pass
+
+
+class FakeContext:
+    """模拟 AstrBot Context，记录主动发送的消息"""
+
+    def __init__(self, admins: Optional[List[str]] = None):
+        self.admins = admins or []
+        self.sent: List[tuple] = []
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"admins_id": self.admins}
+
+    async def send_message(self, unified_msg_origin: str, chain: MessageChain) -> bool:
+        self.sent.append((unified_msg_origin, chain))
+        return True
+
+
+class FakeImageUploader:
+    """模拟支持预先上传图片的平台适配器（SetuModule.uploader），记录上传的文件"""
+
+    def __init__(self):
+        self.uploads: List[Path] = []
+
+    async def __call__(self, path: Path) -> str:
+        self.uploads.append(path)
+        return f"fake-resource://{path.stem}"
+
+
+# ==================== 装饰器 ====================
+
+class _Filter:
+    """只记录正则，不做事件分发，由调用方自行匹配"""
+
+    @staticmethod
+    def regex(pattern: str, **kwargs):
+        def decorator(func):
+            func.__stub_regex__ = pattern
+            return func
+        return decorator
+
+    @staticmethod
+    def command(name: str, **kwargs):
+        return _Filter.regex(f"^{name}$")
+
+
+class Star:
+    def __init__(self, context):
+        self.context = context
+
+
+def register(*args, **kwargs):
+    def decorator(cls):
+        return cls
+    return decorator
+
+
+class StarTools:
+    data_dir: Path = Path("data")
+
+    @classmethod
+    def get_data_dir(cls) -> Path:
+        return cls.data_dir
+
+
+# ==================== 安装 ====================
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install(log_level: int = logging.WARNING):
+    """在 sys.modules 中注册 astrbot 替身（已安装真实 AstrBot 时不覆盖）"""
+    if "astrbot" in sys.modules:
+        return
+    logger = logging.getLogger("astrbot")
+    logger.setLevel(log_level)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+
+    _module("astrbot", __path__=[])
+    _module("astrbot.api", __path__=[], logger=logger)
+    _module("astrbot.api.star", Context=FakeContext, Star=Star, register=register)
+    _module("astrbot.api.event", filter=_Filter, AstrMessageEvent=FakeEvent,
+            MessageChain=MessageChain, MessageEventResult=MessageEventResult)
+    _module("astrbot.api.message_components", Plain=Plain, At=At, Image=Image)
+    _module("astrbot.core", __path__=[])
+    _module("astrbot.core.star", __path__=[])
+    _module("astrbot.core.star.star_tools", StarTools=StarTools)
+
+
+def import_plugin(submodule: str = "main") -> types.ModuleType:
+    """以包的形式导入插件（插件代码使用相对导入）"""
+    install()
+    if PLUGIN_PACKAGE not in sys.modules:
+        package = types.ModuleType(PLUGIN_PACKAGE)
+        package.__path__ = [str(PLUGIN_ROOT)]
+        sys.modules[PLUGIN_PACKAGE] = package
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.{submodule}")
+
+
+def iter_handlers(plugin) -> List[tuple]:
+    """列出插件上所有带正则的命令处理器 [(正则, 绑定方法)]"""
+    handlers = []
+    for name in dir(type(plugin)):
+        func = getattr(type(plugin), name, None)
+        pattern = getattr(func, "__stub_regex__", None)
+        if pattern:
+            handlers.append((pattern, getattr(plugin, name)))
+    return handlers
@@ -0,0 +1,352 @@
+"""
+持久化基准测试 - 比较不同存储方式随用户数增长的表现
+
+生成带有完整 points_history（10 条）的用户记录，对每种存储方式测量：
+- save：全量保存耗时
+- load：全量加载耗时
+- update：单个用户变动后持久化的耗时（对应每次签到后的 save_data）
+- size：文件总大小
+- peak：保存或加载期间的 Python 内存峰值（tracemalloc）
+
+用法：
+    python tools/bench_persistence.py --sizes 1000,10000,100000
+    python tools/bench_persistence.py --sizes 1000000 --strategies json_compact,sqlite,journal
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import _astrbot_stub as stub  # noqa: E402
+
+
+ACTIONS = [("签到", 35), ("涩图", -10), ("抢劫成功", 20), ("被抢劫", -20), ("反抢", 15), ("奖励", 100)]
+
+
+def generate_users(count: int, seed: int = 0) -> Dict[str, dict]:
+    """生成与 checkin_data.json 结构一致的用户记录"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    users = {}
+    for i in range(count):
+        uid = str(10_000_000 + i * 7919 % 90_000_000)
+        balance = rng.randint(0, 5000)
+        history = []
+        for j in range(10):
+            action, points = rng.choice(ACTIONS)
+            history.append({
+                "date": (now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))).strftime("%Y-%m-%d %H:%M:%S"),
+                "action": action,
+                "points": points,
+                "description": f"{action} {abs(points)} 积分",
+                "source": str(rng.randint(10_000_000, 99_999_999)) if "抢" in action else None,
+                "balance": balance + j,
+            })
+        users[uid] = {
+            "total_points": balance,
+            "last_checkin_date": (now - timedelta(days=rng.randint(0, 30))).date().isoformat(),
+            "total_checkin_count": rng.randint(1, 365),
+            "points_history": history,
+        }
+    return users
+
+
+# ==================== 存储方式 ====================
+
+class Strategy:
+    """存储方式基类"""
+
+    name = ""
+    requires: Optional[str] = None
+
+    def __init__(self, directory: Path):
+        self.dir = directory
+
+    def save(self, users: Dict[str, dict]):
+        raise NotImplementedError
+
+    def load(self) -> Dict[str, dict]:
+        raise NotImplementedError
+
+    def update(self, users: Dict[str, dict], uid: str):
+        """单个用户变动后的持久化，默认全量保存"""
+        self.save(users)
+
+    def size(self) -> int:
+        return sum(p.stat().st_size for p in self.dir.rglob("*") if p.is_file())
+
+    def close(self):
+        pass
+
+
+class DataManagerIndent(Strategy):
+    """当前实现：DataManager.save_json（indent=2）"""
+
+    name = "json_indent"
+
+    def __init__(self, directory: Path):
+        super().__init__(directory)
+        self.dm = stub.import_plugin("utils.data_manager").DataManager(directory)
+
+    def save(self, users):
+        self.dm.save_json("checkin_data.json", users)
+
+    def load(self):
+        return self.dm.load_json("checkin_data.json", {})
+
+
+class JsonCompact(Strategy):
+    """紧凑 JSON（无缩进）"""
+
+    name = "json_compact"
+
+    def save(self, users):
+        with open(self.dir / "data.json", "w", encoding="utf-8") as f:
+            json.dump(users, f, ensure_ascii=False, separators=(",", ":"))
+
+    def load(self):
+        with open(self.dir / "data.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+class JsonDumps(Strategy):
+    """紧凑 JSON，先在内存中序列化再一次性写入（json.dump 会分成大量小块写入文件）"""
+
+    name = "json_dumps"
+
+    def save(self, users):
+        text = json.dumps(users, ensure_ascii=False, separators=(",", ":"))
+        with open(self.dir / "data.json", "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def load(self):
+        with open(self.dir / "data.json", "r", encoding="utf-8") as f:
+            return json.loads(f.read())
+
+
+class OrjsonSnapshot(Strategy):
+    """orjson 快照"""
+
+    name = "orjson"
+    requires = "orjson"
+
+    def save(self, users):
+        import orjson
+        (self.dir / "data.json").write_bytes(orjson.dumps(users))
+
+    def load(self):
+        import orjson
+        return orjson.loads((self.dir / "data.json").read_bytes())
+
+
+class MsgpackSnapshot(Strategy):
+    """msgpack 快照"""
+
+    name = "msgpack"
+    requires = "msgpack"
+
+    def save(self, users):
+        import msgpack
+        (self.dir / "data.msgpack").write_bytes(msgpack.packb(users, use_bin_type=True))
+
+    def load(self):
+        import msgpack
+        return msgpack.unpackb((self.dir / "data.msgpack").read_bytes(), raw=False)
+
+
+class ShardedJson(Strategy):
+    """按用户 ID 哈希分片的紧凑 JSON，变动时只重写所在分片"""
+
+    name = "sharded"
+    shards = 64
+
+    def _shard(self, uid: str) -> int:
+        return int(uid) % self.shards
+
+    def _write_shard(self, index: int, records: Dict[str, dict]):
+        with open(self.dir / f"shard_{index:02d}.json", "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, separators=(",", ":"))
+
+    def save(self, users):
+        buckets: List[Dict[str, dict]] = [{} for _ in range(self.shards)]
+        for uid, record in users.items():
+            buckets[self._shard(uid)][uid] = record
+        for index, records in enumerate(buckets):
+            self._write_shard(index, records)
+        self._buckets = buckets
+
+    def load(self):
+        users = {}
+        for index in range(self.shards):
+            with open(self.dir / f"shard_{index:02d}.json", "r", encoding="utf-8") as f:
+                users.update(json.load(f))
+        return users
+
+    def update(self, users, uid):
+        index = self._shard(uid)
+        self._buckets[index][uid] = users[uid]
+        self._write_shard(index, self._buckets[index])
+
+
+class Sqlite(Strategy):
+    """SQLite，每个用户一行，记录以 JSON 文本存储"""
+
+    name = "sqlite"
+
+    def __init__(self, directory: Path):
+        super().__init__(directory)
+        self.conn = sqlite3.connect(directory / "data.sqlite3")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS users (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    def save(self, users):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO users (id, data) VALUES (?, ?)",
+                ((uid, json.dumps(r, ensure_ascii=False, separators=(",", ":"))) for uid, r in users.items())
+            )
+
+    def load(self):
+        return {uid: json.loads(data) for uid, data in self.conn.execute("SELECT id, data FROM users")}
+
+    def close(self):
+        self.conn.close()
+
+    def update(self, users, uid):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO users (id, data) VALUES (?, ?)",
+                              (uid, json.dumps(users[uid], ensure_ascii=False, separators=(",", ":"))))
+
+
+class JournalSnapshot(Strategy):
+    """紧凑 JSON 快照 + 追加写的变更日志，加载时回放日志"""
+
+    name = "journal"
+
+    def save(self, users):
+        with open(self.dir / "snapshot.json", "w", encoding="utf-8") as f:
+            json.dump(users, f, ensure_ascii=False, separators=(",", ":"))
+        open(self.dir / "journal.jsonl", "w").close()
+
+    def load(self):
+        with open(self.dir / "snapshot.json", "r", encoding="utf-8") as f:
+            users = json.load(f)
+        with open(self.dir / "journal.jsonl", "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                users[entry["id"]] = entry["data"]
+        return users
+
+    def update(self, users, uid):
+        with open(self.dir / "journal.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": uid, "data": users[uid]}, ensure_ascii=False,
+                               separators=(",", ":")) + "\n")
+
+
+STRATEGIES = [DataManagerIndent, JsonCompact, JsonDumps, OrjsonSnapshot, MsgpackSnapshot,
+              ShardedJson, Sqlite, JournalSnapshot]
+
+
+# ==================== 测量 ====================
+
+def timed(func: Callable, repeat: int) -> float:
+    """取多次运行的最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func: Callable) -> int:
+    """单独运行一次，测量 Python 内存峰值（字节）"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(strategy_cls, users: Dict[str, dict], repeat: int, updates: int, with_memory: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="groupmessages_bench_") as tmp:
+        strategy = strategy_cls(Path(tmp))
+        save_s = timed(lambda: strategy.save(users), repeat)
+        load_s = timed(strategy.load, repeat)
+
+        uids = random.Random(1).sample(list(users), min(updates, len(users)))
+        start = time.perf_counter()
+        for uid in uids:
+            users[uid]["total_points"] += 1
+            strategy.update(users, uid)
+        update_s = (time.perf_counter() - start) / max(1, len(uids))
+
+        result = {"save_ms": save_s * 1000, "load_ms": load_s * 1000, "update_ms": update_s * 1000,
+                  "size_mb": strategy.size() / 2**20}
+        if with_memory:
+            strategy.save(users)
+            result["save_peak_mb"] = peak_memory(lambda: strategy.save(users)) / 2**20
+            result["load_peak_mb"] = peak_memory(strategy.load) / 2**20
+        strategy.close()
+        return result
+
+
+def available(strategy_cls) -> bool:
+    if not strategy_cls.requires:
+        return True
+    try:
+        __import__(strategy_cls.requires)
+        return True
+    except ImportError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="持久化方式基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="用户数，逗号分隔（如 1000,1000000）")
+    parser.add_argument("--strategies", default="", help="只测试指定的存储方式，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="保存/加载的重复次数（取最短）")
+    parser.add_argument("--updates", type=int, default=20, help="单用户更新的测量次数")
+    parser.add_argument("--no-memory", action="store_true", help="跳过内存峰值测量（较慢）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    stub.install()
+    selected = set(filter(None, args.strategies.split(",")))
+    strategies = [s for s in STRATEGIES if not selected or s.name in selected]
+    for s in strategies:
+        if not available(s):
+            print(f"跳过 {s.name}：未安装 {s.requires}", file=sys.stderr)
+    strategies = [s for s in strategies if available(s)]
+
+    results = []
+    for size in (int(x) for x in args.sizes.split(",")):
+        users = generate_users(size)
+        for strategy_cls in strategies:
+            result = bench(strategy_cls, users, args.repeat, args.updates, not args.no_memory)
+            result.update(users=size, strategy=strategy_cls.name)
+            results.append(result)
+            if not args.json:
+                print(f"{size:>9} {strategy_cls.name:<13} "
+                      f"save {result['save_ms']:>10.1f} ms  load {result['load_ms']:>10.1f} ms  "
+                      f"update {result['update_ms']:>9.2f} ms  size {result['size_mb']:>8.2f} MB"
+                      + (f"  peak {result['save_peak_mb']:>7.1f}/{result['load_peak_mb']:.1f} MB"
+                         if "save_peak_mb" in result else ""), flush=True)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+经济系统模拟器 - 用 NumPy 批量模拟大量用户数月的签到、抢劫和涩图消费
+
+参数直接取自 CheckInModule / RobberyModule / SetuModule 实例（同样读取插件配置），
+用于在调整签到奖励、抢劫参数之前评估财富分布、通胀速度和成功率漂移。
+
+用法：
+    python tools/economy_sim.py --users 1000000 --days 90
+    python tools/economy_sim.py --robberies 4 --config '{"checkin_rewards": "..."}'
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("经济系统模拟需要 NumPy，请先安装：pip install -r tools/requirements.txt")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import _astrbot_stub as stub  # noqa: E402
+
+
+@dataclass
+class EconomyParams:
+    """从插件模块中读取的经济参数"""
+    outcome_probs: np.ndarray      # 每种签到结果的概率
+    outcome_min: np.ndarray        # 每种签到结果的最小积分
+    outcome_span: np.ndarray       # 每种签到结果的积分跨度（max - min + 1）
+    expected_checkin: float        # 每次签到的期望积分
+    streak_thresholds: np.ndarray  # 连续签到奖励的天数档位（升序）
+    streak_bonuses: np.ndarray     # 各档位的额外积分
+    min_points_to_rob: int
+    initial_success_rate: float
+    success_rate_step: float
+    min_success_rate: float
+    max_success_rate: float
+    max_rob_amount: int
+    max_lose_amount: int
+    rob_cooldown: int
+    normal_setu_cost: int
+    r18_setu_cost: int
+
+    @classmethod
+    def from_modules(cls, config: dict) -> "EconomyParams":
+        checkin_mod = stub.import_plugin("modules.checkin")
+        robbery_mod = stub.import_plugin("modules.robbery")
+        setu_mod = stub.import_plugin("modules.setu")
+        with tempfile.TemporaryDirectory() as tmp:
+            checkin = checkin_mod.CheckInModule(None, Path(tmp), config)
+            robbery = robbery_mod.RobberyModule(None, Path(tmp), checkin, config)
+            setu = setu_mod.SetuModule(None, Path(tmp), checkin, config)
+        outcomes = checkin.reward_table.outcomes
+        return cls(
+            outcome_probs=np.array([o.probability for o in outcomes]),
+            outcome_min=np.array([o.min_points for o in outcomes], dtype=np.int64),
+            outcome_span=np.array([o.max_points - o.min_points + 1 for o in outcomes], dtype=np.int64),
+            expected_checkin=checkin.reward_table.expected_points,
+            streak_thresholds=np.array(checkin._streak_thresholds, dtype=np.int64),
+            streak_bonuses=np.array(checkin._streak_bonuses, dtype=np.int64),
+            min_points_to_rob=robbery.min_points_to_rob,
+            initial_success_rate=robbery.initial_success_rate,
+            success_rate_step=robbery.success_rate_step,
+            min_success_rate=robbery.min_success_rate,
+            max_success_rate=robbery.max_success_rate,
+            max_rob_amount=robbery.max_rob_amount,
+            max_lose_amount=robbery.max_lose_amount,
+            rob_cooldown=robbery.cooldown,
+            normal_setu_cost=setu.normal_setu_cost,
+            r18_setu_cost=setu.r18_setu_cost,
+        )
+
+
+class EconomySimulator:
+    """
+    批量模拟
+
+    每个用户有固定的活跃度（每天签到的概率），抢劫按轮进行：每轮把所有用户两两配对，
+    保证同一轮内每个用户最多参与一次抢劫，从而可以用向量运算一次结算。
+    """
+
+    def __init__(self, params: EconomyParams, users: int, seed: int = 0):
+        self.p = params
+        self.n = users
+        self.rng = np.random.default_rng(seed)
+        self.points = np.zeros(users, dtype=np.int64)
+        self.success_rate = np.full(users, params.initial_success_rate, dtype=np.float32)
+        # 活跃度：少数用户每天签到，多数用户偶尔签到
+        self.activity = self.rng.beta(0.8, 0.8, users).astype(np.float32)
+        self.streak = np.zeros(users, dtype=np.int32)
+        self.stats = {"checkin_points": 0, "streak_bonus": 0, "setu_spent": 0, "rob_attempts": 0, "rob_success": 0,
+                      "rob_transferred": 0}
+
+    def checkin(self):
+        active = self._uniform(self.n) < self.activity
+        count = int(active.sum())
+        outcome = self.rng.choice(len(self.p.outcome_probs), size=count, p=self.p.outcome_probs)
+        offset = (self._uniform(count) * self.p.outcome_span[outcome]).astype(np.int64)
+        gained = self.p.outcome_min[outcome] + offset
+
+        # 连续签到：今天签到则 +1，否则清零；额外积分取满足条件的最高档
+        self.streak = np.where(active, self.streak + 1, 0).astype(np.int32)
+        bonus = np.zeros(count, dtype=np.int64)
+        if self.p.streak_thresholds.size:
+            tier = np.searchsorted(self.p.streak_thresholds, self.streak[active], side="right")
+            bonus = np.where(tier > 0, self.p.streak_bonuses[np.maximum(tier - 1, 0)], 0)
+
+        self.points[active] += gained + bonus
+        self.stats["checkin_points"] += int(gained.sum())
+        self.stats["streak_bonus"] += int(bonus.sum())
+
+    def _uniform(self, size: int) -> np.ndarray:
+        """[0, 1) 均匀分布（float32，减少内存带宽）"""
+        return self.rng.random(size, dtype=np.float32)
+
+    def robbery_round(self, rob_probability: float):
+        # 用户的属性是独立随机生成的，因此按下标错位配对（偶数位与错开 shift 的奇数位）
+        # 在统计上等价于随机配对，且全部是顺序内存访问，不需要每轮打乱
+        half = self.n // 2
+        parity = int(self.rng.integers(2))
+        shift = int(self.rng.integers(max(1, half)))
+        robber_points = self.points[parity:2 * half:2]
+        robber_rates = self.success_rate[parity:2 * half:2]
+        target_view = self.points[1 - parity:2 * half:2]
+        target_points = np.roll(target_view, shift)
+
+        attempt = self._uniform(half) < rob_probability * self.activity[parity:2 * half:2]
+        attempt &= robber_points >= self.p.min_points_to_rob
+        attempt &= target_points >= self.p.min_points_to_rob
+        attempts = int(attempt.sum())
+        if attempts == 0:
+            return
+
+        success = attempt & (self._uniform(half) < robber_rates)
+        failure = attempt & ~success
+        gain = np.minimum(self.rng.integers(1, self.p.max_rob_amount + 1, half), target_points)
+        loss = np.minimum(self.rng.integers(1, self.p.max_lose_amount + 1, half), robber_points)
+        amount = np.where(success, gain, 0) - np.where(failure, loss, 0)
+
+        robber_points += amount
+        target_view -= np.roll(amount, -shift)
+
+        step = np.float32(self.p.success_rate_step)
+        robber_rates -= np.where(success, step, np.float32(0))
+        robber_rates += np.where(failure, step, np.float32(0))
+        np.clip(robber_rates, self.p.min_success_rate, self.p.max_success_rate, out=robber_rates)
+
+        self.stats["rob_attempts"] += attempts
+        self.stats["rob_success"] += int(success.sum())
+        self.stats["rob_transferred"] += int(np.abs(amount).sum())
+
+    def setu(self, setu_probability: float, r18_share: float):
+        wants = np.flatnonzero(self._uniform(self.n) < setu_probability * self.activity)
+        cost = np.where(self._uniform(wants.size) < r18_share, self.p.r18_setu_cost, self.p.normal_setu_cost)
+        pays = self.points[wants] >= cost
+        self.points[wants[pays]] -= cost[pays]
+        self.stats["setu_spent"] += int(cost[pays].sum())
+
+    def run(self, days: int, robberies: float, setu: float, r18_share: float) -> List[dict]:
+        # 每天最多抢劫次数受冷却时间限制
+        max_rounds = max(1, 86400 // max(1, self.p.rob_cooldown))
+        rounds = min(max_rounds, int(np.ceil(robberies)))
+        rob_probability = robberies / rounds if rounds else 0.0
+
+        daily = []
+        for day in range(days):
+            self.checkin()
+            for _ in range(rounds):
+                self.robbery_round(rob_probability)
+            self.setu(setu, r18_share)
+            daily.append({"day": day + 1, "supply": int(self.points.sum()),
+                          "mean_rate": float(self.success_rate.mean())})
+        return daily
+
+
+def gini(values: np.ndarray) -> float:
+    """基尼系数"""
+    if values.sum() == 0:
+        return 0.0
+    ordered = np.sort(values).astype(np.float64)
+    n = ordered.size
+    return float((2 * np.arange(1, n + 1) - n - 1).dot(ordered) / (n * ordered.sum()))
+
+
+def summarize(sim: EconomySimulator, daily: List[dict], elapsed: float) -> dict:
+    points = sim.points
+    total = points.sum()
+    top = np.sort(points)[::-1]
+    top1 = top[:max(1, points.size // 100)].sum() / total if total else 0.0
+    # 通胀率：后半段每日积分总量的平均增长率
+    supplies = np.array([d["supply"] for d in daily], dtype=np.float64)
+    half = len(supplies) // 2
+    growth = np.diff(supplies[half:]) / np.maximum(supplies[half:-1], 1) if len(supplies) > 2 else np.array([0.0])
+    rate = sim.success_rate
+    stats = sim.stats
+    return {
+        "users": sim.n,
+        "days": len(daily),
+        "elapsed_s": round(elapsed, 2),
+        "expected_checkin_points": round(sim.p.expected_checkin, 2),
+        "points_percentiles": {f"p{q}": int(np.percentile(points, q)) for q in (10, 25, 50, 75, 90, 99)},
+        "mean_points": round(float(points.mean()), 1),
+        "gini": round(gini(points), 4),
+        "top1_share": round(float(top1), 4),
+        "broke_share": round(float((points < sim.p.min_points_to_rob).mean()), 4),
+        "daily_inflation": round(float(growth.mean()), 5),
+        "success_rate": {"mean": round(float(rate.mean()), 4), "std": round(float(rate.std()), 4),
+                         "min": round(float(rate.min()), 2), "max": round(float(rate.max()), 2),
+                         "drift": round(float(rate.mean() - sim.p.initial_success_rate), 4)},
+        "flows": {
+            "checkin_points": stats["checkin_points"],
+            "streak_bonus": stats["streak_bonus"],
+            "setu_spent": stats["setu_spent"],
+            "rob_attempts": stats["rob_attempts"],
+            "rob_success_ratio": round(stats["rob_success"] / stats["rob_attempts"], 4)
+            if stats["rob_attempts"] else 0.0,
+            "rob_transferred": stats["rob_transferred"],
+        },
+        "weekly_supply": [d["supply"] for d in daily[6::7]],
+    }
+
+
+def print_summary(result: dict):
+    print(f"模拟 {result['users']} 个用户 {result['days']} 天，耗时 {result['elapsed_s']} 秒")
+    print(f"每次签到期望积分  {result['expected_checkin_points']}")
+    print(f"积分分布          {result['points_percentiles']}")
+    print(f"平均积分          {result['mean_points']}")
+    print(f"基尼系数          {result['gini']}   前 1% 用户占比 {result['top1_share']:.2%}")
+    print(f"无法抢劫的用户    {result['broke_share']:.2%}")
+    print(f"日通胀率          {result['daily_inflation']:.3%}")
+    rate = result["success_rate"]
+    print(f"抢劫成功率        均值 {rate['mean']:.2%} 标准差 {rate['std']:.2%} "
+          f"范围 {rate['min']:.0%}-{rate['max']:.0%} 漂移 {rate['drift']:+.2%}")
+    flows = result["flows"]
+    print(f"签到发放 {flows['checkin_points']}（连续签到额外 {flows['streak_bonus']}），涩图消耗 {flows['setu_spent']}，"
+          f"抢劫 {flows['rob_attempts']} 次（成功 {flows['rob_success_ratio']:.2%}，转移 {flows['rob_transferred']}）")
+    print(f"每周积分总量      {result['weekly_supply']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="签到/抢劫经济系统模拟")
+    parser.add_argument("--users", type=int, default=1_000_000, help="用户数")
+    parser.add_argument("--days", type=int, default=90, help="模拟天数")
+    parser.add_argument("--robberies", type=float, default=2.0, help="活跃用户每天平均抢劫次数")
+    parser.add_argument("--setu", type=float, default=0.5, help="活跃用户每天获取涩图的概率")
+    parser.add_argument("--r18-share", type=float, default=0.2, help="涩图中 R18 的比例")
+    parser.add_argument("--config", default="", help="插件配置覆盖（JSON），与插件配置项相同")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    params = EconomyParams.from_modules(json.loads(args.config) if args.config else {})
+    start = time.perf_counter()
+    sim = EconomySimulator(params, args.users, args.seed)
+    daily = sim.run(args.days, args.robberies, args.setu, args.r18_share)
+    result = summarize(sim, daily, time.perf_counter() - start)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_summary(result)
+
+
+if __name__ == "__main__":
+    main()
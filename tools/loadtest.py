@@ -0,0 +1,352 @@
+"""
+离线压测工具 - 用合成的群聊流量驱动插件的命令处理器
+
+使用模拟的 AstrMessageEvent / Context，以及本地的 Lolicon API 替身，
+在不连接任何平台的情况下测量吞吐量、延迟、磁盘写入量和内存峰值。
+
+用法：
+    python tools/loadtest.py --users 2000 --groups 20 --events 20000
+    python tools/loadtest.py --mix checkin=5,points=2,robbery=3 --days 3 --json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import _astrbot_stub as stub  # noqa: E402
+
+
+ADMIN_ID = "10000"
+
+# 命令 -> 消息文本模板，{target} 替换为同群的另一个用户
+COMMANDS = {
+    "checkin": "签到",
+    "points": "积分",
+    "history": "积分记录",
+    "robbery": "抢劫 {target}",
+    "normal_setu": "来张涩图",
+    "reward": "奖励 {target} 100",
+}
+
+DEFAULT_MIX = "checkin=3,points=3,history=1,robbery=2,normal_setu=1"
+
+
+# ==================== Lolicon API 替身 ====================
+
+class _LoliconStubHandler(BaseHTTPRequestHandler):
+    """返回与 Lolicon API 格式相同的随机数据，并提供图片下载"""
+
+    image_size = 64 * 1024
+    latency = 0.0
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if parsed.path.startswith("/img/"):
+            body = b"\xff\xd8" + random.randbytes(self.image_size)
+            self._reply(body, "image/jpeg")
+            return
+        query = parse_qs(parsed.query)
+        num = int(query.get("num", ["1"])[0])
+        host = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+        data = []
+        for _ in range(num):
+            pid = random.randint(1, 10**8)
+            urls = {size: f"{host}/img/{pid}_{size}.jpg" for size in ("original", "regular", "small")}
+            data.append({"pid": pid, "p": 0, "uid": pid % 1000, "title": f"作品{pid}",
+                         "author": f"画师{pid % 1000}", "r18": query.get("r18", ["0"])[0] == "1",
+                         "urls": urls})
+        self._reply(json.dumps({"error": "", "data": data}).encode(), "application/json")
+
+    def _reply(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_lolicon_stub(latency: float) -> ThreadingHTTPServer:
+    """在后台线程启动本地 Lolicon API 替身"""
+    _LoliconStubHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _LoliconStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ==================== 模拟日期 ====================
+
+class _SimDate(date):
+    """可控的 date.today()，用于模拟多天的签到"""
+
+    current = date.today()
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+# ==================== 磁盘写入统计 ====================
+
+class _DiskWriteMeter:
+    """
+    统计压测期间写入数据目录的字节数
+
+    有 /proc/self/io 时取进程的 write_bytes 增量（包括 SQLite/WAL、mmap 文件、归档、审计日志、图片缓存等
+    所有写入）；没有时退回数据目录中新建或变大的文件增长的字节数（覆盖写入的部分不计入，只是下限）。
+    另外统计被新建或修改（大小或 mtime 变化）的文件数
+    """
+
+    PROC_IO = Path("/proc/self/io")
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self._start_proc = self._read_proc()
+        self.source = "/proc/self/io" if self._start_proc is not None else "数据目录"
+        self._start_files = self._snapshot()
+
+    def _read_proc(self):
+        try:
+            for line in self.PROC_IO.read_text().splitlines():
+                name, _, value = line.partition(":")
+                if name == "write_bytes":
+                    return int(value)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _snapshot(self) -> Dict[Path, tuple]:
+        files = {}
+        for path in self.data_dir.rglob("*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                files[path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def measure(self) -> dict:
+        """与开始时对比，返回 {"bytes": 写入字节数, "files": 新建或修改的文件数, "source": 统计来源}"""
+        files = self._snapshot()
+        changed = [path for path, state in files.items() if self._start_files.get(path) != state]
+        end_proc = self._read_proc()
+        if self._start_proc is not None and end_proc is not None:
+            written = end_proc - self._start_proc
+        else:
+            written = sum(max(0, files[path][0] - self._start_files.get(path, (0, 0))[0]) for path in changed)
+        return {"bytes": written, "files": len(changed), "source": self.source}
+
+
+# ==================== 压测主体 ====================
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析命令比例，如 checkin=3,points=1"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in COMMANDS:
+            raise SystemExit(f"未知命令: {name}，可选: {', '.join(COMMANDS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.replies = 0
+        self.users = [str(100000 + i) for i in range(args.users)]
+        self.groups = [str(900000 + i) for i in range(args.groups)]
+        # 每个用户固定属于一个群
+        self.user_group = {uid: self.groups[i % len(self.groups)] for i, uid in enumerate(self.users)}
+        self.group_members: Dict[str, List[str]] = defaultdict(list)
+        for uid, gid in self.user_group.items():
+            self.group_members[gid].append(uid)
+
+    async def setup(self, data_dir: Path):
+        main = stub.import_plugin("main")
+        checkin = stub.import_plugin("modules.checkin")
+        checkin.date = _SimDate
+
+        stub.StarTools.data_dir = data_dir
+        config = {"setu_cooldown": 0, "setu_api_url": f"{self.api_base}/setu/v2"}
+        config.update(json.loads(self.args.config) if self.args.config else {})
+        self.context = stub.FakeContext(admins=[ADMIN_ID])
+        self.plugin = main.GroupMessagesPlugin(self.context, config)
+        await self.plugin.initialize()
+        self.handlers = [(re.compile(p), h) for p, h in stub.iter_handlers(self.plugin)]
+
+    def make_event(self, command: str, user_id: str) -> stub.FakeEvent:
+        group_id = self.user_group[user_id]
+        text = COMMANDS[command]
+        components = []
+        if "{target}" in text:
+            members = self.group_members[group_id]
+            target = self.rng.choice(members) if len(members) > 1 else self.rng.choice(self.users)
+            components.append(stub.At(qq=target))
+            text = text.replace("{target}", "").strip()
+        sender = ADMIN_ID if command == "reward" else user_id
+        return stub.FakeEvent(sender, text, group_id=group_id, components=components)
+
+    async def dispatch(self, command: str, event: stub.FakeEvent):
+        start = time.perf_counter()
+        try:
+            for pattern, handler in self.handlers:
+                if pattern.search(event.message_str):
+                    async for _ in handler(event):
+                        self.replies += 1
+        except Exception as e:
+            self.errors[command] += 1
+            if self.errors[command] == 1:
+                print(f"[{command}] 处理出错: {e!r}", file=sys.stderr)
+        self.latencies[command].append(time.perf_counter() - start)
+
+    async def run_events(self, events: List[tuple]):
+        """以限定的并发数执行事件"""
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def run(command, event):
+            async with semaphore:
+                await self.dispatch(command, event)
+
+        await asyncio.gather(*(run(c, e) for c, e in events))
+
+    async def run(self):
+        args = self.args
+        mix = parse_mix(args.mix)
+        if "normal_setu" in mix:
+            try:
+                import httpx  # noqa: F401
+            except ImportError:
+                print("未安装 httpx，已从命令比例中移除 normal_setu", file=sys.stderr)
+                mix.pop("normal_setu")
+        names, weights = list(mix), list(mix.values())
+
+        server = start_lolicon_stub(args.api_latency)
+        self.api_base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        with tempfile.TemporaryDirectory(prefix="groupmessages_loadtest_") as tmp:
+            if args.trace_memory:
+                tracemalloc.start()
+            await self.setup(Path(tmp))
+            for module in self.plugin._get_modules():
+                await module.wait_ready()
+
+            disk_meter = _DiskWriteMeter(Path(tmp))
+            start = time.perf_counter()
+            events_per_day = args.events // args.days
+            for day in range(args.days):
+                _SimDate.current = date.today() + timedelta(days=day)
+                # 零点签到高峰：所有用户几乎同时签到
+                burst = [("checkin", self.make_event("checkin", uid)) for uid in self.users]
+                await self.run_events(burst)
+                # 其余时间的混合流量
+                mixed = []
+                for _ in range(events_per_day):
+                    command = self.rng.choices(names, weights)[0]
+                    mixed.append((command, self.make_event(command, self.rng.choice(self.users))))
+                await self.run_events(mixed)
+            elapsed = time.perf_counter() - start
+
+            await self.plugin.terminate()
+            # 开启发送队列或签到合并回复时，回复经由 context.send_message 发出而不是由处理器产出
+            self.replies += len(self.context.sent)
+            disk = disk_meter.measure()
+            peak = 0
+            if args.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+        server.shutdown()
+        return self.report(elapsed, peak, disk)
+
+    def report(self, elapsed: float, peak_traced: int, disk: dict) -> dict:
+        def pct(values: List[float], q: float) -> float:
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+        total = sum(len(v) for v in self.latencies.values())
+        all_latencies = [x for v in self.latencies.values() for x in v]
+        return {
+            "events": total,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_eps": round(total / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(pct(all_latencies, 0.5), 3),
+            "p99_ms": round(pct(all_latencies, 0.99), 3),
+            "replies": self.replies,
+            "disk_bytes": disk["bytes"],
+            "disk_files_changed": disk["files"],
+            "disk_source": disk["source"],
+            "peak_traced_mb": round(peak_traced / 2**20, 2),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "commands": {
+                name: {"count": len(values), "errors": self.errors.get(name, 0),
+                       "p50_ms": round(pct(values, 0.5), 3), "p99_ms": round(pct(values, 0.99), 3)}
+                for name, values in sorted(self.latencies.items())
+            },
+        }
+
+
+def print_report(result: dict):
+    print(f"事件数      {result['events']}")
+    print(f"耗时        {result['elapsed_s']} s")
+    print(f"吞吐量      {result['throughput_eps']} 事件/秒")
+    print(f"延迟        p50 {result['p50_ms']} ms / p99 {result['p99_ms']} ms")
+    print(f"回复数      {result['replies']}")
+    print(f"磁盘写入    {result['disk_bytes'] / 2**20:.2f} MB / {result['disk_files_changed']} 个文件"
+          f"（{result['disk_source']}）")
+    print(f"内存峰值    {result['max_rss_mb']} MB (RSS)"
+          + (f" / {result['peak_traced_mb']} MB (tracemalloc)" if result['peak_traced_mb'] else ""))
+    print()
+    print(f"{'命令':<14}{'次数':>8}{'错误':>6}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for name, stats in result["commands"].items():
+        print(f"{name:<14}{stats['count']:>8}{stats['errors']:>6}{stats['p50_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="群聊消息插件离线压测")
+    parser.add_argument("--users", type=int, default=1000, help="用户数")
+    parser.add_argument("--groups", type=int, default=10, help="群数")
+    parser.add_argument("--events", type=int, default=10000, help="签到高峰之外的事件总数")
+    parser.add_argument("--days", type=int, default=1, help="模拟天数（每天开始时有一次签到高峰）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"命令比例，默认 {DEFAULT_MIX}")
+    parser.add_argument("--concurrency", type=int, default=50, help="同时处理的事件数")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Lolicon 替身的响应延迟（秒）")
+    parser.add_argument("--config", default="", help="插件配置覆盖（JSON）")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="用 tracemalloc 统计 Python 内存峰值（会明显降低吞吐量）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    result = asyncio.run(LoadTest(args).run())
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
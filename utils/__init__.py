@@ -3,6 +3,29 @@
 """
 
 from .data_manager import DataManager
+from .group_settings import GroupSettingsStore
+from .metrics import MetricsRegistry, NULL_METRICS
+from .profiler import HandlerProfiler
+from .reward_table import RewardTable, RewardOutcome
+from .reply_batcher import ReplyBatcher
+from .send_queue import SendQueue
+from .shard_executor import ShardExecutor, ShardBusyError
+from .exporter import EconomyExporter
+from .user_store import TieredUserStore
+from .balance_table import BalanceTable, BalanceRecord
+from .history_archive import HistoryArchive
+from .maintenance import MaintenanceScheduler, MaintenanceBudget
+from .bloom_filter import BloomFilter, RotatingBloomFilter
+from .image_cache import ImageCache, CachedImage, ImageUploader
+from .memory_report import MemoryTracer, MemoryUsage, measure, format_size
+from .audit_log import AuditLog
 
-__all__ = ['DataManager']
+__all__ = ['DataManager', 'GroupSettingsStore', 'MetricsRegistry', 'NULL_METRICS',
+           'HandlerProfiler', 'RewardTable', 'RewardOutcome', 'ReplyBatcher',
+           'SendQueue', 'ShardExecutor', 'ShardBusyError',
+           'EconomyExporter', 'TieredUserStore',
+           'BalanceTable', 'BalanceRecord', 'HistoryArchive',
+           'MaintenanceScheduler', 'MaintenanceBudget', 'BloomFilter', 'RotatingBloomFilter',
+           'ImageCache', 'CachedImage', 'ImageUploader',
+           'MemoryTracer', 'MemoryUsage', 'measure', 'format_size', 'AuditLog']
 
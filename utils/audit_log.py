@@ -0,0 +1,141 @@
+"""
+积分审计日志 - 在内存中排队、由后台协程批量写出的结构化积分变动日志，按大小轮转
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from astrbot.api import logger
+
+from .metrics import MetricsRegistry, NULL_METRICS
+
+
+class AuditLog:
+    """
+    积分审计日志
+
+    - record 只把记录追加到内存队列，不做序列化和磁盘 I/O
+    - 写入协程每 flush_interval 秒（或队列达到 batch_size 条时立即）取出整个队列，
+      在工作线程中序列化为 JSON Lines 并一次写出
+    - 当前文件 audit.jsonl 超过 max_bytes 时改名为 audit.1.jsonl（已有的依次后移），最多保留 backups 个
+    - 队列最多 max_pending 条：磁盘跟不上时丢弃新记录并计数，
+      下一批写出时追加一条 {"event": "dropped", "count": N} 标明丢失的条数
+    """
+
+    FILE_NAME = "audit.jsonl"
+
+    def __init__(self, directory: Path, max_bytes: int = 10 * 2**20, backups: int = 5,
+                 max_pending: int = 10000, batch_size: int = 1000, flush_interval: float = 1.0,
+                 metrics: MetricsRegistry = NULL_METRICS):
+        """
+        Args:
+            directory: 日志目录
+            max_bytes: 单个文件的大小上限
+            backups: 保留的轮转文件数
+            max_pending: 内存中最多排队的记录数
+            batch_size: 队列达到该条数时立即写出
+            flush_interval: 记录最多等待多久写出（秒）
+            metrics: 指标注册表
+        """
+        self.directory = directory
+        self.max_bytes = max(1, int(max_bytes))
+        self.backups = max(0, int(backups))
+        self.max_pending = max(1, int(max_pending))
+        self.batch_size = min(max(1, int(batch_size)), self.max_pending)
+        self.flush_interval = flush_interval
+        self.metrics = metrics
+        self._pending: List[Dict[str, Any]] = []
+        self._dropped = 0
+        self._wake = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+
+    @property
+    def path(self) -> Path:
+        """当前日志文件"""
+        return self.directory / self.FILE_NAME
+
+    def record(self, **fields: Any):
+        """
+        加入一条审计记录（在事件循环线程中调用，自动附带时间戳）
+
+        队列已满时丢弃该记录
+        """
+        if len(self._pending) >= self.max_pending:
+            self._dropped += 1
+            self.metrics.incr("audit_records_dropped_total")
+            return
+        self._pending.append({"ts": datetime.now().isoformat(timespec="milliseconds"), **fields})
+        self.metrics.set_gauge("audit_queue_depth", len(self._pending))
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        if self._writer_task is None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # 没有事件循环（离线工具）时留在队列中，由 close 写出
+                return
+            self._writer_task = asyncio.create_task(self._writer())
+
+    def _take_batch(self) -> Tuple[List[Dict[str, Any]], int]:
+        batch, self._pending = self._pending, []
+        dropped, self._dropped = self._dropped, 0
+        self._wake.clear()
+        self.metrics.set_gauge("audit_queue_depth", 0)
+        return batch, dropped
+
+    async def _writer(self):
+        try:
+            while self._pending:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                batch, dropped = self._take_batch()
+                await asyncio.to_thread(self._write_batch, batch, dropped)
+        finally:
+            self._writer_task = None
+
+    def _write_batch(self, batch: List[Dict[str, Any]], dropped: int):
+        """序列化并写出一批记录（可在工作线程中调用），写入失败时记录错误并丢弃该批"""
+        if dropped:
+            batch = [*batch, {"ts": datetime.now().isoformat(timespec="milliseconds"),
+                              "event": "dropped", "count": dropped}]
+        data = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in batch)
+        encoded = data.encode("utf-8")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self.path.exists() and self.path.stat().st_size + len(encoded) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as f:
+                f.write(encoded)
+        except OSError as e:
+            self.metrics.incr("audit_write_errors_total")
+            logger.error(f"写入审计日志失败，丢弃 {len(batch)} 条记录: {e}")
+            return
+        self.metrics.incr("audit_records_written_total", len(batch))
+        self.metrics.incr("audit_bytes_written_total", len(encoded))
+
+    def _rotate(self):
+        """audit.jsonl -> audit.1.jsonl -> audit.2.jsonl ...，超出 backups 的最老文件被删除"""
+        stem, suffix = self.path.stem, self.path.suffix
+        if self.backups == 0:
+            self.path.unlink(missing_ok=True)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = self.directory / f"{stem}.{index}{suffix}"
+            if source.exists():
+                os.replace(source, self.directory / f"{stem}.{index + 1}{suffix}")
+        os.replace(self.path, self.directory / f"{stem}.1{suffix}")
+        self.metrics.incr("audit_rotations_total")
+
+    async def close(self):
+        """写出队列中的全部记录并停止写入协程（用于插件终止）"""
+        if self._writer_task is not None:
+            self._wake.set()
+            await self._writer_task
+        if self._pending or self._dropped:
+            batch, dropped = self._take_batch()
+            await asyncio.to_thread(self._write_batch, batch, dropped)
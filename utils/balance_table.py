@@ -0,0 +1,229 @@
+"""
+积分表 - 内存映射的定长数组，保存每个用户的数值字段
+
+文件：
+- balances.bin：16 字节文件头 + 每个用户 24 字节的定长记录（按槽位排列）
+- balances.ids：每行一个用户ID，行号即槽位（只追加）
+"""
+
+import math
+import mmap
+import struct
+from collections.abc import MutableMapping
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+MAGIC = b"GMBT"
+VERSION = 1
+
+# 文件头：魔数、版本、已使用的槽位数
+HEADER = struct.Struct("<4sII4x")
+# 字段：名称 -> (记录内偏移, 格式)
+FIELDS = {
+    "total_points": (0, struct.Struct("<q")),
+    "total_checkin_count": (8, struct.Struct("<i")),
+    "last_checkin_day": (12, struct.Struct("<i")),     # date.toordinal()，0 表示从未签到
+    "success_rate": (16, struct.Struct("<d")),         # NaN 表示未设置
+}
+RECORD_SIZE = 24
+EMPTY_RECORD = struct.pack("<qiid", 0, 0, 0, math.nan)
+
+
+def _encode_date(value: Optional[str]) -> int:
+    return date.fromisoformat(value).toordinal() if value else 0
+
+
+def _decode_date(value: int) -> Optional[str]:
+    return date.fromordinal(value).isoformat() if value else None
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+# 记录键 -> (表字段, 写入转换, 读取转换)
+FieldMap = Dict[str, Tuple[str, Callable[[Any], Any], Callable[[Any], Any]]]
+
+CHECKIN_FIELDS: FieldMap = {
+    "total_points": ("total_points", int, _identity),
+    "total_checkin_count": ("total_checkin_count", int, _identity),
+    "last_checkin_date": ("last_checkin_day", _encode_date, _decode_date),
+}
+
+ROBBERY_FIELDS: FieldMap = {
+    "success_rate": ("success_rate", float, _identity),
+}
+
+
+class BalanceTable:
+    """
+    内存映射的定长积分表
+
+    - 启动时只需映射文件并读取用户ID列表，不解析任何 JSON
+    - 读写数值字段直接作用于映射内存，没有 dict 开销
+    - 槽位不足时文件容量翻倍
+    """
+
+    def __init__(self, directory: Path, name: str = "balances", initial_capacity: int = 1024):
+        """
+        Args:
+            directory: 数据目录
+            name: 文件名前缀
+            initial_capacity: 新建文件时的初始槽位数
+        """
+        self.bin_path = directory / f"{name}.bin"
+        self.ids_path = directory / f"{name}.ids"
+        self.initial_capacity = max(1, int(initial_capacity))
+        self._slots: Dict[str, int] = {}
+        self._file = None
+        self._ids_file = None
+        self._map: Optional[mmap.mmap] = None
+        self._capacity = 0
+
+    @classmethod
+    def exists(cls, directory: Path, name: str = "balances") -> bool:
+        return (directory / f"{name}.bin").exists()
+
+    def open(self):
+        """映射积分表文件，不存在时新建"""
+        if not self.bin_path.exists():
+            with open(self.bin_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, 0))
+                f.truncate(HEADER.size + self.initial_capacity * RECORD_SIZE)
+            self.ids_path.write_text("", encoding="utf-8")
+
+        self._file = open(self.bin_path, "r+b")
+        self._remap()
+        magic, version, used = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"积分表文件格式不支持: {self.bin_path}")
+
+        # 写入用户ID后、更新文件头前中断时，以文件头的槽位数为准
+        with open(self.ids_path, "r", encoding="utf-8") as f:
+            ids = f.read().splitlines()
+        if len(ids) != used:
+            ids = ids[:used]
+            self.ids_path.write_text("".join(f"{user_id}\n" for user_id in ids), encoding="utf-8")
+        self._slots = {user_id: slot for slot, user_id in enumerate(ids)}
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, len(ids))
+        self._ids_file = open(self.ids_path, "a", encoding="utf-8")
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._capacity = (len(self._map) - HEADER.size) // RECORD_SIZE
+
+    def _grow(self):
+        """容量翻倍"""
+        self._map.flush()
+        self._file.truncate(HEADER.size + self._capacity * 2 * RECORD_SIZE)
+        self._remap()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._slots
+
+    def slot(self, user_id: str, create: bool = False) -> Optional[int]:
+        """
+        获取用户的槽位
+
+        Args:
+            user_id: 用户ID
+            create: 不存在时是否分配新槽位
+
+        Returns:
+            槽位，不存在且不创建时返回 None
+        """
+        slot = self._slots.get(user_id)
+        if slot is not None or not create:
+            return slot
+        slot = len(self._slots)
+        if slot >= self._capacity:
+            self._grow()
+        self._map[self._offset(slot):self._offset(slot) + RECORD_SIZE] = EMPTY_RECORD
+        self._ids_file.write(f"{user_id}\n")
+        self._ids_file.flush()
+        self._slots[user_id] = slot
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, len(self._slots))
+        return slot
+
+    @staticmethod
+    def _offset(slot: int) -> int:
+        return HEADER.size + slot * RECORD_SIZE
+
+    def get(self, slot: int, field: str) -> Any:
+        offset, fmt = FIELDS[field]
+        return fmt.unpack_from(self._map, self._offset(slot) + offset)[0]
+
+    def set(self, slot: int, field: str, value: Any):
+        offset, fmt = FIELDS[field]
+        fmt.pack_into(self._map, self._offset(slot) + offset, value)
+
+    def flush(self):
+        """将修改同步到磁盘"""
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._ids_file is not None:
+            self._ids_file.close()
+            self._ids_file = None
+
+
+class BalanceRecord(MutableMapping):
+    """
+    用户记录视图
+
+    fields 中的键读写积分表，其余键读写 extra 字典（积分记录等变长数据）。
+    extra 中仍保留某个数值键时（尚未迁移到积分表的旧记录）以 extra 为准。
+    """
+
+    __slots__ = ("table", "slot", "extra", "fields")
+
+    def __init__(self, table: BalanceTable, slot: Optional[int], extra: dict, fields: FieldMap):
+        self.table = table
+        self.slot = slot
+        self.extra = extra
+        self.fields = fields
+
+    def __getitem__(self, key: str) -> Any:
+        mapping = self.fields.get(key)
+        if mapping is None or key in self.extra or self.slot is None:
+            return self.extra[key]
+        field, _, decode = mapping
+        return decode(self.table.get(self.slot, field))
+
+    def __setitem__(self, key: str, value: Any):
+        mapping = self.fields.get(key)
+        if mapping is None or self.slot is None:
+            self.extra[key] = value
+            return
+        field, encode, _ = mapping
+        self.table.set(self.slot, field, encode(value))
+        self.extra.pop(key, None)
+
+    def __delitem__(self, key: str):
+        del self.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        if self.slot is not None:
+            yield from (key for key in self.fields if key not in self.extra)
+        yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"BalanceRecord({dict(self)!r})"
@@ -0,0 +1,89 @@
+"""
+布隆过滤器工具类 - 固定内存、按代轮换的“最近见过”集合
+"""
+
+import hashlib
+import math
+from typing import List
+
+
+class BloomFilter:
+    """
+    定长布隆过滤器
+
+    按预计元素数和误判率确定位数与哈希次数，使用双重哈希生成 k 个位置
+    """
+
+    __slots__ = ("size", "hashes", "count", "_bits")
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Args:
+            capacity: 预计元素数
+            error_rate: 元素数达到 capacity 时的误判率
+        """
+        capacity = max(1, int(capacity))
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] >> (position & 7) & 1 for position in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class RotatingBloomFilter:
+    """
+    按代轮换的布隆过滤器
+
+    新元素写入当前代，当前代写满 capacity 个元素后丢弃最老的一代并新建一代，
+    因此总能记住最近至少 capacity 个元素，内存固定为 generations 个定长过滤器。
+    每代按 error_rate / generations 设计，查询所有代时总误判率不超过 error_rate。
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01, generations: int = 2):
+        """
+        Args:
+            capacity: 每代的元素数（至少记住最近这么多个元素）
+            error_rate: 总误判率
+            generations: 代数
+        """
+        self.capacity = max(1, int(capacity))
+        self.error_rate = min(max(error_rate, 1e-6), 0.5)
+        self.generations = max(2, int(generations))
+        self._filters = [self._new_filter()]
+
+    def _new_filter(self) -> BloomFilter:
+        return BloomFilter(self.capacity, self.error_rate / self.generations)
+
+    def add(self, key: str):
+        current = self._filters[-1]
+        if current.count >= self.capacity:
+            current = self._new_filter()
+            self._filters.append(current)
+            if len(self._filters) > self.generations:
+                self._filters.pop(0)
+        current.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in bloom for bloom in self._filters)
+
+    @property
+    def nbytes(self) -> int:
+        """全部代写满后占用的位数组字节数"""
+        return self._filters[0].nbytes * self.generations
@@ -3,6 +3,7 @@
 """
 
 import json
+import os
 from pathlib import Path
 from typing import Dict, Any, Optional
 from astrbot.api import logger
@@ -52,13 +53,14 @@ class DataManager:
             logger.error(f"加载数据文件失败 ({filename}): {e}")
             return default if default is not None else {}
     
-    def save_json(self, filename: str, data: Any) -> bool:
+    def save_json(self, filename: str, data: Any, indent: Optional[int] = 2) -> bool:
         """
         保存数据到 JSON 文件
         
         Args:
             filename: 文件名
             data: 要保存的数据
+            indent: 缩进空格数，None 表示紧凑格式
             
         Returns:
             是否保存成功
@@ -67,13 +69,37 @@ class DataManager:
         
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                json.dump(data, f, ensure_ascii=False, indent=indent)
             logger.debug(f"成功保存数据文件: {filename}")
             return True
         except Exception as e:
             logger.error(f"保存数据文件失败 ({filename}): {e}")
             return False
     
+    def save_text(self, filename: str, text: str) -> bool:
+        """
+        保存文本文件（先写临时文件再替换，读取方不会看到写了一半的内容）
+        
+        Args:
+            filename: 文件名
+            text: 文本内容
+            
+        Returns:
+            是否保存成功
+        """
+        file_path = self.data_dir / filename
+        tmp_path = file_path.with_name(file_path.name + ".tmp")
+        
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, file_path)
+            logger.debug(f"成功保存文本文件: {filename}")
+            return True
+        except Exception as e:
+            logger.error(f"保存文本文件失败 ({filename}): {e}")
+            return False
+    
     def file_exists(self, filename: str) -> bool:
         """
         检查文件是否存在
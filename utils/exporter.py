@@ -0,0 +1,104 @@
+"""
+数据导出工具类 - 以 JSONL 或 CSV（可选 gzip 压缩）流式写出用户积分和积分记录
+"""
+
+import csv
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+# CSV 列
+USER_COLUMNS = ["user_id", "total_points", "last_checkin_date", "total_checkin_count",
+                "current_streak", "max_streak"]
+HISTORY_COLUMNS = ["user_id", "date", "action", "points", "description", "source", "balance"]
+
+
+class EconomyExporter:
+    """
+    积分数据导出器
+
+    输出目录下写出两个文件：
+    - users.jsonl / users.csv：每个用户一行（JSONL 中包含 points_history）
+    - history.csv：每条积分记录一行（仅 CSV 格式）
+
+    write_chunk 每次只处理一批记录，适合在工作线程中逐批调用，内存占用与总用户数无关
+    """
+
+    FORMATS = ("jsonl", "csv")
+
+    def __init__(self, output_dir: Path, fmt: str = "jsonl", compress: bool = False):
+        """
+        Args:
+            output_dir: 输出目录
+            fmt: "jsonl" 或 "csv"
+            compress: 是否 gzip 压缩
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"未知的导出格式: {fmt}")
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.compress = compress
+        self.users = 0
+        self.history = 0
+        self._files: List[io.TextIOBase] = []
+        self._users_writer: Any = None
+        self._history_writer: Any = None
+
+    def _open(self, name: str) -> io.TextIOBase:
+        suffix = ".gz" if self.compress else ""
+        path = self.output_dir / f"{name}.{self.fmt}{suffix}"
+        if self.compress:
+            f = gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="")
+        else:
+            f = open(path, "w", encoding="utf-8", newline="")
+        self._files.append(f)
+        return f
+
+    def open(self):
+        """创建输出文件"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.fmt == "jsonl":
+            self._users_writer = self._open("users")
+        else:
+            self._users_writer = csv.writer(self._open("users"))
+            self._users_writer.writerow(USER_COLUMNS)
+            self._history_writer = csv.writer(self._open("history"))
+            self._history_writer.writerow(HISTORY_COLUMNS)
+
+    def write_chunk(self, records: List[Tuple[str, Dict[str, Any]]]):
+        """
+        写出一批用户记录
+
+        Args:
+            records: [(用户ID, 用户记录)]
+        """
+        if self.fmt == "jsonl":
+            lines = [json.dumps({"user_id": user_id, **record}, ensure_ascii=False, separators=(",", ":"))
+                     for user_id, record in records]
+            if lines:
+                self._users_writer.write("\n".join(lines) + "\n")
+            self.users += len(lines)
+            self.history += sum(len(record.get("points_history") or ()) for _, record in records)
+            return
+
+        for user_id, record in records:
+            self._users_writer.writerow([user_id] + [record.get(column) for column in USER_COLUMNS[1:]])
+            history = record.get("points_history") or ()
+            self._history_writer.writerows(
+                [user_id] + [entry.get(column) for column in HISTORY_COLUMNS[1:]] for entry in history
+            )
+            self.users += 1
+            self.history += len(history)
+
+    def close(self):
+        """关闭输出文件"""
+        for f in self._files:
+            f.close()
+        self._files = []
+
+    def size(self) -> int:
+        """输出文件总大小（字节）"""
+        return sum(path.stat().st_size for path in self.output_dir.iterdir() if path.is_file())
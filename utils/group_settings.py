@@ -0,0 +1,172 @@
+"""
+群组设置存储 - 统一管理每个群的插件开关与涩图权限
+"""
+
+import asyncio
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Set
+from astrbot.api import logger
+
+from .data_manager import DataManager
+
+
+# 当前群组设置文件的结构版本
+GROUP_SETTINGS_SCHEMA_VERSION = 1
+
+# 旧版本使用的两个独立文件
+LEGACY_DISABLED_GROUPS_FILE = "disabled_groups.json"
+LEGACY_SETU_SETTINGS_FILE = "group_setu_settings.json"
+
+
+class GroupSettingsStore:
+    """
+    群组设置存储
+
+    文件格式（group_settings.json）：
+    {
+        "version": 1,
+        "groups": {
+            "群号": {"enabled": bool, "normal_setu": bool, "r18_setu": bool}
+        }
+    }
+
+    - 读取：通过 snapshot 获取只读快照，处理函数无需加锁
+    - 修改：复制一份新快照整体替换（copy-on-write），旧快照不受影响
+    - 写入：短时间内的多次修改合并为一次落盘
+    """
+
+    def __init__(self, data_manager: DataManager, filename: str = "group_settings.json",
+                 save_delay: float = 1.0):
+        """
+        初始化群组设置存储
+
+        Args:
+            data_manager: 数据管理器
+            filename: 设置文件名
+            save_delay: 合并写入的延迟（秒），0 表示每次修改立即保存
+        """
+        self.data_manager = data_manager
+        self.filename = filename
+        self.save_delay = save_delay
+        self._snapshot: Mapping[str, Mapping[str, Any]] = MappingProxyType({})
+        self._dirty = False
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def snapshot(self) -> Mapping[str, Mapping[str, Any]]:
+        """当前的只读快照 {群号: {设置项: 值}}"""
+        return self._snapshot
+
+    def load(self):
+        """加载群组设置，必要时从旧版本文件迁移"""
+        if self.data_manager.file_exists(self.filename):
+            data = self.data_manager.load_json(self.filename, default={})
+            groups = self._migrate(data)
+        else:
+            groups = self._load_legacy()
+            self._dirty = True
+
+        self._snapshot = self._freeze(groups)
+        if self._dirty:
+            self._save_now()
+        logger.info(f'已加载群组设置，共 {len(self._snapshot)} 个群组')
+
+    def _migrate(self, data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """按版本号升级设置文件结构"""
+        version = data.get("version", 0)
+        if version > GROUP_SETTINGS_SCHEMA_VERSION:
+            logger.warning(f'群组设置文件版本 ({version}) 高于当前支持的版本 '
+                           f'({GROUP_SETTINGS_SCHEMA_VERSION})，将尝试按当前版本读取')
+        groups = data.get("groups", {})
+        if not isinstance(groups, dict):
+            logger.error('群组设置文件格式错误，已忽略')
+            return {}
+        if version < GROUP_SETTINGS_SCHEMA_VERSION:
+            self._dirty = True
+        return {str(gid): dict(settings) for gid, settings in groups.items()
+                if isinstance(settings, dict)}
+
+    def _load_legacy(self) -> Dict[str, Dict[str, Any]]:
+        """从 disabled_groups.json 和 group_setu_settings.json 迁移"""
+        groups: Dict[str, Dict[str, Any]] = {}
+
+        disabled = self.data_manager.load_json(LEGACY_DISABLED_GROUPS_FILE, default={})
+        for gid in disabled.get("disabled_groups", []):
+            groups.setdefault(str(gid), {})["enabled"] = False
+
+        setu_settings = self.data_manager.load_json(LEGACY_SETU_SETTINGS_FILE, default={})
+        for gid, settings in setu_settings.items():
+            if isinstance(settings, dict):
+                groups.setdefault(str(gid), {}).update(settings)
+
+        if groups:
+            logger.info(f'已从旧版本设置文件迁移 {len(groups)} 个群组的设置')
+        return groups
+
+    @staticmethod
+    def _freeze(groups: Dict[str, Dict[str, Any]]) -> Mapping[str, Mapping[str, Any]]:
+        """构建只读快照"""
+        return MappingProxyType({gid: MappingProxyType(dict(settings))
+                                 for gid, settings in groups.items()})
+
+    def get(self, group_id: str) -> Optional[Mapping[str, Any]]:
+        """获取群组设置，未设置时返回 None"""
+        return self._snapshot.get(group_id)
+
+    def is_enabled(self, group_id: str) -> bool:
+        """检查群组是否启用插件"""
+        settings = self._snapshot.get(group_id)
+        return settings is None or settings.get("enabled", True)
+
+    def disabled_groups(self) -> Set[str]:
+        """获取所有禁用插件的群组"""
+        return {gid for gid, settings in self._snapshot.items()
+                if not settings.get("enabled", True)}
+
+    def update(self, group_id: str, **changes: Any):
+        """
+        修改群组设置
+
+        Args:
+            group_id: 群号
+            **changes: 要修改的设置项
+        """
+        groups = dict(self._snapshot)
+        settings = dict(groups.get(group_id, {}))
+        settings.update(changes)
+        groups[group_id] = MappingProxyType(settings)
+        self._snapshot = MappingProxyType(groups)
+        self._dirty = True
+        self._schedule_save()
+
+    def _schedule_save(self):
+        """安排一次合并写入"""
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or self.save_delay <= 0:
+            self._save_now()
+            return
+        self._save_handle = loop.call_later(self.save_delay, self._save_now)
+
+    def _save_now(self):
+        """立即保存当前快照"""
+        self._save_handle = None
+        if not self._dirty:
+            return
+        snapshot = self._snapshot
+        data = {
+            "version": GROUP_SETTINGS_SCHEMA_VERSION,
+            "groups": {gid: dict(settings) for gid, settings in snapshot.items()}
+        }
+        if self.data_manager.save_json(self.filename, data, indent=None):
+            self._dirty = False
+
+    def flush(self):
+        """取消待执行的合并写入并立即保存"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+        self._save_now()
@@ -0,0 +1,284 @@
+"""
+积分记录归档 - 按月保存被移出最近 10 条的积分记录，带稀疏的用户索引
+
+文件（每月一组）：
+- history/2026-09.gz：多个 gzip 块首尾相接（整个文件可直接用 zcat 读取），解压后每行一条 JSON 记录
+- history/2026-09.idx：每个块一行 JSON {"offset": 块偏移, "length": 块长度, "entries": 记录数, "users": [块中出现的用户ID]}
+
+查询某个用户时只解压包含该用户的块。过去月份的文件可以压缩整理：按用户重新排列记录并合并成大块，
+之后每个用户只出现在少数几个块中
+"""
+
+import gzip
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+# 缓冲区快照：[(批次号, 月份 -> 记录)]，批次号 0 表示仍在缓冲区中、尚未取出写出的记录
+PendingSnapshot = List[Tuple[int, Dict[str, List[dict]]]]
+
+
+class HistoryArchive:
+    """
+    积分记录归档
+
+    append 只把记录放入内存缓冲区，攒满 block_entries 条或超过 flush_interval 秒后
+    由调用方 take_pending 取出，在工作线程中 write 写成一个压缩块，写完后在事件循环中调用 finish_write。
+    取出后到写完之前的记录仍包含在 snapshot_pending 中，查询不会暂时丢失它们；
+    write 必须按取出的顺序依次调用（同一时刻最多一个写出）
+    """
+
+    # 缓存索引的月份数
+    INDEX_CACHE_MONTHS = 3
+
+    def __init__(self, directory: Path, block_entries: int = 256, flush_interval: float = 60.0):
+        """
+        Args:
+            directory: 归档目录
+            block_entries: 每个压缩块的记录数
+            flush_interval: 缓冲区中的记录最多等待多久写出（秒）
+        """
+        self.directory = directory
+        self.block_entries = max(1, int(block_entries))
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, List[dict]] = {}
+        self._pending_count = 0
+        self._pending_since = 0.0
+        # 已取出、正在写出的批次（只在事件循环线程中访问）：批次号 -> 月份 -> 记录
+        self._in_flight: Dict[int, Dict[str, List[dict]]] = {}
+        self._last_batch = 0
+        # 已写入文件的最后一个批次号（持有 _lock 时访问）
+        self._written_batch = 0
+        self._lock = threading.Lock()
+        # 月份 -> (已读取的索引字节数, 用户ID -> [(块偏移, 块长度)])
+        self._index_cache: "OrderedDict[str, Tuple[int, Dict[str, List[Tuple[int, int]]]]]" = OrderedDict()
+
+    # ==================== 写入 ====================
+
+    def append(self, user_id: str, entries: List[dict]):
+        """加入被移出的积分记录（只写入内存缓冲区）"""
+        if not entries:
+            return
+        if not self._pending_count:
+            self._pending_since = time.monotonic()
+        for entry in entries:
+            month = str(entry.get("date", ""))[:7] or "unknown"
+            self._pending.setdefault(month, []).append({"user_id": user_id, **entry})
+        self._pending_count += len(entries)
+
+    @property
+    def pending(self) -> int:
+        """缓冲区中的记录数"""
+        return self._pending_count
+
+    def should_flush(self) -> bool:
+        """缓冲区是否需要写出"""
+        if not self._pending_count:
+            return False
+        return (self._pending_count >= self.block_entries
+                or time.monotonic() - self._pending_since >= self.flush_interval)
+
+    def take_pending(self) -> Tuple[int, Dict[str, List[dict]]]:
+        """
+        取出缓冲区中的全部记录（在事件循环线程中调用）
+
+        Returns:
+            (批次号, 月份 -> 记录)，交给 write 写出，写完后调用 finish_write
+        """
+        pending, self._pending = self._pending, {}
+        self._pending_count = 0
+        self._last_batch += 1
+        self._in_flight[self._last_batch] = pending
+        return self._last_batch, pending
+
+    def finish_write(self, batch: int):
+        """批次写出完成（或失败）后调用，不再出现在缓冲区快照中（在事件循环线程中调用）"""
+        self._in_flight.pop(batch, None)
+
+    def write(self, batch: int, pending: Dict[str, List[dict]]):
+        """将一个批次的记录写成压缩块（可在工作线程中调用）"""
+        if not pending:
+            with self._lock:
+                self._written_batch = batch
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            for month, entries in pending.items():
+                block = self._compress(entries)
+                archive_path = self.directory / f"{month}.gz"
+                with open(archive_path, "ab") as f:
+                    offset = f.tell()
+                    f.write(block)
+                # 索引在数据块写完后再追加，读取方只会看到完整的块
+                with open(self.directory / f"{month}.idx", "a", encoding="utf-8") as f:
+                    f.write(self._index_line(offset, block, entries))
+            self._written_batch = batch
+
+    @staticmethod
+    def _compress(entries: List[dict]) -> bytes:
+        data = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in entries)
+        return gzip.compress(data.encode("utf-8"))
+
+    @staticmethod
+    def _index_line(offset: int, block: bytes, entries: List[dict]) -> str:
+        users = list(dict.fromkeys(e["user_id"] for e in entries))
+        return json.dumps({"offset": offset, "length": len(block), "entries": len(entries), "users": users},
+                          separators=(",", ":")) + "\n"
+
+    def flush(self):
+        """立即写出缓冲区（在事件循环线程中同步调用，用于插件终止）"""
+        batch, pending = self.take_pending()
+        try:
+            self.write(batch, pending)
+        finally:
+            self.finish_write(batch)
+
+    # ==================== 压缩整理 ====================
+
+    def compactable_months(self, before: str) -> List[str]:
+        """
+        需要压缩整理的月份：早于 before 且块数多于按 block_entries 合并后的块数
+
+        Args:
+            before: 月份（YYYY-MM），通常为当前月份
+        """
+        months = []
+        if not self.directory.exists():
+            return months
+        for index_path in sorted(self.directory.glob("*.idx")):
+            month = index_path.stem
+            if month >= before:
+                continue
+            blocks = [json.loads(line) for line in index_path.read_text(encoding="utf-8").splitlines() if line]
+            total = sum(block.get("entries", 0) for block in blocks)
+            if len(blocks) > max(1, math.ceil(total / self.block_entries)) or any("entries" not in b for b in blocks):
+                months.append(month)
+        return months
+
+    def compact_month(self, month: str) -> int:
+        """
+        按用户重新排列某个月的记录并合并成大块（可在工作线程中调用）
+
+        同一用户的记录保持时间顺序。先写临时文件再替换，替换期间持有锁，查询不会读到一半的文件
+
+        Returns:
+            整理的记录数
+        """
+        archive_path = self.directory / f"{month}.gz"
+        index_path = self.directory / f"{month}.idx"
+        with self._lock:
+            with open(archive_path, "rb") as f:
+                lines = gzip.decompress(f.read()).decode("utf-8").splitlines()
+            entries = sorted((json.loads(line) for line in lines), key=lambda e: e["user_id"])
+            archive_tmp = archive_path.with_name(f"{archive_path.name}.tmp")
+            index_tmp = index_path.with_name(f"{index_path.name}.tmp")
+            with open(archive_tmp, "wb") as data_file, open(index_tmp, "w", encoding="utf-8") as index_file:
+                for start in range(0, len(entries), self.block_entries):
+                    chunk = entries[start:start + self.block_entries]
+                    block = self._compress(chunk)
+                    index_file.write(self._index_line(data_file.tell(), block, chunk))
+                    data_file.write(block)
+            os.replace(archive_tmp, archive_path)
+            os.replace(index_tmp, index_path)
+            self._index_cache.pop(month, None)
+        return len(entries)
+
+    # ==================== 查询 ====================
+
+    def months(self, pending: PendingSnapshot | None = None) -> List[str]:
+        """
+        已有归档的月份（从新到旧，可在工作线程中调用）
+
+        Args:
+            pending: 缓冲区快照（工作线程中不能直接读取缓冲区）
+        """
+        months = {month for _, batch in pending or () for month in batch}
+        if self.directory.exists():
+            months.update(path.stem for path in self.directory.glob("*.idx"))
+        return sorted(months, reverse=True)
+
+    def _load_index(self, month: str) -> Dict[str, List[Tuple[int, int]]]:
+        """读取（增量刷新）某个月的用户索引"""
+        index_path = self.directory / f"{month}.idx"
+        read, index = self._index_cache.pop(month, (0, {}))
+        if index_path.exists():
+            with open(index_path, "r", encoding="utf-8") as f:
+                f.seek(read)
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    block = json.loads(line)
+                    for user_id in block["users"]:
+                        index.setdefault(user_id, []).append((block["offset"], block["length"]))
+                    read += len(line.encode("utf-8"))
+        self._index_cache[month] = (read, index)
+        while len(self._index_cache) > self.INDEX_CACHE_MONTHS:
+            self._index_cache.popitem(last=False)
+        return index
+
+    def read_month(self, user_id: str, month: str, pending: PendingSnapshot | None = None) -> List[dict]:
+        """
+        读取用户某个月的归档记录（按时间顺序，可在工作线程中调用）
+
+        Args:
+            user_id: 用户ID
+            month: 月份（YYYY-MM）
+            pending: 尚未写出的缓冲区快照
+        """
+        entries = []
+        with self._lock:
+            written = self._written_batch
+            blocks = list(self._load_index(month).get(user_id, ()))
+            if blocks:
+                with open(self.directory / f"{month}.gz", "rb") as f:
+                    for offset, length in blocks:
+                        f.seek(offset)
+                        for line in gzip.decompress(f.read(length)).decode("utf-8").splitlines():
+                            entry = json.loads(line)
+                            if entry.pop("user_id") == user_id:
+                                entries.append(entry)
+        for batch, months in pending or ():
+            # 快照之后已写入文件的批次已包含在上面读取的块中
+            if 0 < batch <= written:
+                continue
+            for entry in months.get(month, ()):
+                if entry["user_id"] == user_id:
+                    entries.append({k: v for k, v in entry.items() if k != "user_id"})
+        return entries
+
+    def read_recent(self, user_id: str, skip: int, limit: int,
+                    pending: PendingSnapshot | None = None) -> List[dict]:
+        """
+        从新到旧读取用户的归档记录（可在工作线程中调用）
+
+        Args:
+            user_id: 用户ID
+            skip: 跳过最新的多少条
+            limit: 最多返回多少条
+            pending: 尚未写出的缓冲区快照
+        """
+        result: List[dict] = []
+        for month in self.months(pending):
+            entries = self.read_month(user_id, month, pending)
+            entries.reverse()
+            if skip >= len(entries):
+                skip -= len(entries)
+                continue
+            result.extend(entries[skip:skip + limit - len(result)])
+            skip = 0
+            if len(result) >= limit:
+                break
+        return result
+
+    def snapshot_pending(self) -> PendingSnapshot:
+        """缓冲区快照，包括正在写出的批次（在事件循环线程中调用，供工作线程查询使用）"""
+        # 已取出的批次不会再被修改，不需要复制
+        snapshot: PendingSnapshot = list(self._in_flight.items())
+        snapshot.append((0, {month: list(entries) for month, entries in self._pending.items()}))
+        return snapshot
@@ -0,0 +1,225 @@
+"""
+图片缓存 - 按内容哈希保存已下载的图片及其在平台上的资源引用
+"""
+
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Set
+from astrbot.api import logger
+
+from .metrics import MetricsRegistry, NULL_METRICS
+
+
+# 平台上传接口：上传本地图片，返回之后可直接发送的资源引用（不支持时返回 None）
+ImageUploader = Callable[[Path], Awaitable[Optional[str]]]
+
+
+class ImageTooLargeError(Exception):
+    """图片超过下载大小上限"""
+
+
+@dataclass
+class CachedImage:
+    """缓存中的一张图片"""
+    digest: str                       # 内容的 SHA-256
+    path: Path                        # 本地文件
+    size: int                         # 字节数
+    created: float                    # 下载时间（time.time()）
+    reference: Optional[str] = None   # 平台资源引用（上传后得到）
+
+
+class ImageCache:
+    """
+    图片缓存
+
+    - 文件按内容哈希命名（<sha256>.<扩展名>），不同地址的相同图片只保存一份
+    - 来源地址 -> 内容哈希 的别名表让重复请求无需下载即可命中
+    - 超过 ttl 的条目视为过期；总大小超过 max_bytes 时淘汰最久未使用的图片
+    - 命中与未命中次数记录在指标 image_cache_requests_total（result=reference/file/miss）中
+
+    索引只在事件循环线程中修改；文件读写通过 write_file 在工作线程中进行
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: Path, max_bytes: int = 200 * 2**20, ttl: float = 86400,
+                 metrics: MetricsRegistry = NULL_METRICS):
+        """
+        Args:
+            directory: 缓存目录
+            max_bytes: 缓存文件总大小上限
+            ttl: 条目有效期（秒）
+            metrics: 指标注册表
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.metrics = metrics
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._aliases: Dict[str, str] = {}
+        # 内容哈希 -> 指向它的来源地址，淘汰图片时一并删除别名
+        self._alias_keys: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ==================== 索引持久化 ====================
+
+    def load(self):
+        """读取索引，丢弃过期或文件已丢失的条目，清理上次未下载完的临时文件（可在工作线程中调用）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for part_path in self.directory.glob("*.part"):
+            part_path.unlink(missing_ok=True)
+        index_path = self.directory / self.INDEX_FILE
+        if not index_path.exists():
+            return
+        try:
+            data = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"图片缓存索引损坏，已忽略: {e}")
+            return
+        now = time.time()
+        for item in data.get("entries", []):
+            entry = CachedImage(**{**item, "path": Path(item["path"])})
+            if now - entry.created < self.ttl and entry.path.exists():
+                self._entries[entry.digest] = entry
+                self._bytes += entry.size
+        for key, digest in data.get("aliases", {}).items():
+            if digest in self._entries:
+                self._set_alias(key, digest)
+        self._update_gauges()
+
+    def save(self):
+        """写出索引"""
+        data = {
+            "entries": [{**asdict(entry), "path": str(entry.path)} for entry in self._entries.values()],
+            "aliases": {key: digest for key, digest in self._aliases.items() if digest in self._entries},
+        }
+        tmp_path = self.directory / f"{self.INDEX_FILE}.tmp"
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.directory / self.INDEX_FILE)
+
+    # ==================== 查询与写入 ====================
+
+    def lookup(self, key: str) -> Optional[CachedImage]:
+        """按来源地址查找，未命中或已过期时返回 None"""
+        digest = self._aliases.get(key)
+        entry = self._entries.get(digest) if digest else None
+        if entry is not None and time.time() - entry.created >= self.ttl:
+            self._remove(digest)
+            entry = None
+        if entry is None:
+            self._drop_alias(key)
+            self.misses += 1
+            self.metrics.incr("image_cache_requests_total", result="miss")
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        self.metrics.incr("image_cache_requests_total", result="reference" if entry.reference else "file")
+        return entry
+
+    def write_file(self, data: bytes, suffix: str = ".jpg") -> CachedImage:
+        """按内容哈希写出图片文件（可在工作线程中调用，之后需调用 add 加入索引）"""
+        tmp_path = self.temp_path()
+        tmp_path.write_bytes(data)
+        return self.adopt_file(tmp_path, hashlib.sha256(data).hexdigest(), len(data), suffix)
+
+    def temp_path(self) -> Path:
+        """下载中的临时文件路径（写完后调用 adopt_file，放弃时由调用方删除）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.directory / f"{uuid.uuid4().hex}.part"
+
+    def adopt_file(self, tmp_path: Path, digest: str, size: int, suffix: str = ".jpg") -> CachedImage:
+        """
+        将写完的临时文件按内容哈希改名（可在工作线程中调用，之后需调用 add 加入索引）
+
+        相同内容的文件已存在时删除临时文件
+        """
+        path = self.directory / f"{digest}{suffix}"
+        if path.exists():
+            tmp_path.unlink(missing_ok=True)
+        else:
+            tmp_path.replace(path)
+        return CachedImage(digest, path, size, time.time())
+
+    def add(self, key: str, entry: CachedImage) -> CachedImage:
+        """
+        将图片加入索引并记录来源地址
+
+        相同内容已在缓存中时保留原条目（及其平台资源引用）
+        """
+        existing = self._entries.get(entry.digest)
+        if existing is not None:
+            entry = existing
+            self._entries.move_to_end(entry.digest)
+        else:
+            self._entries[entry.digest] = entry
+            self._bytes += entry.size
+            self._evict()
+        self._set_alias(key, entry.digest)
+        self._update_gauges()
+        return entry
+
+    def _set_alias(self, key: str, digest: str):
+        self._drop_alias(key)
+        self._aliases[key] = digest
+        self._alias_keys.setdefault(digest, set()).add(key)
+
+    def _drop_alias(self, key: str):
+        digest = self._aliases.pop(key, None)
+        keys = self._alias_keys.get(digest)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._alias_keys[digest]
+
+    def set_reference(self, digest: str, reference: str):
+        """记录图片在平台上的资源引用"""
+        entry = self._entries.get(digest)
+        if entry is not None:
+            entry.reference = reference
+
+    def prune_expired(self) -> int:
+        """删除已过期的图片"""
+        now = time.time()
+        expired = [digest for digest, entry in self._entries.items() if now - entry.created >= self.ttl]
+        for digest in expired:
+            self._remove(digest)
+        return len(expired)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            digest = next(iter(self._entries))
+            self._remove(digest)
+            self.metrics.incr("image_cache_evictions_total")
+
+    def _remove(self, digest: str):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        for key in self._alias_keys.pop(digest, ()):
+            del self._aliases[key]
+        self._bytes -= entry.size
+        try:
+            entry.path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"删除缓存图片失败: {e}")
+        self._update_gauges()
+
+    def _update_gauges(self):
+        self.metrics.set_gauge("image_cache_bytes", self._bytes)
+        self.metrics.set_gauge("image_cache_entries", len(self._entries))
+
+    def stats(self) -> Dict[str, float]:
+        """图片数、总字节数与命中率"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
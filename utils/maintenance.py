@@ -0,0 +1,143 @@
+"""
+后台维护调度器 - 定期执行各模块注册的维护任务（压缩、清理、归档等）
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+from astrbot.api import logger
+
+from .metrics import MetricsRegistry, NULL_METRICS
+
+
+class MaintenanceBudget:
+    """
+    单次维护任务的时间预算
+
+    任务应分小批处理，每批之后调用 checkpoint 让出事件循环；
+    预算用完时任务应记住进度并返回，下次运行时继续
+    """
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        self.exhausted = False
+
+    async def checkpoint(self) -> bool:
+        """
+        让出事件循环
+
+        Returns:
+            是否还有剩余预算
+        """
+        await asyncio.sleep(0)
+        if time.monotonic() >= self.deadline:
+            self.exhausted = True
+        return not self.exhausted
+
+
+# 维护任务：接收时间预算，返回处理的条目数
+MaintenanceJob = Callable[[MaintenanceBudget], Awaitable[int]]
+
+
+@dataclass
+class _ScheduledJob:
+    name: str
+    job: MaintenanceJob
+    interval: float
+    next_run: float = 0.0
+    last_run: float = 0.0
+    last_items: int = 0
+
+
+class MaintenanceScheduler:
+    """
+    后台维护调度器
+
+    - 所有任务在同一个协程中依次执行，同一时间只有一个任务运行
+    - 每次运行有时间预算，任务分批处理并在批之间让出事件循环，不会阻塞命令处理
+    - 每次运行记录指标：maintenance_runs_total（result=done/partial/error）、
+      maintenance_items_total、maintenance_job_seconds
+    """
+
+    def __init__(self, interval: float = 3600, budget: float = 0.2, first_delay: float = 60,
+                 metrics: MetricsRegistry = NULL_METRICS):
+        """
+        Args:
+            interval: 默认运行间隔（秒）
+            budget: 每次运行的时间预算（秒）
+            first_delay: 启动后第一次运行前的等待时间（秒），之后各任务依次错开；
+                         预算用完的任务也在该时间后继续
+            metrics: 指标注册表
+        """
+        self.interval = interval
+        self.budget = budget
+        self.first_delay = first_delay
+        self.metrics = metrics
+        self._jobs: List[_ScheduledJob] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, job: MaintenanceJob, interval: Optional[float] = None):
+        """
+        注册维护任务
+
+        Args:
+            name: 任务名称（指标标签）
+            job: 任务协程函数
+            interval: 运行间隔（秒），None 表示使用默认间隔
+        """
+        self._jobs.append(_ScheduledJob(name, job, interval or self.interval))
+
+    def start(self):
+        """启动调度协程（需要运行中的事件循环）"""
+        if self._task or not self._jobs:
+            return
+        now = time.monotonic()
+        for index, scheduled in enumerate(self._jobs):
+            scheduled.next_run = now + min(self.first_delay, scheduled.interval) + index * 5
+        self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            scheduled = min(self._jobs, key=lambda s: s.next_run)
+            delay = scheduled.next_run - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # 预算用完时尽快继续，其余情况等待完整的间隔
+            partial = await self._run(scheduled)
+            interval = min(self.first_delay, scheduled.interval) if partial else scheduled.interval
+            scheduled.next_run = time.monotonic() + interval
+
+    async def _run(self, scheduled: _ScheduledJob) -> bool:
+        """运行一次任务，返回是否因预算用完而提前结束"""
+        budget = MaintenanceBudget(self.budget)
+        start = time.perf_counter()
+        try:
+            items = await scheduled.job(budget)
+        except Exception as e:
+            self.metrics.incr("maintenance_runs_total", job=scheduled.name, result="error")
+            logger.error(f"维护任务 {scheduled.name} 执行失败: {e}")
+            return False
+        finally:
+            self.metrics.observe("maintenance_job_seconds", time.perf_counter() - start, job=scheduled.name)
+            scheduled.last_run = time.time()
+        scheduled.last_items = items
+        self.metrics.incr("maintenance_runs_total", job=scheduled.name,
+                          result="partial" if budget.exhausted else "done")
+        if items:
+            self.metrics.incr("maintenance_items_total", items, job=scheduled.name)
+        return budget.exhausted
+
+    def status(self) -> Dict[str, dict]:
+        """各任务的上次运行时间与处理条目数"""
+        return {s.name: {"last_run": s.last_run, "last_items": s.last_items} for s in self._jobs}
+
+    async def close(self):
+        """停止调度协程（正在运行的任务会被取消，下次启动时从头开始）"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
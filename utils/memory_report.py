@@ -0,0 +1,181 @@
+"""
+内存占用分析工具类 - 按模块统计数据结构的深度大小，以及两个时间点之间的 tracemalloc 对比
+"""
+
+import asyncio
+import sys
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Set, Tuple
+from astrbot.api import logger
+
+
+# 本插件的包名：只展开本插件定义的类的实例属性，标准库和第三方对象只计算自身大小
+_PLUGIN_PACKAGE = __name__.rsplit(".", 2)[0]
+
+# 遍历多少个对象后让出一次事件循环
+_YIELD_EVERY = 5000
+
+
+@dataclass
+class MemoryUsage:
+    """一个数据结构的内存占用"""
+    name: str
+    entries: Optional[int]   # 顶层元素数（不是容器时为 None）
+    objects: int             # 遍历到的对象数
+    size: int                # 深度大小（字节，sys.getsizeof 之和）
+
+
+def _referents(obj: Any) -> Iterable[Any]:
+    """需要继续展开的子对象（容器先复制成列表，遍历期间被修改也不会出错）"""
+    if isinstance(obj, dict):
+        return [item for pair in list(obj.items()) for item in pair]
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return list(obj)
+    if type(obj).__module__.startswith(_PLUGIN_PACKAGE):
+        children = list(getattr(obj, "__dict__", {}).values())
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    children.append(getattr(obj, slot))
+        return children
+    return ()
+
+
+async def measure(name: str, obj: Any, seen: Set[int]) -> MemoryUsage:
+    """
+    统计对象的深度大小（在事件循环线程中调用，每遍历一批对象让出一次事件循环）
+
+    seen 中的对象（按 id）及其子对象不计入，统计到的对象会加入 seen。
+    统计多个数据结构时传入同一个 seen，共享的对象只计入最先统计的数据结构；
+    预先放入模块、指标注册表等对象的 id 可以跳过它们
+
+    Args:
+        name: 数据结构名称
+        obj: 要统计的对象
+        seen: 已统计或不计入的对象 id
+    """
+    stack = [obj]
+    objects = size = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        objects += 1
+        size += sys.getsizeof(item)
+        stack.extend(_referents(item))
+        if objects % _YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+    entries = len(obj) if hasattr(obj, "__len__") else None
+    return MemoryUsage(name, entries, objects, size)
+
+
+def format_size(size: float) -> str:
+    """格式化字节数"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class MemoryTracer:
+    """
+    tracemalloc 对比
+
+    start 开始追踪并记录基准快照，diff 记录第二个快照，把按代码行统计的内存增长写入文件后停止追踪。
+    追踪期间每次分配都有额外开销，diff 之前一直开着，超过 max_duration 秒自动停止
+    """
+
+    def __init__(self, output_dir: Path, frames: int = 1, max_duration: float = 3600):
+        """
+        Args:
+            output_dir: 结果文件目录
+            frames: 每次分配记录的调用栈层数
+            max_duration: 最长追踪时间（秒）
+        """
+        self.output_dir = output_dir
+        self.frames = frames
+        self.max_duration = max_duration
+        self.started_at: Optional[datetime] = None
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._owns_tracing = False
+        self._stop_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def active(self) -> bool:
+        """是否正在追踪"""
+        return self._baseline is not None
+
+    async def start(self):
+        """开始追踪并记录基准快照（必须在事件循环线程中调用）"""
+        if self.active:
+            raise RuntimeError("内存追踪已在进行中")
+        # 其他工具已开启 tracemalloc 时沿用，结束时也不关闭
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start(self.frames)
+        self._baseline = await asyncio.to_thread(self._take_snapshot)
+        self.started_at = datetime.now()
+        self._stop_handle = asyncio.get_running_loop().call_later(self.max_duration, self.stop)
+        logger.info(f"内存追踪已开启（最长 {self.max_duration:.0f} 秒）")
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    async def diff(self, limit: int = 5) -> Tuple[Path, List[str]]:
+        """
+        记录第二个快照，与基准对比后停止追踪
+
+        Args:
+            limit: 返回的增长最多的代码行数（文件中保存全部）
+
+        Returns:
+            (结果文件路径, 增长最多的几行)
+        """
+        if not self.active:
+            raise RuntimeError("内存追踪未开启")
+        baseline, started_at = self._baseline, self.started_at
+        try:
+            snapshot = await asyncio.to_thread(self._take_snapshot)
+        finally:
+            self.stop()
+        return await asyncio.to_thread(self._write_diff, baseline, snapshot, started_at, limit)
+
+    def _write_diff(self, baseline: tracemalloc.Snapshot, snapshot: tracemalloc.Snapshot,
+                    started_at: datetime, limit: int) -> Tuple[Path, List[str]]:
+        stats = snapshot.compare_to(baseline, "lineno")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        path = self.output_dir / f"tracemalloc_{stamp}.txt"
+        total = sum(stat.size_diff for stat in stats)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# {started_at:%Y-%m-%d %H:%M:%S} -> {datetime.now():%Y-%m-%d %H:%M:%S}，"
+                    f"合计 {total:+d} 字节\n")
+            for stat in stats:
+                f.write(f"{stat}\n")
+        top = [f"{Path(stat.traceback[0].filename).name}:{stat.traceback[0].lineno} "
+               f"{'+' if stat.size_diff >= 0 else '-'}{format_size(abs(stat.size_diff))}（{stat.count_diff:+d} 个）"
+               for stat in stats[:limit]]
+        return path, top
+
+    def stop(self):
+        """停止追踪（不保存结果）"""
+        if not self.active:
+            return
+        if self._stop_handle is not None:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+        if self._owns_tracing:
+            tracemalloc.stop()
+        self._baseline = None
+        self.started_at = None
+        logger.info("内存追踪已停止")
@@ -0,0 +1,184 @@
+"""
+性能指标工具类 - 计数器与延迟分布统计
+"""
+
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+
+# 指标标签，按键排序后的 (键, 值) 元组，用作字典键
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    """将标签字典转换为可哈希的键"""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Dict[str, str] | None = None) -> str:
+    """格式化为 Prometheus 标签字符串"""
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class LatencyHistogram:
+    """
+    延迟分布统计
+
+    保留最近 window 个样本用于计算分位数，同时累计总次数与总耗时
+    """
+
+    def __init__(self, window: int = 1024):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        """记录一次耗时（秒）"""
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self, *quantiles: float) -> List[float]:
+        """计算分位数（秒），无样本时返回 0"""
+        if not self.samples:
+            return [0.0 for _ in quantiles]
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return [ordered[min(last, max(0, math.ceil(q * len(ordered)) - 1))] for q in quantiles]
+
+
+class _Timer:
+    """计时上下文管理器，退出时将耗时记录到直方图"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: LatencyHistogram):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    """指标关闭时使用的空计时器"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    - 计数器：incr("commands_total", command="checkin")
+    - 延迟：with timer("command_latency_seconds", command="checkin"): ...
+    - 瞬时值：set_gauge("queue_depth", 3, group="123")
+
+    关闭时所有方法直接返回，开销可忽略
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, enabled: bool = True, window: int = 1024):
+        self.enabled = enabled
+        self.window = window
+        self.started_at = time.time()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, LatencyHistogram]] = {}
+
+    def incr(self, name: str, value: float = 1, **labels: str):
+        """计数器累加"""
+        if not self.enabled:
+            return
+        series = self.counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        """设置瞬时值"""
+        if not self.enabled:
+            return
+        self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def histogram(self, name: str, **labels: str) -> LatencyHistogram:
+        """获取（或创建）延迟直方图"""
+        series = self.histograms.setdefault(name, {})
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = LatencyHistogram(self.window)
+        return histogram
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        """记录一次耗时（秒）"""
+        if not self.enabled:
+            return
+        self.histogram(name, **labels).observe(seconds)
+
+    def timer(self, name: str, **labels: str):
+        """返回计时上下文管理器"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name, **labels))
+
+    def render_summary(self) -> List[str]:
+        """生成便于阅读的指标摘要（每行一条）"""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} = {value:g}")
+        for name, series in sorted(self.gauges.items()):
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} = {value:g}")
+        for name, series in sorted(self.histograms.items()):
+            for key, histogram in sorted(series.items()):
+                p50, p95, p99 = (v * 1000 for v in histogram.percentiles(*self.QUANTILES))
+                lines.append(f"{name}{_format_labels(key)} n={histogram.count} "
+                             f"p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms")
+        return lines
+
+    def render_prometheus(self) -> str:
+        """生成 Prometheus 文本格式"""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+        for name, series in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {name} summary")
+            for key, histogram in sorted(series.items()):
+                values = histogram.percentiles(*self.QUANTILES)
+                for q, v in zip(self.QUANTILES, values):
+                    lines.append(f"{name}{_format_labels(key, {'quantile': str(q)})} {v:.6f}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# 未注入指标注册表时使用的默认实例（关闭状态）
+NULL_METRICS = MetricsRegistry(enabled=False)
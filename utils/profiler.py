@@ -0,0 +1,205 @@
+"""
+性能分析工具类 - 按需开启的 cProfile / 采样分析
+"""
+
+import asyncio
+import cProfile
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+from astrbot.api import logger
+
+
+class _StackSampler:
+    """
+    采样分析器
+
+    在后台线程中定期读取目标线程的调用栈，统计为折叠栈格式（collapsed stacks），
+    可直接用于 flamegraph.pl / speedscope 生成火焰图
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="groupmessages-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def dump(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class HandlerProfiler:
+    """
+    命令处理性能分析器
+
+    - cprofile 模式：对事件循环线程开启 cProfile，结果保存为 .pstats
+    - sampling 模式：后台线程定期采样事件循环线程调用栈，结果保存为 .collapsed
+
+    达到指定时长或处理完指定数量的命令后自动关闭，时长不超过 max_duration
+    """
+
+    MODES = ("cprofile", "sampling")
+
+    def __init__(self, output_dir: Path, max_duration: float = 300, sample_interval: float = 0.005):
+        """
+        初始化性能分析器
+
+        Args:
+            output_dir: 结果文件目录
+            max_duration: 单次分析的最长时间（秒）
+            sample_interval: 采样模式的采样间隔（秒）
+        """
+        self.output_dir = output_dir
+        self.max_duration = max_duration
+        self.sample_interval = sample_interval
+        self.mode: Optional[str] = None
+        self.max_events: Optional[int] = None
+        self.events = 0
+        self.started_at = 0.0
+        self.on_stop: Optional[Callable[[str], None]] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._stop_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def active(self) -> bool:
+        """是否正在分析"""
+        return self.mode is not None
+
+    def start(self, mode: str, duration: Optional[float] = None, max_events: Optional[int] = None,
+              on_stop: Optional[Callable[[str], None]] = None) -> float:
+        """
+        开始分析（必须在事件循环线程中调用）
+
+        Args:
+            mode: "cprofile" 或 "sampling"
+            duration: 分析时长（秒），为空时使用 max_duration
+            max_events: 处理完多少条命令后停止，为空表示不按数量停止
+            on_stop: 分析结束后的回调，参数为结果摘要
+
+        Returns:
+            实际生效的最长分析时长（秒）
+        """
+        if self.active:
+            raise RuntimeError("性能分析已在进行中")
+        if mode not in self.MODES:
+            raise ValueError(f"未知的分析模式: {mode}")
+
+        duration = min(duration or self.max_duration, self.max_duration)
+        self.mode = mode
+        self.max_events = max_events
+        self.events = 0
+        self.started_at = time.perf_counter()
+        self.on_stop = on_stop
+
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+
+        # 无论按时长还是按数量，都设置超时自动关闭，避免分析一直开着
+        self._stop_handle = asyncio.get_running_loop().call_later(duration, self.stop)
+        logger.info(f"性能分析已开启（{mode}，最长 {duration:.0f} 秒"
+                    f"{f'，{max_events} 条命令' if max_events else ''}）")
+        return duration
+
+    def record_event(self):
+        """记录一条命令处理完成，达到数量后自动停止"""
+        if not self.active:
+            return
+        self.events += 1
+        if self.max_events and self.events >= self.max_events:
+            self.stop()
+
+    def stop(self, notify: bool = True) -> Optional[str]:
+        """
+        停止分析并保存结果
+
+        Args:
+            notify: 是否调用 on_stop 回调（手动停止时调用方已自行回复）
+
+        Returns:
+            结果摘要，未在分析时返回 None
+        """
+        if not self.active:
+            return None
+        if self._stop_handle is not None:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+
+        elapsed = time.perf_counter() - self.started_at
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+
+        try:
+            if self.mode == "cprofile":
+                self._profile.disable()
+                path = self.output_dir / f"profile_{stamp}.pstats"
+                self._profile.dump_stats(str(path))
+                summary = self._summarize_pstats(self._profile)
+            else:
+                self._sampler.stop()
+                path = self.output_dir / f"profile_{stamp}.collapsed"
+                self._sampler.dump(path)
+                summary = f"采样 {self._sampler.samples} 次"
+            result = (f"性能分析已结束（{self.mode}，{elapsed:.1f} 秒，{self.events} 条命令）\n"
+                      f"{summary}\n结果文件：{path.name}")
+        except Exception as e:
+            logger.error(f"保存性能分析结果失败: {e}")
+            result = f"性能分析已结束，但保存结果失败: {e}"
+        finally:
+            on_stop = self.on_stop
+            self.mode = None
+            self.on_stop = None
+            self._profile = None
+            self._sampler = None
+
+        logger.info(result)
+        if on_stop and notify:
+            on_stop(result)
+        return result
+
+    @staticmethod
+    def _summarize_pstats(profile: cProfile.Profile, limit: int = 5) -> str:
+        """取本插件内累计耗时最高的几个函数"""
+        stats = pstats.Stats(profile)
+        plugin_dir = str(Path(__file__).resolve().parent.parent)
+        lines = []
+        for (filename, lineno, name), (_, _, _, cumtime, _) in sorted(
+                stats.stats.items(), key=lambda item: item[1][3], reverse=True):
+            if filename.startswith(plugin_dir) and "profiler" not in filename:
+                lines.append(f"{Path(filename).name}:{name} {cumtime * 1000:.1f}ms")
+            if len(lines) >= limit:
+                break
+        return "\n".join(lines) if lines else "未采集到插件内的函数调用"
@@ -0,0 +1,91 @@
+"""
+回复合并工具类 - 将同一会话短时间内的多条回复合并为一条消息发送
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from astrbot.api import logger
+from astrbot.api.message_components import Plain
+
+from .metrics import MetricsRegistry, NULL_METRICS
+
+
+class ReplyBatcher:
+    """
+    回复合并器
+
+    每个会话（unified_msg_origin）的第一条回复开启一个合并窗口，窗口内的回复在
+    max_delay 秒后合并为一条消息发送；攒满 max_batch 条时立即发送。
+    出站 API 调用次数与窗口数成正比，而不是与用户数成正比。
+    """
+
+    def __init__(self, send: Callable[[str, List[Any]], Awaitable[Any]],
+                 max_delay: float = 2.0, max_batch: int = 20,
+                 metrics: MetricsRegistry = NULL_METRICS, name: str = "reply"):
+        """
+        Args:
+            send: 发送函数 send(unified_msg_origin, 消息组件列表)
+            max_delay: 合并窗口（秒）
+            max_batch: 每条合并消息最多包含的回复数
+            metrics: 指标注册表
+            name: 指标标签，用于区分不同的合并器
+        """
+        self.send = send
+        self.max_delay = max(0.0, float(max_delay))
+        self.max_batch = max(1, int(max_batch))
+        self.metrics = metrics
+        self.name = name
+        # 会话 -> (窗口开始时间, 待发送的回复)
+        self._pending: Dict[str, Tuple[float, List[List[Any]]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+
+    def add(self, session: str, components: List[Any]):
+        """
+        加入一条待合并的回复
+
+        Args:
+            session: 会话标识（unified_msg_origin）
+            components: 该回复的消息组件
+        """
+        _, replies = self._pending.setdefault(session, (time.perf_counter(), []))
+        replies.append(list(components))
+        if len(replies) >= self.max_batch:
+            self._flush(session)
+        elif session not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[session] = loop.call_later(self.max_delay, self._flush, session)
+
+    def _flush(self, session: str):
+        """结束会话的合并窗口并在后台发送"""
+        timer = self._timers.pop(session, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(session, None)
+        if not pending:
+            return
+        task = asyncio.create_task(self._send(session, *pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, session: str, started: float, replies: List[List[Any]]):
+        chain: List[Any] = []
+        for index, components in enumerate(replies):
+            if index:
+                chain.append(Plain(text="\n\n"))
+            chain.extend(components)
+        self.metrics.incr("reply_batches_total", batcher=self.name)
+        self.metrics.incr("reply_batched_messages_total", len(replies), batcher=self.name)
+        self.metrics.observe("reply_batch_wait_seconds", time.perf_counter() - started, batcher=self.name)
+        try:
+            await self.send(session, chain)
+        except Exception as e:
+            logger.error(f"发送合并回复失败 ({session}, {len(replies)} 条): {e}")
+
+    async def flush_all(self):
+        """立即发送所有待合并的回复并等待发送完成（用于插件终止）"""
+        for session in list(self._pending):
+            self._flush(session)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,175 @@
+"""
+签到奖励表 - 将奖励配置预编译为别名表（alias table），每次签到只需一次 O(1) 抽取
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class RewardOutcome:
+    """
+    一种签到结果
+
+    min_points == max_points 时为固定积分，否则在范围内均匀随机
+    """
+    min_points: int
+    max_points: int
+    probability: float
+    description: str = ""
+
+    @property
+    def expected_points(self) -> float:
+        """该结果的平均积分"""
+        return (self.min_points + self.max_points) / 2
+
+    @property
+    def label(self) -> str:
+        if self.min_points == self.max_points:
+            return f"{self.min_points}"
+        return f"{self.min_points}-{self.max_points}"
+
+
+class RewardTable:
+    """
+    签到奖励表
+
+    配置中的概率即为实际概率（与配置顺序无关），普通签到占剩余概率。
+    使用 Vose 别名法构建，抽取时用同一个随机数既选出结果，又确定范围内的积分。
+    """
+
+    def __init__(self, outcomes: List[RewardOutcome]):
+        """
+        Args:
+            outcomes: 所有结果，概率之和必须为 1
+        """
+        outcomes = [o for o in outcomes if o.probability > 0]
+        if not outcomes:
+            raise ValueError("奖励表为空")
+        total = sum(o.probability for o in outcomes)
+        if abs(total - 1) > 1e-9:
+            raise ValueError(f"奖励概率之和必须为 1，当前为 {total:.6f}")
+
+        self.outcomes = outcomes
+        self._build_alias_table()
+
+    def _build_alias_table(self):
+        """Vose 别名法：把每个结果的概率拆分到 n 个等宽的桶中，每个桶最多两个结果"""
+        n = len(self.outcomes)
+        scaled = [o.probability * n for o in self.outcomes]
+        self._prob = [1.0] * n
+        self._alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+        # 剩余的桶由于浮点误差可能略小于 1，直接视为 1
+        for i in small + large:
+            self._prob[i] = 1.0
+
+    @classmethod
+    def compile(cls, min_points: int, max_points: int,
+                special_rewards: Dict[int, Dict[str, Any]],
+                range_rewards: Dict[Tuple[int, int], Dict[str, Any]]) -> "RewardTable":
+        """
+        从 CheckInModule 的奖励配置编译奖励表
+
+        Args:
+            min_points: 普通签到最小积分
+            max_points: 普通签到最大积分
+            special_rewards: 固定积分奖励 {积分: {"probability": 概率, "description": 描述}}
+            range_rewards: 范围奖励 {(最小值, 最大值): {"probability": 概率, "description": 描述}}
+        """
+        if min_points > max_points:
+            raise ValueError(f"普通签到积分范围无效: {min_points}-{max_points}")
+
+        outcomes = []
+        for (low, high), config in range_rewards.items():
+            if low > high:
+                raise ValueError(f"范围奖励无效: {low}-{high}")
+            outcomes.append(RewardOutcome(int(low), int(high), float(config.get("probability", 0)),
+                                          config.get("description", "")))
+        for points, config in special_rewards.items():
+            outcomes.append(RewardOutcome(int(points), int(points), float(config.get("probability", 0)),
+                                          config.get("description", "")))
+
+        for outcome in outcomes:
+            if not 0 <= outcome.probability <= 1:
+                raise ValueError(f"{outcome.label} 积分的概率无效: {outcome.probability}")
+        special_total = sum(o.probability for o in outcomes)
+        if special_total > 1 + 1e-9:
+            raise ValueError(f"特殊奖励的概率之和超过 1: {special_total:.6f}")
+
+        normal = RewardOutcome(min_points, max_points, max(0.0, 1 - special_total), "")
+        return cls([normal] + outcomes)
+
+    @classmethod
+    def from_config(cls, data: Dict[str, Any]) -> "RewardTable":
+        """
+        从配置字典编译奖励表
+
+        格式：
+        {
+            "min_points": 10, "max_points": 49,
+            "rewards": [
+                {"points": 213, "probability": 0.02, "description": "才不是2B呢"},
+                {"min": 51, "max": 200, "probability": 0.1, "description": "运气不错哦"}
+            ]
+        }
+        """
+        special_rewards: Dict[int, Dict[str, Any]] = {}
+        range_rewards: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for reward in data.get("rewards", []):
+            config = {"probability": reward.get("probability", 0),
+                      "description": reward.get("description", "")}
+            if "points" in reward:
+                special_rewards[int(reward["points"])] = config
+            elif "min" in reward and "max" in reward:
+                range_rewards[(int(reward["min"]), int(reward["max"]))] = config
+            else:
+                raise ValueError(f"奖励项缺少 points 或 min/max: {reward}")
+        return cls.compile(int(data.get("min_points", 10)), int(data.get("max_points", 49)),
+                           special_rewards, range_rewards)
+
+    def draw(self, rng: random.Random = random) -> Tuple[int, str]:
+        """
+        抽取一次签到结果
+
+        Returns:
+            (积分, 特殊描述)
+        """
+        u = rng.random() * len(self.outcomes)
+        index = int(u)
+        fraction = u - index
+        prob = self._prob[index]
+        # 桶内的剩余部分重新缩放到 [0, 1)，用于确定范围内的积分
+        if fraction < prob:
+            fraction = fraction / prob
+        else:
+            index = self._alias[index]
+            fraction = (fraction - prob) / (1 - prob)
+        outcome = self.outcomes[index]
+        span = outcome.max_points - outcome.min_points + 1
+        points = outcome.min_points + min(span - 1, int(fraction * span))
+        return points, outcome.description
+
+    @property
+    def expected_points(self) -> float:
+        """每次签到的期望积分"""
+        return sum(o.probability * o.expected_points for o in self.outcomes)
+
+    def report(self) -> List[str]:
+        """生成每种结果的实际概率和期望积分说明"""
+        lines = []
+        for outcome in sorted(self.outcomes, key=lambda o: o.probability, reverse=True):
+            desc = f"（{outcome.description}）" if outcome.description else ""
+            lines.append(f"{outcome.label} 积分：{outcome.probability:.2%}，"
+                         f"贡献期望 {outcome.probability * outcome.expected_points:.2f}{desc}")
+        lines.append(f"每次签到期望积分：{self.expected_points:.2f}")
+        return lines
@@ -0,0 +1,138 @@
+"""
+出站发送队列工具类 - 按会话排队发送消息，限制每个群和全局的发送速率
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from astrbot.api import logger
+from astrbot.api.message_components import Image
+
+from .metrics import MetricsRegistry, NULL_METRICS
+
+
+# 优先级：数值越小越先发送
+PRIORITY_TEXT = 0
+PRIORITY_IMAGE = 1
+
+
+class SendQueue:
+    """
+    出站发送队列
+
+    每个会话（unified_msg_origin）一个队列和一个按需启动的发送协程：
+    - 同一会话相邻两条消息至少间隔 group_interval 秒
+    - 所有会话合计每秒最多发送 global_rate 条
+    - 同一会话中文字消息优先于图片消息发送，相同优先级按入队顺序发送
+    """
+
+    def __init__(self, send: Callable[[str, List[Any]], Awaitable[Any]],
+                 group_interval: float = 1.0, global_rate: float = 5.0,
+                 max_pending: int = 50, metrics: MetricsRegistry = NULL_METRICS):
+        """
+        Args:
+            send: 发送函数 send(unified_msg_origin, 消息组件列表)
+            group_interval: 同一会话的最小发送间隔（秒）
+            global_rate: 全局每秒最多发送的消息数，0 表示不限制
+            max_pending: 每个会话最多排队的消息数，超出时丢弃最早的图片消息（没有则丢弃最早的消息）
+            metrics: 指标注册表
+        """
+        self.send = send
+        self.group_interval = max(0.0, float(group_interval))
+        self.global_interval = 1 / global_rate if global_rate > 0 else 0.0
+        self.max_pending = max(1, int(max_pending))
+        self.metrics = metrics
+        # 会话 -> [(优先级, 序号, 入队时间, 消息组件)]
+        self._queues: Dict[str, List[Tuple[int, int, float, List[Any]]]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._last_sent: Dict[str, float] = {}
+        self._next_global_slot = 0.0
+        self._seq = itertools.count()
+        self._depth = 0
+
+    @staticmethod
+    def classify(chain: List[Any]) -> int:
+        """根据消息内容确定优先级"""
+        return PRIORITY_IMAGE if any(isinstance(c, Image) for c in chain) else PRIORITY_TEXT
+
+    @property
+    def depth(self) -> int:
+        """所有会话排队中的消息数"""
+        return self._depth
+
+    def put(self, session: str, chain: List[Any]):
+        """
+        加入一条待发送的消息
+
+        Args:
+            session: 会话标识（unified_msg_origin）
+            chain: 消息组件
+        """
+        queue = self._queues.setdefault(session, [])
+        if len(queue) >= self.max_pending:
+            self._drop_oldest(session, queue)
+        heapq.heappush(queue, (self.classify(chain), next(self._seq), time.perf_counter(), list(chain)))
+        self._set_depth(self._depth + 1)
+        if session not in self._workers:
+            self._workers[session] = asyncio.create_task(self._worker(session))
+
+    def _drop_oldest(self, session: str, queue: List[Tuple[int, int, float, List[Any]]]):
+        images = [item for item in queue if item[0] == PRIORITY_IMAGE]
+        victim = min(images or queue, key=lambda item: item[1])
+        queue.remove(victim)
+        heapq.heapify(queue)
+        self._set_depth(self._depth - 1)
+        self.metrics.incr("send_queue_dropped_total")
+        logger.warning(f"发送队列已满 ({session})，丢弃一条排队中的消息")
+
+    def _set_depth(self, depth: int):
+        self._depth = depth
+        self.metrics.set_gauge("send_queue_depth", depth)
+
+    def _reserve_slot(self, session: str) -> float:
+        """预约下一次发送的时间点，同时满足会话间隔和全局速率"""
+        now = time.monotonic()
+        slot = max(now, self._last_sent.get(session, 0.0) + self.group_interval, self._next_global_slot)
+        self._next_global_slot = slot + self.global_interval
+        self._last_sent[session] = slot
+        return slot - now
+
+    async def _worker(self, session: str):
+        queue = self._queues[session]
+        try:
+            while queue:
+                delay = self._reserve_slot(session)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # 等待后再出队，等待期间新到的文字消息可以插到图片前面
+                priority, _, enqueued, chain = heapq.heappop(queue)
+                self._set_depth(self._depth - 1)
+                kind = "image" if priority == PRIORITY_IMAGE else "text"
+                self.metrics.observe("send_queue_wait_seconds", time.perf_counter() - enqueued, kind=kind)
+                try:
+                    await self.send(session, chain)
+                    self.metrics.incr("send_queue_sent_total", kind=kind)
+                except Exception as e:
+                    self.metrics.incr("send_queue_errors_total", kind=kind)
+                    logger.error(f"发送消息失败 ({session}): {e}")
+        finally:
+            self._workers.pop(session, None)
+            if not queue:
+                self._queues.pop(session, None)
+
+    def stats(self) -> Dict[str, int]:
+        """队列状态"""
+        return {"depth": self._depth, "sessions": len(self._workers)}
+
+    async def drain(self, timeout: float = 5.0):
+        """等待排队中的消息发送完成，超时后丢弃剩余消息（用于插件终止）"""
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        _, pending = await asyncio.wait(workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"发送队列未能在 {timeout:.0f} 秒内清空，已丢弃 {self._depth} 条消息")
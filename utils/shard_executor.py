@@ -0,0 +1,108 @@
+"""
+分片执行器工具类 - 按用户 ID 分片串行执行修改状态的命令
+"""
+
+import asyncio
+import time
+import zlib
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from astrbot.api import logger
+
+from .metrics import MetricsRegistry, NULL_METRICS
+
+
+class ShardBusyError(Exception):
+    """分片队列已满"""
+
+
+class ShardExecutor:
+    """
+    分片执行器
+
+    命令按用户 ID 的哈希分配到固定的分片，每个分片一个有界队列和一个工作协程：
+    - 同一用户的命令按到达顺序逐个执行
+    - 不同分片的用户互不等待
+    - 分片队列已满时直接拒绝（ShardBusyError），不会无限堆积任务
+    """
+
+    def __init__(self, shards: int = 8, queue_size: int = 32, metrics: MetricsRegistry = NULL_METRICS):
+        """
+        Args:
+            shards: 分片数
+            queue_size: 每个分片最多排队的命令数
+            metrics: 指标注册表
+        """
+        self.shards = max(1, int(shards))
+        self.queue_size = max(1, int(queue_size))
+        self.metrics = metrics
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+
+    def shard_of(self, key: str) -> int:
+        """计算用户所在的分片（与进程无关的稳定哈希）"""
+        return zlib.crc32(key.encode("utf-8")) % self.shards
+
+    def _start(self):
+        """在第一次提交时启动工作协程（需要运行中的事件循环）"""
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.shards)]
+        self._workers = [asyncio.create_task(self._worker(index)) for index in range(self.shards)]
+
+    def submit(self, key: str, results: AsyncIterator[Any]) -> "asyncio.Future[List[Any]]":
+        """
+        提交一个命令
+
+        Args:
+            key: 分片键（用户ID）
+            results: 命令处理器返回的异步生成器
+
+        Returns:
+            完成时包含全部结果的 Future
+
+        Raises:
+            ShardBusyError: 分片队列已满
+        """
+        if not self._workers:
+            self._start()
+        shard = self.shard_of(key)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queues[shard].put_nowait((results, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.metrics.incr("shard_busy_total")
+            raise ShardBusyError(f"分片 {shard} 队列已满")
+        return future
+
+    async def _worker(self, index: int):
+        queue = self._queues[index]
+        while True:
+            item: Tuple[AsyncIterator[Any], asyncio.Future, float] = await queue.get()
+            results, future, enqueued = item
+            self.metrics.observe("shard_queue_wait_seconds", time.perf_counter() - enqueued)
+            try:
+                if future.cancelled():
+                    await results.aclose()
+                    continue
+                collected = [result async for result in results]
+                if not future.cancelled():
+                    future.set_result(collected)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                queue.task_done()
+
+    def depth(self) -> int:
+        """所有分片排队中的命令数"""
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def close(self, timeout: Optional[float] = 5.0):
+        """等待排队中的命令执行完成后停止工作协程（用于插件终止）"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"分片执行器未能在 {timeout:.0f} 秒内执行完排队中的命令")
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
@@ -0,0 +1,279 @@
+"""
+分层用户存储 - 活跃用户保存在内存 LRU 中，不活跃用户保存在磁盘上的 SQLite 中
+"""
+
+import itertools
+import json
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+from astrbot.api import logger
+
+from .metrics import MetricsRegistry, NULL_METRICS
+
+
+class TieredUserStore:
+    """
+    分层用户存储
+
+    提供签到模块用到的 dict 接口（in / [] / get / len / 迭代）：
+    - 热数据：最近访问的 capacity 个用户保存在内存中（OrderedDict 实现的 LRU）
+    - 冷数据：所有用户都持久化在 SQLite 中，访问不在内存中的用户时从磁盘读回
+    - 只有通过 [] = 写入或 mark_dirty 标记的记录在 flush 时写回磁盘，只读访问不产生写入
+    - 上次 flush 之后被取出或修改过的记录被淘汰时先移入待写回表（仍是同一个 dict），
+      调用方在 flush 之前继续修改并标记也不会丢失，再次读取返回同一个对象
+
+    所有方法只能在事件循环线程中调用（open 除外）
+    """
+
+    # 更新内存占用估算的最小间隔（秒）
+    MEMORY_ESTIMATE_INTERVAL = 5
+
+    def __init__(self, path: Path, capacity: int = 10000, metrics: MetricsRegistry = NULL_METRICS):
+        """
+        Args:
+            path: SQLite 文件路径
+            capacity: 内存中最多保留的用户数
+            metrics: 指标注册表
+        """
+        self.path = path
+        self.capacity = max(1, int(capacity))
+        self.metrics = metrics
+        self._conn: Optional[sqlite3.Connection] = None
+        self._hot: "OrderedDict[str, dict]" = OrderedDict()
+        # 已修改、需要在 flush 时写回的用户（记录在 _hot 或 _evicted 中）
+        self._dirty: Set[str] = set()
+        # 上次 flush 之后取出过的用户
+        self._handed_out: Set[str] = set()
+        # 上次 flush 之后取出或修改过、已被淘汰的记录（flush 时写回其中已修改的记录）
+        self._evicted: Dict[str, dict] = {}
+        # 上次 flush 之后新建、磁盘中还没有的用户
+        self._unsaved: Set[str] = set()
+        self._count = 0
+        self._memory_estimated_at = 0.0
+
+    # ==================== 打开与导入 ====================
+
+    def open(self):
+        """打开数据库（可在工作线程中调用，之后只在事件循环线程中使用）"""
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS users (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def import_records(self, records: Dict[str, dict]):
+        """批量导入用户记录（用于从 JSON 文件迁移，可在工作线程中调用）"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO users (id, data) VALUES (?, ?)",
+                ((user_id, self._dumps(record)) for user_id, record in records.items())
+            )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    @staticmethod
+    def read_all(path: Path) -> Dict[str, dict]:
+        """读出数据库中的全部用户（用于关闭分层存储后迁移回 JSON 文件）"""
+        conn = sqlite3.connect(path)
+        try:
+            return {user_id: json.loads(data) for user_id, data in conn.execute("SELECT id, data FROM users")}
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _dumps(record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+    # ==================== dict 接口 ====================
+
+    def _load(self, user_id: str) -> Optional[dict]:
+        """从待写回表或磁盘读取记录"""
+        record = self._evicted.get(user_id)
+        if record is not None:
+            return record
+        row = self._conn.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, user_id: str, default: Any = None) -> Any:
+        """获取用户记录，不在内存中时从磁盘读回"""
+        record = self._hot.get(user_id)
+        if record is not None:
+            self._hot.move_to_end(user_id)
+            self.metrics.incr("user_cache_hits_total")
+        else:
+            self.metrics.incr("user_cache_misses_total")
+            record = self._load(user_id)
+            if record is None:
+                return default
+            self._evicted.pop(user_id, None)
+            self._insert(user_id, record)
+        self._handed_out.add(user_id)
+        return record
+
+    def __getitem__(self, user_id: str) -> dict:
+        record = self.get(user_id)
+        if record is None:
+            raise KeyError(user_id)
+        return record
+
+    def __setitem__(self, user_id: str, record: dict):
+        if user_id not in self._hot and self._load(user_id) is None:
+            self._count += 1
+            self._unsaved.add(user_id)
+        self._evicted.pop(user_id, None)
+        self._insert(user_id, record)
+        self._dirty.add(user_id)
+
+    def __delitem__(self, user_id: str):
+        # 新建后尚未写回的用户只在内存中，也要计入
+        present = self._hot.pop(user_id, None) is not None
+        present = self._evicted.pop(user_id, None) is not None or present
+        self._dirty.discard(user_id)
+        self._handed_out.discard(user_id)
+        self._unsaved.discard(user_id)
+        if self._conn.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount or present:
+            self._count -= 1
+
+    def __contains__(self, user_id: str) -> bool:
+        if user_id in self._hot or user_id in self._evicted:
+            return True
+        return self._conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        """遍历所有用户ID（先写回内存中的修改）"""
+        self.flush()
+        return iter([row[0] for row in self._conn.execute("SELECT id FROM users")])
+
+    def ids_after(self, after: str, limit: int) -> List[str]:
+        """
+        按ID顺序返回大于 after 的至多 limit 个用户ID，用于分批遍历
+
+        包括尚未写回的新用户，不触发 flush
+
+        Args:
+            after: 上一批的最后一个用户ID，从头开始时为空字符串
+            limit: 最多返回的用户数
+        """
+        ids = [row[0] for row in self._conn.execute(
+            "SELECT id FROM users WHERE id > ? ORDER BY id LIMIT ?", (after, limit)
+        )]
+        unsaved = [user_id for user_id in self._unsaved if user_id > after]
+        if unsaved:
+            ids = sorted(set(ids).union(unsaved))[:limit]
+        return ids
+
+    def peek(self, user_id: str) -> Optional[dict]:
+        """读取用户记录，不改变 LRU 顺序，也不把冷数据读入内存"""
+        record = self._hot.get(user_id)
+        return record if record is not None else self._load(user_id)
+
+    def mark_dirty(self, user_id: str, record: dict):
+        """
+        标记通过 get / [] 取出的记录已被修改，在 flush 时写回
+
+        Args:
+            user_id: 用户ID
+            record: 被修改的记录（上次 flush 之前取出、之后又被淘汰时用于写回）
+        """
+        if user_id not in self._hot and user_id not in self._evicted:
+            self._evicted[user_id] = record
+        self._dirty.add(user_id)
+
+    def write_back(self, user_id: str, record: dict):
+        """保存通过 peek 读出并修改的记录，不把冷数据读入内存"""
+        if user_id in self._hot:
+            self._hot[user_id] = record
+            self._dirty.add(user_id)
+        elif user_id in self._evicted:
+            self._evicted[user_id] = record
+            self._dirty.add(user_id)
+        else:
+            self._conn.execute("INSERT OR REPLACE INTO users (id, data) VALUES (?, ?)",
+                               (user_id, self._dumps(record)))
+
+    def resident_ids(self) -> List[str]:
+        """内存中的用户ID"""
+        return list(self._hot)
+
+    # ==================== 淘汰与写回 ====================
+
+    def _insert(self, user_id: str, record: dict):
+        self._hot[user_id] = record
+        self._hot.move_to_end(user_id)
+        while len(self._hot) > self.capacity:
+            evicted_id, evicted = self._hot.popitem(last=False)
+            if evicted_id in self._dirty or evicted_id in self._handed_out:
+                # 调用方可能仍持有该记录并继续修改，保留到 flush，修改过的在 flush 时再序列化
+                self._evicted[evicted_id] = evicted
+            self.metrics.incr("user_cache_evictions_total")
+        self.metrics.set_gauge("user_cache_resident", len(self._hot))
+
+    def flush(self):
+        """将已修改的用户（包括已淘汰的待写回记录）写回磁盘"""
+        dirty = []
+        for user_id in self._dirty:
+            record = self._hot.get(user_id)
+            if record is None:
+                record = self._evicted[user_id]
+            dirty.append((user_id, self._dumps(record)))
+        self._dirty.clear()
+        self._handed_out.clear()
+        self._evicted.clear()
+        self._unsaved.clear()
+        with self._conn:
+            if dirty:
+                self._conn.executemany("INSERT OR REPLACE INTO users (id, data) VALUES (?, ?)", dirty)
+        self._update_memory_estimate()
+
+    def checkpoint(self) -> int:
+        """
+        将 WAL 中的修改合并回数据库文件（可在工作线程中调用）
+
+        使用独立连接执行 PASSIVE 检查点，不阻塞事件循环线程中的读写
+
+        Returns:
+            合并的页数
+        """
+        conn = sqlite3.connect(self.path)
+        try:
+            _, _, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            return max(0, checkpointed)
+        finally:
+            conn.close()
+
+    def _update_memory_estimate(self):
+        """抽样估算内存中用户记录占用的内存（字节）"""
+        now = time.monotonic()
+        if now - self._memory_estimated_at < self.MEMORY_ESTIMATE_INTERVAL or not self._hot:
+            return
+        self._memory_estimated_at = now
+        sample = list(itertools.islice(reversed(self._hot.values()), 100))
+        average = sum(_deep_size(record) for record in sample) / len(sample)
+        self.metrics.set_gauge("user_cache_resident_bytes", int(average * len(self._hot)))
+
+    def close(self):
+        """写回并关闭数据库"""
+        if self._conn is None:
+            return
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.error(f"写回用户数据失败: {e}")
+        self._conn.close()
+        self._conn = None
+
+
+def _deep_size(value: Any) -> int:
+    """估算 JSON 风格对象（dict / list / 标量）占用的内存"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    elif isinstance(value, list):
+        size += sum(_deep_size(item) for item in value)
+    return size